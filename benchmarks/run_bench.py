@@ -0,0 +1,216 @@
+# benchmarks/run_bench.py
+"""
+Benchmark hors-ligne du pipeline (aucune clé API ni réseau nécessaire).
+
+    python -m benchmarks.run_bench --files 10,100 --modes sequential,parallel,batch,cached
+
+Chaque mode est lancé sur un sandbox synthétique neuf (sandbox/bench/), avec
+tous les agents pointés vers un faux serveur Gemini local. Chaque mode tourne
+dans son propre processus : le pic mémoire mesuré (ru_maxrss, qui ne redescend
+jamais) est celui du mode, pas celui de tous les modes lancés avant lui.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_gemini import StubGeminiServer
+from benchmarks.synth import generate_sandbox
+
+BENCH_ROOT = os.path.join("sandbox", "bench")
+MODES = ("sequential", "parallel", "batch", "cached", "async")
+
+
+def _peak_rss_mb() -> tuple:
+    """Pic mémoire (Mo) du processus, et du plus gros de ses enfants (workers pytest/pylint)."""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+
+def run_mode(mode: str, n_files: int, args, stub: StubGeminiServer) -> dict:
+    # Appelée dans un processus neuf par mode (voir _run_child)
+    """Lance le pipeline complet sur un sandbox de n_files fichiers et mesure."""
+    import main
+    from src.agents.auditor import analyze_codes
+    from src.utils import logger, metrics
+    from src.utils.cache import configure_cache, get_cache
+    from src.utils.llm_client import configure_client
+    from src.utils.async_llm import get_async_client
+    from src.utils.scheduler import configure_limits, run_files, run_files_async
+    from src.utils.lint import close_engine, configure_engine
+    from src.utils.test_runner import close_test_pool, configure_test_pool
+    from src.utils.workspace import remove_scratch_dirs
+
+    workers = 1 if mode == "sequential" else args.workers
+    files = generate_sandbox(os.path.join(BENCH_ROOT, f"{mode}_{n_files}"), n_files, seed=args.seed)
+
+    # Journal d'expérience isolé : la bench ne doit pas polluer logs/
+    logger.flush_logs()
+    logger.STREAM_FILE = os.path.join(args.work_dir, f"{mode}_{n_files}.jsonl")
+    logger.LOG_FILE = os.path.join(args.work_dir, "no_legacy.json")
+
+    cache = configure_cache(enabled=mode == "cached", refresh=False)
+    cache.directory = os.path.join(args.work_dir, f"cache_{n_files}")
+    configure_limits(llm_slots=args.llm_concurrency, cpu_slots=args.cpu_concurrency)
+    configure_client(base_url=stub.base_url, requests_per_minute=100000, backoff_base=0.05)
+    pool_size = args.cpu_concurrency if mode == "async" else min(workers, args.cpu_concurrency)
+    configure_test_pool(size=pool_size, test_timeout=10)
+    configure_engine(size=pool_size)
+
+    def pipeline():
+        pre_audits = analyze_codes(files, "bench-key", workers=workers) if mode == "batch" else {}
+
+        def worker(file_path, api_key):
+            metrics.set_current_file(file_path)
+            with metrics.stage("file"):
+                return main.process_file(file_path, api_key, issues=pre_audits.get(file_path))
+
+        async def async_worker(file_path, api_key):
+            metrics.set_current_file(file_path)
+            with metrics.stage("file"):
+                return await main.process_file_async(file_path, api_key)
+
+        async def run_async():
+            try:
+                return await run_files_async(files, async_worker, "bench-key", concurrency=args.in_flight)
+            finally:
+                await get_async_client().close()
+
+        if mode == "async":
+            return asyncio.run(run_async())
+        return run_files(files, worker, "bench-key", workers=workers)
+
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    stdout = sys.stdout
+    try:
+        if not args.verbose:
+            sys.stdout = devnull
+        if mode == "cached":
+            # Première passe pour remplir le cache, puis mesure sur des fichiers identiques
+            pipeline()
+            files[:] = generate_sandbox(os.path.join(BENCH_ROOT, f"{mode}_{n_files}"), n_files, seed=args.seed)
+
+        metrics.reset()
+        requests_before = stub.requests
+        start = time.perf_counter()
+        results = pipeline()
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+        close_test_pool()
+        close_engine()
+        remove_scratch_dirs()
+    logger.flush_logs()
+
+    own_mb, children_mb = _peak_rss_mb()
+    stages = metrics.summary()["stages"]
+    return {
+        "mode": mode,
+        "files": n_files,
+        "workers": workers,
+        "seconds": elapsed,
+        "files_per_minute": n_files / elapsed * 60 if elapsed else 0.0,
+        "llm_requests": stub.requests - requests_before,
+        "cache": get_cache().stats(),
+        "errors": sum(1 for r in results if r and r.get("status") == "ERROR"),
+        "peak_rss_mb": own_mb,
+        "peak_worker_rss_mb": children_mb,
+        "stages": {
+            name: {"total": agg["total"], "p50": agg["p50"], "p95": agg["p95"], "count": agg["count"]}
+            for name, agg in stages.items()
+        },
+    }
+
+
+def print_report(reports: list) -> None:
+    print(
+        f"\n{'mode':<11} {'files':>6} {'workers':>7} {'seconds':>9} {'files/min':>10} {'LLM req':>8} "
+        f"{'RSS MB':>7} {'worker MB':>9} {'errors':>6}"
+    )
+    for r in reports:
+        print(
+            f"{r['mode']:<11} {r['files']:>6} {r['workers']:>7} {r['seconds']:>9.2f} "
+            f"{r['files_per_minute']:>10.1f} {r['llm_requests']:>8} {r['peak_rss_mb']:>7.0f} "
+            f"{r['peak_worker_rss_mb']:>9.0f} {r['errors']:>6}"
+        )
+        for name, agg in r["stages"].items():
+            print(f"    {name:<16} n={agg['count']:<6} total={agg['total']:.2f}s p50={agg['p50']:.3f}s p95={agg['p95']:.3f}s")
+
+
+def _run_modes(sizes: list, modes: list, args) -> list:
+    """Mesure dans le processus courant (un seul mode par processus, voir _run_child)."""
+    stub = StubGeminiServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed).start()
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir:
+        args.work_dir = work_dir
+        try:
+            for n_files in sizes:
+                for mode in modes:
+                    reports.append(run_mode(mode, n_files, args, stub))
+        finally:
+            stub.stop()
+    return reports
+
+
+def _run_child(mode: str, n_files: int, argv: list) -> list:
+    """Lance un mode dans un processus neuf (mêmes options) et relit son rapport."""
+    with tempfile.TemporaryDirectory(prefix="bench_report_") as report_dir:
+        report_path = os.path.join(report_dir, "report.json")
+        command = [sys.executable, "-m", "benchmarks.run_bench", *argv]
+        command += ["--files", str(n_files), "--modes", mode, "--child", report_path]
+        subprocess.run(command, check=True)
+        with open(report_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark of the refactoring pipeline")
+    parser.add_argument("--files", type=str, default="10,100", help="Comma-separated sandbox sizes (10 to 5000)")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help=f"Comma-separated modes among {MODES}")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--in-flight", type=int, default=100, help="Files in flight in async mode")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--cpu-concurrency", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of 429/503 answers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, default=None, help="Write the report as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline output")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)  # rapport d'un processus par mode
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.files.split(",") if size]
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {sorted(unknown)}")
+
+    if args.child:
+        with open(args.child, "w", encoding="utf-8") as f:
+            json.dump(_run_modes(sizes, modes, args), f)
+        return
+
+    reports = []
+    for n_files in sizes:
+        for mode in modes:
+            print(f"🏁 {mode} on {n_files} files...", flush=True)
+            reports.extend(_run_child(mode, n_files, sys.argv[1:]))
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n📝 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
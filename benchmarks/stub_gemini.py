@@ -0,0 +1,210 @@
+# benchmarks/stub_gemini.py
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Réponses déterministes selon le type de prompt envoyé par les agents
+AUDIT_ISSUES = [
+    "Missing module docstring",
+    "Function lacks a docstring",
+    "Unused import should be removed",
+]
+
+
+def _code_from_prompt(prompt: str) -> str:
+    """Le code est toujours en fin de prompt, après la dernière consigne."""
+    match = re.search(r"^Return ONLY the corrected .*?, nothing else\.\n\n", prompt, flags=re.MULTILINE)
+    if match:
+        return prompt[match.end() :]
+    return prompt.rsplit("\n\n", 1)[-1]
+
+
+def fake_answer(prompt: str) -> str:
+    """Imite Gemini pour l'auditeur, le fixer et le juge."""
+    if "### FILE:" in prompt:
+        files = re.findall(r"^### FILE: (.+)$", prompt, flags=re.MULTILINE)
+        return json.dumps({path: AUDIT_ISSUES[: 1 + len(path) % 3] for path in files})
+    if prompt.startswith("You are a senior Python auditor") and "prefixed with its line number" in prompt:
+        start, end = map(int, re.search(r"lines (\d+)-(\d+) of", prompt).groups())
+        return json.dumps(
+            {
+                "issues": [
+                    {"line": None, "severity": "style", "message": AUDIT_ISSUES[0]},
+                    {"line": start, "severity": "style", "message": AUDIT_ISSUES[1]},
+                    {"line": end, "severity": "warning", "message": AUDIT_ISSUES[2]},
+                ]
+            }
+        )
+    if prompt.startswith("You are a senior Python auditor"):
+        return "\n".join(f"- {issue}" for issue in AUDIT_ISSUES)
+    if prompt.startswith("You are a Python refactoring expert"):
+        code = _code_from_prompt(prompt)
+        if "Return ONLY the corrected definitions" in prompt:
+            return f"```python\n{code.rstrip()}\n```"
+        if not code.lstrip().startswith('"""'):
+            code = '"""Refactored module."""\n' + code
+        return f"```python\n{code.rstrip()}\n```"
+    if prompt.startswith("You are a Python QA engineer"):
+        module = re.search(r"use `from (\w+) import", prompt)
+        name = module.group(1) if module else "module"
+        return f"```python\nimport {name}\n\n\ndef test_module_imports():\n    assert {name} is not None\n```"
+    return "OK"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.server.next_cut():
+            # Corps tronqué puis connexion fermée (réponse coupée en cours de lecture)
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server.count_request()
+
+        time.sleep(server.pick_latency())
+        scripted = server.next_failure()
+        if scripted is not None:
+            status, retry_after = scripted
+            body = json.dumps({"error": {"code": status, "message": "scripted stub error"}}).encode()
+            self._send(status, body, headers={"Retry-After": retry_after} if retry_after is not None else None)
+            return
+        if server.rng_error():
+            status = 429 if server.rng_bool() else 503
+            body = json.dumps({"error": {"code": status, "message": "stub error"}}).encode()
+            self._send(status, body, headers={"Retry-After": "0"} if status == 429 else None)
+            return
+
+        prompt = payload.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+        text = fake_answer(prompt)
+        usage = {
+            "promptTokenCount": max(1, len(prompt) // 4),
+            "candidatesTokenCount": max(1, len(text) // 4),
+        }
+        usage["totalTokenCount"] = usage["promptTokenCount"] + usage["candidatesTokenCount"]
+
+        if ":streamGenerateContent" in self.path:
+            events = []
+            pieces = [text[i : i + 64] for i in range(0, len(text), 64)] or [""]
+            for index, piece in enumerate(pieces):
+                event = {"candidates": [{"content": {"parts": [{"text": piece}]}}]}
+                if index == len(pieces) - 1:
+                    event["usageMetadata"] = usage
+                events.append(f"data: {json.dumps(event)}\r\n\r\n")
+            self._send(200, "".join(events).encode(), content_type="text/event-stream")
+        else:
+            body = {
+                "candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}],
+                "usageMetadata": usage,
+            }
+            self._send(200, json.dumps(body).encode())
+
+
+class StubGeminiServer(ThreadingHTTPServer):
+    """
+    Faux generateContent / streamGenerateContent local.
+    latency : secondes ajoutées à chaque réponse (± jitter) ;
+    error_rate : proportion de réponses 429/503 (pour exercer les retries) ;
+    fail_next() : erreurs imposées aux prochaines requêtes, dans l'ordre (tests) ;
+    cut_next() : réponses dont le corps est coupé à mi-chemin (tests).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._failures = []
+        self._cuts = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v1beta"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def pick_latency(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def fail_next(self, status: int, retry_after: str = None, times: int = 1) -> None:
+        """Les `times` prochaines requêtes répondent `status` (avec l'en-tête Retry-After si donné)."""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * times)
+
+    def cut_next(self, times: int = 1) -> None:
+        """Les `times` prochaines réponses s'arrêtent au milieu du corps annoncé."""
+        with self._lock:
+            self._cuts += times
+
+    def next_cut(self) -> bool:
+        with self._lock:
+            if not self._cuts:
+                return False
+            self._cuts -= 1
+            return True
+
+    def next_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def rng_error(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def rng_bool(self) -> bool:
+        with self._lock:
+            return self._rng.random() < 0.5
+
+    def start(self) -> "StubGeminiServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubGeminiServer(args.port, args.latency, args.jitter, args.error_rate)
+    print(f"🤖 Stub Gemini on {server.base_url} (export GEMINI_BASE_URL={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
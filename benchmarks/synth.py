@@ -0,0 +1,91 @@
+# benchmarks/synth.py
+import os
+import random
+import shutil
+
+# Gabarits de fonctions de complexité croissante (avec des défauts pylint volontaires)
+SMALL_FUNC = '''
+def {name}(a, b):
+    return a + b * {k}
+'''
+
+MEDIUM_FUNC = '''
+def {name}(values, threshold={k}):
+    """Filter and aggregate values."""
+    result = []
+    for v in values:
+        if v > threshold:
+            result.append(v * 2)
+        elif v == threshold:
+            result.append(v)
+        else:
+            pass
+    total = 0
+    for r in result:
+        total = total + r
+    return total
+'''
+
+LARGE_CLASS = '''
+class {cls}:
+    def __init__(self, size={k}):
+        self.size = size
+        self.items = []
+
+    def add(self, item):
+        if len(self.items) >= self.size:
+            raise ValueError("full")
+        self.items.append(item)
+
+    def find(self, item):
+        for i in range(len(self.items)):
+            if self.items[i] == item:
+                return i
+        return -1
+
+    def stats(self):
+        if not self.items:
+            return None
+        mean = sum(self.items) / len(self.items)
+        var = sum((x - mean) ** 2 for x in self.items) / len(self.items)
+        return {{"mean": mean, "var": var, "min": min(self.items), "max": max(self.items)}}
+'''
+
+HEADERS = ["import os\nimport sys\n", "import math\n", "from typing import List\n", ""]
+
+
+def make_module(rng: random.Random, index: int) -> str:
+    """Module synthétique : petit (1-2 fonctions), moyen ou gros (classes + fonctions)."""
+    kind = rng.choices(["small", "medium", "large"], weights=[6, 3, 1])[0]
+    parts = [rng.choice(HEADERS)]
+    if kind == "small":
+        count = rng.randint(1, 2)
+        parts += [SMALL_FUNC.format(name=f"func_{index}_{i}", k=rng.randint(1, 9)) for i in range(count)]
+    elif kind == "medium":
+        count = rng.randint(2, 5)
+        parts += [MEDIUM_FUNC.format(name=f"process_{index}_{i}", k=rng.randint(1, 9)) for i in range(count)]
+    else:
+        count = rng.randint(2, 6)
+        parts += [LARGE_CLASS.format(cls=f"Store{index}_{i}", k=rng.randint(5, 50)) for i in range(count)]
+        parts += [MEDIUM_FUNC.format(name=f"helper_{index}_{i}", k=i) for i in range(count)]
+    return "\n".join(parts)
+
+
+def generate_sandbox(root: str, n_files: int, seed: int = 0, files_per_dir: int = 50) -> list:
+    """
+    Crée (en écrasant) un sandbox synthétique de n_files modules sous root.
+    Les fichiers sont répartis dans des sous-dossiers de files_per_dir modules.
+    Retourne la liste des chemins créés.
+    """
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(n_files):
+        directory = os.path.join(root, f"pkg_{index // files_per_dir:03d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"mod_{index:05d}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_module(rng, index))
+        paths.append(path)
+    return paths
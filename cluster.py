@@ -0,0 +1,453 @@
+# cluster.py
+"""
+Mode distribué : un coordinateur répartit les fichiers d'un dossier entre des
+workers (processus locaux ou sur d'autres machines), qui les traitent avec
+process_file et renvoient résultats, entrées du journal et mesures.
+
+    python cluster.py coordinator --target_dir sandbox/project --spawn 3
+    python cluster.py worker --coordinator http://host:8750 --workers 4
+
+Chaque fichier est prêté à un worker avec un bail, renouvelé tant qu'il y
+travaille. Si le worker meurt, le bail expire et le fichier est repris par
+un autre. Les quotas de la run (--rpm, --tpm, --token-budget) sont ceux du
+coordinateur : chaque réponse de bail ou de renouvellement donne au worker
+sa part, recalculée selon le nombre de workers actifs. Le dossier cible doit être visible de tous les workers (même
+machine ou disque partagé ; --target_dir côté worker si le point de montage
+diffère).
+
+API du coordinateur (JSON) :
+    GET  /run        paramètres de la run (run_id, dossier, bail...)
+    POST /lease      {"worker", "count", "spent"} -> {"tasks": [[fichier, jeton]], "finished", "retry_after", "allowance"}
+    POST /renew      {"worker", "tokens", "spent"} -> {"valid": [...], "allowance"}
+    POST /complete   {"worker", "token", "result", "logs", "metrics"} -> {"accepted"}
+    POST /release    {"worker"}  (arrêt propre : ses fichiers repartent en attente)
+    GET  /status     avancement et workers connus
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from main import get_api_key, print_summary, process_file
+from src.utils import metrics
+from src.utils.cache import configure_cache
+from src.utils.discovery import ORDERS, iter_python_files, order_files
+from src.utils.history import DEFAULT_HISTORY_PATH, ingest_run_log
+from src.utils.leases import DEFAULT_LEASE_SECONDS, Allowances, LeaseTable
+from src.utils.lint import close_engine, configure_engine
+from src.utils.llm_client import configure_client, get_client, rate_limits
+from src.utils.logger import append_entries, capture_logs, export_json, flush_logs, start_run
+from src.utils.manifest import RunManifest
+from src.utils.model_router import configure_router
+from src.utils.scheduler import DEFAULT_CPU_SLOTS, configure_limits, run_files
+from src.utils.test_runner import DEFAULT_TEST_TIMEOUT, close_test_pool, configure_test_pool
+from src.utils.tool import validate_sandbox_path
+from src.utils.workspace import remove_scratch_dirs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+# Un worker sans travail disponible redemande après RETRY_AFTER secondes
+RETRY_AFTER = 1.0
+
+
+# =========================================================
+# Coordinateur
+# =========================================================
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    server_version = "RefactoringSwarm/1.0"
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        table = self.server.table
+        if path == "/run":
+            self._send(200, self.server.run)
+        elif path == "/status":
+            workers = {name: {"idle": round(idle, 1), "files": busy} for name, (idle, busy) in table.workers().items()}
+            self._send(200, {"files": table.counts(), "requeued": table.requeued, "workers": workers})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _allowance(self, worker: str, spent) -> dict:
+        # Workers actifs : vus depuis moins d'une durée de bail
+        lease = self.server.run["lease"]
+        active = sum(1 for idle, _ in self.server.table.workers().values() if idle < lease)
+        return self.server.allowances.grant(worker, spent, active)
+
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            worker = str(body["worker"])
+        except (ValueError, KeyError, TypeError):
+            return self._send(400, {"error": "JSON body with a worker name is required"})
+
+        table = self.server.table
+        if path == "/lease":
+            tasks = table.acquire(worker, max(1, int(body.get("count", 1))))
+            self._send(
+                200,
+                {
+                    "tasks": tasks,
+                    "finished": table.finished(),
+                    "retry_after": RETRY_AFTER,
+                    "allowance": self._allowance(worker, body.get("spent")),
+                },
+            )
+        elif path == "/renew":
+            valid = table.renew(worker, body.get("tokens", []))
+            self._send(200, {"valid": valid, "allowance": self._allowance(worker, body.get("spent"))})
+        elif path == "/complete":
+            self._send(200, {"accepted": self.server.complete(worker, body)})
+        elif path == "/release":
+            self._send(200, {"released": table.release(worker)})
+        else:
+            self._send(404, {"error": "not found"})
+
+
+def _spawn_workers(count: int, url: str, threads: int) -> list:
+    """Workers sur cette machine, chacun avec sa console dans logs/worker-<n>.log."""
+    os.makedirs("logs", exist_ok=True)
+    processes = []
+    for index in range(count):
+        log = open(os.path.join("logs", f"worker-{index}.log"), "w", encoding="utf-8")
+        command = [
+            sys.executable,
+            os.path.abspath(__file__),
+            "worker",
+            "--coordinator",
+            url,
+            "--workers",
+            str(threads),
+            "--name",
+            f"{socket.gethostname()}-local{index}",
+        ]
+        processes.append((subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT), log))
+    return processes
+
+
+def coordinate(args) -> int:
+    target_dir = os.path.normpath(args.target_dir)
+    validate_sandbox_path(target_dir)
+    manifest = RunManifest(target_dir)
+
+    files = iter_python_files(target_dir)
+    skipped = []
+    if args.incremental:
+        changed = []
+        for file_path in files:
+            (skipped if manifest.is_unchanged(file_path) else changed).append(file_path)
+        files = changed
+    if args.order != "discovery":
+        files = order_files(files, args.order, manifest)
+
+    table = LeaseTable(lease_seconds=args.lease)
+    for file_path in files:
+        table.add(file_path)
+    total = table.counts()["pending"]
+
+    run_id = start_run()
+    get_api_key()  # charge le .env (GEMINI_RPM / GEMINI_TPM)
+    rpm, tpm = rate_limits(args.rpm, args.tpm)
+    allowances = Allowances(rpm, tpm, args.token_budget)
+    done = [0]
+    done_lock = threading.Lock()
+
+    def complete(worker: str, body: dict) -> bool:
+        # Journal et mesures toujours fusionnés (appels réellement faits), résultat seulement si le bail est valide
+        append_entries(body.get("logs", []))
+        metrics.merge(body.get("metrics", []))
+        allowances.report(worker, body.get("spent"))
+        result = body.get("result") or {}
+        accepted = table.complete(str(body.get("token")), result)
+        if not accepted:
+            print(f"⚠️  Stale result for {result.get('file')} from {worker} ignored (lease expired)", flush=True)
+            return False
+        manifest.record(result["file"], result)
+        with done_lock:
+            done[0] += 1
+            print(f"   [{done[0]}/{total}] {result.get('status', '?'):<9} {result['file']}  ({worker})", flush=True)
+        return True
+
+    server = ThreadingHTTPServer((args.host, args.port), _CoordinatorHandler)
+    server.daemon_threads = True
+    server.table = table
+    server.complete = complete
+    server.allowances = allowances
+    server.run = {
+        "run_id": run_id,
+        "target_dir": target_dir,
+        "speculative": args.speculative,
+        "lease": args.lease,
+        "rpm": rpm,
+        "tpm": tpm,
+        "token_budget": args.token_budget,
+        "routing": not args.no_routing,
+    }
+    threading.Thread(target=server.serve_forever, name="coordinator", daemon=True).start()
+    url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"🛰️  Coordinator on {url}: {total} files, lease {args.lease:.0f}s (run {run_id})", flush=True)
+
+    spawned = _spawn_workers(args.spawn, url, args.spawn_workers) if args.spawn else []
+    if spawned:
+        print(f"👷 {len(spawned)} local workers started (logs/worker-<n>.log)", flush=True)
+
+    start = time.monotonic()
+    try:
+        results = table.wait_all()
+        # Les workers apprennent la fin de la run à leur prochaine demande de bail
+        for process, log in spawned:
+            try:
+                process.wait(timeout=max(10.0, 3 * RETRY_AFTER))
+            except subprocess.TimeoutExpired:
+                process.terminate()
+            log.close()
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted: results received so far are kept in the manifest")
+        for process, log in spawned:
+            process.terminate()
+            log.close()
+        return 130
+    finally:
+        server.shutdown()
+        server.server_close()
+        manifest.save()
+
+    print(f"\n⏱️  {total} files in {time.monotonic() - start:.1f}s, {table.requeued} lease(s) requeued")
+    if args.incremental:
+        print(f"⏭️  Incremental: {len(skipped)} unchanged files skipped")
+    print_summary(results)
+    metrics.print_summary()
+    limit = f" of {args.token_budget}" if args.token_budget is not None else ""
+    print(f"\n💰 Tokens: {allowances.spent()}{limit} used by the workers")
+    exported = export_json()
+    print(f"📝 {exported} log entries exported to logs/experiment_data.json")
+    print(f"🗄️  {ingest_run_log()} entries added to {DEFAULT_HISTORY_PATH}")
+    return 0
+
+
+# =========================================================
+# Worker
+# =========================================================
+
+
+def _call(url: str, payload: dict = None, attempts: int = 3):
+    """Requête JSON au coordinateur ; None s'il reste injoignable (run terminée ou coordinateur arrêté)."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    for attempt in range(attempts):
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            print(f"⚠️  Coordinator answered {e.code} to {url}", flush=True)
+            return None
+        except OSError:
+            if attempt + 1 < attempts:
+                time.sleep(RETRY_AFTER)
+    return None
+
+
+def work(args) -> int:
+    api_key = get_api_key()
+    if not api_key:
+        print("❌ API_KEY not found in the environment variables. Please ensure it's set in the .env file.")
+        return 1
+
+    base_url = args.coordinator.rstrip("/")
+    run = _call(f"{base_url}/run", attempts=10)
+    if run is None:
+        print(f"❌ No coordinator at {base_url}")
+        return 1
+    name = args.name or f"{socket.gethostname()}-{os.getpid()}"
+    root = os.path.normpath(args.target_dir or run["target_dir"])
+    validate_sandbox_path(root)
+    start_run(run["run_id"])  # entrées du journal rattachées à la run du coordinateur
+
+    configure_limits(llm_slots=args.llm_concurrency, cpu_slots=args.cpu_concurrency)
+    # Quotas de la run : la part de ce worker arrive avec chaque bail (apply_allowance)
+    client = configure_client(
+        requests_per_minute=run["rpm"], tokens_per_minute=run["tpm"], token_budget=run["token_budget"]
+    )
+    configure_router(adaptive=run["routing"])
+    configure_cache(enabled=not args.no_cache)
+    cpu_slots = args.cpu_concurrency or DEFAULT_CPU_SLOTS
+    configure_test_pool(size=min(args.workers, cpu_slots), test_timeout=args.test_timeout)
+    configure_engine(size=min(args.workers, cpu_slots))
+    print(f"👷 Worker {name} on {base_url} ({args.workers} threads, files under {root})", flush=True)
+
+    held = {}  # chemin local -> (chemin côté coordinateur, jeton)
+    held_lock = threading.Lock()
+    # Un bail n'est demandé que quand un thread est libre : pas de fichier qui attend chez un worker occupé
+    free = threading.Semaphore(args.workers)
+    stop = threading.Event()
+
+    def local_path(file_path: str) -> str:
+        return os.path.join(root, os.path.relpath(file_path, run["target_dir"]))
+
+    def apply_allowance(reply: dict) -> None:
+        allowance = reply.get("allowance") or {}
+        if "rpm" in allowance:
+            client.limiter.resize(allowance["rpm"], allowance["tpm"])
+        if "token_limit" in allowance:
+            client.budget.set_limit(allowance["token_limit"])
+
+    def leased_files():
+        while True:
+            free.acquire()
+            while True:
+                reply = _call(f"{base_url}/lease", {"worker": name, "count": 1, "spent": client.budget.spent()})
+                if reply is None or (reply["finished"] and not reply["tasks"]):
+                    free.release()
+                    return
+                apply_allowance(reply)
+                if reply["tasks"]:
+                    break
+                time.sleep(reply["retry_after"])
+            file_path, token = reply["tasks"][0]
+            path = local_path(file_path)
+            with held_lock:
+                held[path] = (file_path, token)
+            yield path
+
+    def heartbeat():
+        while not stop.wait(run["lease"] / 3):
+            with held_lock:
+                tokens = {token: path for path, (_, token) in held.items()}
+            if not tokens:
+                continue
+            reply = _call(
+                f"{base_url}/renew", {"worker": name, "tokens": list(tokens), "spent": client.budget.spent()}
+            )
+            if reply:
+                apply_allowance(reply)
+            for token in set(tokens) - set(reply["valid"] if reply else tokens):
+                print(f"⚠️  Lease lost for {tokens[token]}: another worker may take it over", flush=True)
+
+    def process_and_report(path: str, api_key: str) -> dict:
+        file_path, token = held[path]
+        metrics.set_current_file(path)
+        try:
+            # Journal et mesures de ce bail seulement (pas ceux d'un bail précédent sur le même fichier)
+            with capture_logs() as entries, metrics.capture() as measures:
+                try:
+                    with metrics.stage("file"):
+                        result = process_file(path, api_key, speculative=run["speculative"])
+                except Exception as e:
+                    traceback.print_exc()
+                    result = {"file": path, "status": "ERROR", "error": str(e)}
+            # Chemins du coordinateur dans tout ce qui lui est renvoyé
+            for entry in entries:
+                if entry.get("file") == path:
+                    entry["file"] = file_path
+            records = [{**r, "file": file_path if r["file"] == path else r["file"]} for r in measures]
+            result = {**result, "file": file_path, "worker": name}
+            reply = _call(
+                f"{base_url}/complete",
+                {
+                    "worker": name,
+                    "token": token,
+                    "result": result,
+                    "logs": entries,
+                    "metrics": records,
+                    "spent": client.budget.spent(),
+                },
+            )
+            if reply is None:
+                append_entries(entries)  # coordinateur injoignable : le journal local les garde
+            elif not reply["accepted"]:
+                print(f"⚠️  Result for {file_path} refused: the lease had expired")
+            return result
+        finally:
+            with held_lock:
+                held.pop(path, None)
+            free.release()
+
+    threading.Thread(target=heartbeat, name="heartbeat", daemon=True).start()
+    try:
+        results = run_files(leased_files(), process_and_report, api_key, workers=args.workers)
+    except KeyboardInterrupt:
+        released = _call(f"{base_url}/release", {"worker": name}, attempts=1)
+        print(f"\n🛑 Worker stopped, {released['released'] if released else 0} file(s) handed back")
+        return 130
+    finally:
+        stop.set()
+        close_test_pool()
+        close_engine()
+        remove_scratch_dirs()
+        flush_logs()
+    print(f"✅ Worker {name} done: {len(results)} files processed")
+    get_client().budget.print_summary()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distributed refactoring (coordinator + workers)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = commands.add_parser("coordinator", help="Share the files of a directory between workers")
+    coordinator_parser.add_argument("--target_dir", type=str, required=True)
+    coordinator_parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    coordinator_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator_parser.add_argument(
+        "--lease",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help="Seconds before the file of a silent worker is given to another one",
+    )
+    coordinator_parser.add_argument("--incremental", action="store_true")
+    coordinator_parser.add_argument("--order", choices=ORDERS, default="discovery")
+    coordinator_parser.add_argument("--speculative", type=int, default=1)
+    coordinator_parser.add_argument("--spawn", type=int, default=0, help="Also start this many local workers")
+    coordinator_parser.add_argument("--spawn-workers", type=int, default=2, help="Threads of each local worker")
+    coordinator_parser.add_argument(
+        "--rpm", type=int, default=None, help="Requests per minute of the whole run (default: GEMINI_RPM or 60)"
+    )
+    coordinator_parser.add_argument(
+        "--tpm", type=int, default=None, help="Tokens per minute of the whole run (default: GEMINI_TPM or 1000000)"
+    )
+    coordinator_parser.add_argument(
+        "--token-budget", type=int, default=None, help="Token budget of the whole run, shared by the workers"
+    )
+    coordinator_parser.add_argument("--no-routing", action="store_true")
+
+    worker_parser = commands.add_parser("worker", help="Process files leased by a coordinator")
+    worker_parser.add_argument("--coordinator", type=str, default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    worker_parser.add_argument("--workers", type=int, default=4, help="Files processed concurrently")
+    worker_parser.add_argument(
+        "--target_dir", type=str, default=None, help="Local path of the coordinator's directory (if mounted elsewhere)"
+    )
+    worker_parser.add_argument("--name", type=str, default=None)
+    worker_parser.add_argument("--llm-concurrency", type=int, default=None)
+    worker_parser.add_argument("--cpu-concurrency", type=int, default=None)
+    worker_parser.add_argument("--no-cache", action="store_true")
+    worker_parser.add_argument("--test-timeout", type=float, default=DEFAULT_TEST_TIMEOUT)
+
+    args = parser.parse_args()
+    sys.exit(coordinate(args) if args.command == "coordinator" else work(args))
+
+
+if __name__ == "__main__":
+    main()
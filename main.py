@@ -1,106 +1,330 @@
 # main.py
 import argparse
+import asyncio
 import os
-from dotenv import load_dotenv
-from src.agents.auditor import analyze_code
-from src.agents.fixer import fix_code
-from src.agents.judge import run_tests
-from src.utils.logger import log_experiment, ActionType
+from src.agents.auditor import analyze_code, analyze_code_async, analyze_codes
+from src.agents.fixer import fix_code, fix_code_async
+from src.agents.judge import forget_failures, generate_test_file, generate_test_file_async, run_tests, run_tests_async
+from src.agents.speculative import race_fixes
+from src.utils.logger import log_experiment, ActionType, export_json
 from src.utils.tool import validate_sandbox_path
-from src.utils.tool import list_python_files
-import subprocess
-import re
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Get the API key from the .env file (your .env key name)
-API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Ensure the API key is loaded
-if not API_KEY:
-    print(
-        "❌ API_KEY not found in the environment variables. Please ensure it's set in the .env file."
-    )
-    exit(1)
+from src.utils.discovery import ORDERS, iter_python_files, order_files
+from src.utils import metrics
+from src.utils.async_llm import get_async_client
+from src.utils.autofix import AutofixResult, fix_source, format_message
+from src.utils.cache import configure_cache
+from src.utils.code_units import changed_unit_names
+from src.utils.llm_client import configure_client, get_client
+from src.utils.lint import close_engine, configure_engine, lint_file
+from src.utils.manifest import RunManifest
+from src.utils.model_router import configure_router, cost, current_model, escalate, start_file
+from src.utils.source_cache import get_sources
+from src.utils.scheduler import DEFAULT_CPU_SLOTS, configure_limits, cpu_slot, run_files, run_files_async
+from src.utils.test_runner import DEFAULT_TEST_TIMEOUT, close_test_pool, configure_test_pool
+from src.utils.tool import read_file, read_source, write_file
+from src.utils.workspace import Scratch, remove_scratch_dirs
+
+_api_key = None
+
+
+def get_api_key() -> str:
+    """Clé API (GOOGLE_API_KEY), lue au premier appel : le .env n'est chargé qu'à ce moment-là."""
+    global _api_key
+    if _api_key is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _api_key = os.getenv("GOOGLE_API_KEY")
+    return _api_key
 
 MAX_FIXER_RETRIES = 3  # bounded to avoid infinite loops
 
 
 def get_pylint_score(file_path: str) -> float:
-    """Exécute pylint et retourne le score."""
+    """Analyse le fichier avec un worker pylint déjà chaud et retourne le score."""
     try:
-        result = subprocess.run(
-            ["pylint", file_path], capture_output=True, text=True, timeout=30
-        )
-        output = result.stdout + result.stderr
-        match = re.search(r"rated at ([\d\.]+)/10", output)
-        if match:
-            return float(match.group(1))
-        else:
-            return 0.0
+        with metrics.stage("pylint"):
+            result = lint_file(file_path, slot=cpu_slot)
+        if result.error:
+            print(f"⚠️ Pylint error: {result.error}")
+        return result.score
     except Exception as e:
         print(f"⚠️ Pylint error: {e}")
         return 0.0
 
 
-def process_file(file_path: str, api_key: str):
-    """Process a single file through auditing, fixing, and testing with feedback loop."""
-    print(f"🚀 Processing: {file_path}")
+async def _agent(use_async: bool, blocking, coroutine, *args, **kwargs):
+    """Appelle la version asynchrone d'un agent, ou sa version bloquante en mode synchrone."""
+    if use_async:
+        return await coroutine(*args, **kwargs)
+    return blocking(*args, **kwargs)
+
+
+async def _pylint_score_async(file_path: str) -> float:
+    # Workers pylint (un par place CPU) : attendus depuis un thread
+    return await asyncio.to_thread(get_pylint_score, file_path)
+
+
+def apply_local_fixes(file_path: str, api_key: str, module_name: str, tests_passed: bool = None):
+    """
+    Corrige sur place les messages pylint mécaniques (src/utils/autofix.py), sans LLM.
+    Si les tests existants passaient, ils doivent encore passer, sinon rien n'est écrit.
+    Retourne l'AutofixResult (messages restants compris), ou None si pylint a échoué.
+    """
+    with metrics.stage("autofix"):
+        lint = lint_file(file_path, slot=cpu_slot)
+        if lint.error:
+            return None
+        original = read_file(file_path)
+        result = fix_source(original, lint.messages)
+    if not result.changed:
+        return result
+
+    with Scratch(file_path, label="autofix") as workspace:
+        workspace.write(result.source)
+        if tests_passed:
+            success, _ = run_tests(
+                workspace.file_path,
+                api_key,
+                module_name,
+                generate_tests=False,
+                changed_units=changed_unit_names(original, result.source),
+            )
+            if not success:
+                print(f"⚠️  Local fixes break the existing tests, discarded")
+                return AutofixResult(source=original, remaining=list(lint.messages))
+        workspace.commit()
 
-    # SAUVEGARDER le code original
-    from src.utils.tool import read_file, write_file
+    log_experiment(
+        agent_name="LocalFixer",
+        model_used="autofix",
+        action=ActionType.FIX,
+        details={
+            "file": file_path,
+            "applied": result.applied,
+            "remaining": len(result.remaining),
+            "input_prompt": f"Autofix {file_path}",
+            "output_response": ", ".join(f"{s} x{n}" for s, n in sorted(result.applied.items())),
+        },
+        status="SUCCESS",
+    )
+    return result
+
+
+async def _local_fixes_async(file_path: str, api_key: str, module_name: str, tests_passed: bool = None):
+    return await asyncio.to_thread(apply_local_fixes, file_path, api_key, module_name, tests_passed)
+
+
+def _file_result(file_path: str, status: str, score_before: float, score_after: float, test_success) -> dict:
+    return {
+        "file": file_path,
+        "status": status,
+        "score_before": score_before,
+        "score_after": score_after,
+        "test_success": test_success,
+    }
+
+
+async def _fix_in_workspace(
+    workspace: Scratch,
+    issues: list,
+    api_key: str,
+    module_name: str,
+    score_before: float,
+    skip_test_generation: bool,
+    use_async: bool,
+    speculative: int,
+) -> bool:
+    """Étapes 4-5 (fix, tests, re-fix) sur la copie de travail. Retourne le succès des tests."""
+    fixed_file = workspace.file_path
+    original_code = read_file(workspace.origin)
+
+    # 4a. Mode spéculatif : K corrections en parallèle, jugées sur les mêmes tests
+    winner = best = None
+    if speculative > 1:
+        if not skip_test_generation:
+            # Tests générés une seule fois, à partir du code d'origine, pour tous les candidats
+            print(f"🧪 Generating tests for the candidates...")
+            skip_test_generation = await _agent(
+                use_async, generate_test_file, generate_test_file_async, fixed_file, api_key, module_name
+            )
+        if os.path.exists(workspace.test_path):
+            print(f"🏁 Racing {speculative} fix candidates...")
+            with metrics.stage("fix"):
+                winner, best = await race_fixes(workspace, issues, api_key, score_before, speculative, use_async)
+        if best is not None and best.score < score_before - 1.0:
+            best = None  # même règle que le retour à l'original ci-dessous
+
+    if winner is not None:
+        print(f"🏆 Candidate {winner.index} (temperature {winner.temperature}) passes the tests")
+        write_file(fixed_file, winner.code)
+        success, feedback = True, winner.output
+    elif best is not None:
+        print(f"🏁 No candidate passes the tests, keeping candidate {best.index} for the re-fix")
+        write_file(fixed_file, best.code)
+        success, feedback = False, best.output
+    else:
+        # 4. Fixer (UNE SEULE FOIS d'abord)
+        print(f"🔧 Fixing issues...")
+        with metrics.stage("fix"):
+            await _agent(use_async, fix_code, fix_code_async, fixed_file, issues, api_key)
+
+        # Vérifier qualité après fixing
+        score_after_fix = await _agent(use_async, get_pylint_score, _pylint_score_async, fixed_file)
+        print(f"📊 Pylint AFTER fix: {score_after_fix:.2f}/10")
+
+        # Si qualité baisse BEAUCOUP, la copie repart de l'original
+        if score_after_fix < score_before - 1.0:
+            print(f"⚠️  CRITICAL: Fixing DEGRADED quality significantly!")
+            print(f"⚠️  Restoring original version...")
+            workspace.revert()
+            # Une seconde chance avec un modèle plus fort (s'il en reste un)
+            if escalate("score drop"):
+                with metrics.stage("fix"):
+                    await _agent(use_async, fix_code, fix_code_async, fixed_file, issues, api_key)
+                score_after_fix = await _agent(use_async, get_pylint_score, _pylint_score_async, fixed_file)
+                print(f"📊 Pylint AFTER fix ({current_model()}): {score_after_fix:.2f}/10")
+                if score_after_fix < score_before - 1.0:
+                    print(f"⚠️  Still degraded, restoring original version...")
+                    workspace.revert()
+
+        # 5. Tests finaux (tests existants : d'abord ceux qui touchent le code modifié)
+        print(f"🧪 Running tests (generate: {not skip_test_generation})...")
+        changed = None
+        if skip_test_generation:
+            changed = changed_unit_names(original_code, read_file(fixed_file))
+        success, feedback = await _agent(
+            use_async,
+            run_tests,
+            run_tests_async,
+            fixed_file,
+            api_key,
+            module_name,
+            generate_tests=not skip_test_generation,
+            changed_units=changed,
+        )
 
-    original_code = read_file(file_path)
+    # UNE seule tentative de re-fix si échec
+    if not success and MAX_FIXER_RETRIES > 0:
+        print(f"❌ Tests failed, trying ONE re-fix with feedback...")
+        escalate("tests failed")
+        # Limiter le feedback aux premières lignes
+        short_feedback = "\n".join(feedback.split("\n")[:10])
+        code_before_refix = read_file(fixed_file)
+        with metrics.stage("fix"):
+            await _agent(
+                use_async,
+                fix_code,
+                fix_code_async,
+                fixed_file,
+                issues,
+                api_key,
+                judge_feedback=short_feedback,
+            )
 
-    # 1. Vérifier Pylint initial
-    score_before = get_pylint_score(file_path)
-    print(f"📊 Pylint BEFORE: {score_before:.2f}/10")
+        # Re-tester : tests en échec + tests touchés par le re-fix, puis le reste
+        success, feedback = await _agent(
+            use_async,
+            run_tests,
+            run_tests_async,
+            fixed_file,
+            api_key,
+            module_name,
+            generate_tests=False,
+            changed_units=changed_unit_names(code_before_refix, read_file(fixed_file)),
+        )
+    return success
+
+
+async def process_file_async(
+    file_path: str, api_key: str, issues: list = None, use_async: bool = True, speculative: int = 1
+) -> dict:
+    """
+    Process a single file through auditing, fixing, and testing with feedback loop.
+    `issues` may come from a batched pre-audit; otherwise the auditor runs here.
+    With use_async=False the blocking agents are called directly (see process_file).
+    With speculative > 1 the first fix is raced between that many candidates.
+    Returns a summary dict (file, status, scores, test result).
+    """
+    try:
+        return await _process_file(file_path, api_key, issues, use_async, speculative)
+    finally:
+        forget_failures(file_path)  # état par fichier du juge : inutile une fois le fichier terminé
 
-    # Si code EXCELLENT (>9.0) ET tests existants ET passent → SKIP
-    if score_before >= 9.0:
-        module_name = os.path.splitext(os.path.basename(file_path))[0]
-        test_path = f"{file_path.replace('.py', '_test.py')}"
 
-        if os.path.exists(test_path):
-            success, _ = run_tests(
-                file_path, api_key, module_name, generate_tests=False
-            )
-            if success:
-                print(f"✅ Code already OPTIMAL! (Pylint: {score_before}, tests pass)")
-                print(f"📈 No action needed")
-                return
+async def _process_file(file_path: str, api_key: str, issues: list, use_async: bool, speculative: int) -> dict:
+    print(f"🚀 Processing: {file_path}")
+
+    # 1. Vérifier Pylint initial
+    score_before = await _agent(use_async, get_pylint_score, _pylint_score_async, file_path)
+    print(f"📊 Pylint BEFORE: {score_before:.2f}/10")
 
-    # 2. Vérifier tests existants
+    # 2. Vérifier tests existants (None : pas de fichier de tests)
     module_name = os.path.splitext(os.path.basename(file_path))[0]
     test_path = f"{file_path.replace('.py', '_test.py')}"
 
-    skip_test_generation = False
-
+    tests_passed, feedback = None, ""
     if os.path.exists(test_path):
-        success, feedback = run_tests(
-            file_path, api_key, module_name, generate_tests=False
+        tests_passed, feedback = await _agent(
+            use_async, run_tests, run_tests_async, file_path, api_key, module_name, generate_tests=False
         )
-        if success:
-            print(f"✅ Existing tests PASS")
-            skip_test_generation = True
-        else:
-            print(f"❌ Existing tests FAIL")
-            skip_test_generation = False
+        print(f"✅ Existing tests PASS" if tests_passed else f"❌ Existing tests FAIL")
+    skip_test_generation = bool(tests_passed)
+
+    # 2b. Corrections locales (espaces, imports inutilisés...) : sans LLM
+    local = await _agent(
+        use_async, apply_local_fixes, _local_fixes_async, file_path, api_key, module_name, tests_passed
+    )
+    score_local = score_before
+    if local is not None and local.changed:
+        print(f"🧹 Fixed locally: " + ", ".join(f"{s} x{n}" for s, n in sorted(local.applied.items())))
+        score_local = await _agent(use_async, get_pylint_score, _pylint_score_async, file_path)
+        print(f"📊 Pylint AFTER local fixes: {score_local:.2f}/10")
+    done_status = "AUTOFIXED" if local is not None and local.changed else "SKIPPED"
+
+    # Si code EXCELLENT (>9.0) ET tests existants ET passent → SKIP
+    if score_local >= 9.0 and tests_passed:
+        print(f"✅ Code already OPTIMAL! (Pylint: {score_local}, tests pass)")
+        print(f"📈 No action needed")
+        return _file_result(file_path, done_status, score_before, score_local, True)
+
+    # Plus aucun message pylint et pas de test en échec : rien à envoyer au LLM
+    if local is not None and not local.remaining and tests_passed is not False:
+        print(f"✅ No issue left after local fixes, no LLM call needed")
+        return _file_result(file_path, done_status, score_before, score_local, tests_passed)
+
+    # Budget de tokens épuisé : le fichier (corrections locales faites) attendra une autre run
+    if get_client().budget.exhausted():
+        print(f"💸 Token budget exhausted, no LLM call for this file")
+        return _file_result(file_path, "BUDGET", score_before, score_local, tests_passed)
+
+    # Modèle du fichier : rapide si petit ou à faible risque, plus fort après un échec
+    route = start_file(file_path, read_source(file_path).tokens, score_local, tests_passed)
+    print(f"🧭 Model: {route.model}")
 
     # 3. Auditor (toujours exécuté sauf si code optimal)
-    print(f"🔍 Running auditor...")
-    issues = analyze_code(file_path, api_key)
+    if issues is None:
+        print(f"🔍 Running auditor...")
+        with metrics.stage("audit"):
+            issues = await _agent(use_async, analyze_code, analyze_code_async, file_path, api_key)
+    else:
+        print(f"🔍 Using batched audit result")
 
     if not issues or issues == ["Gemini API error during analysis"]:
         print(f"ℹ️  No issues found by auditor")
 
         # Si Pylint déjà bon ET tests passent → fin
-        if score_before >= 8.0 and skip_test_generation:
+        if score_local >= 8.0 and tests_passed:
             print(f"✅ Code already good enough")
-            return
+            return _file_result(file_path, done_status, score_before, score_local, True)
 
-        issues = ["Code could use minor improvements"]  # Forcer une petite amélioration
+        # Sinon, seulement de vrais problèmes : messages pylint restants, tests en échec
+        issues = [format_message(m) for m in local.remaining] if local is not None else []
+        if not issues and tests_passed is False:
+            issues = ["Existing tests fail:\n" + "\n".join(feedback.split("\n")[:10])]
+        if not issues:
+            print(f"✅ Nothing left to fix")
+            return _file_result(file_path, done_status, score_before, score_local, tests_passed)
 
     print(f"🔍 Auditor found {len(issues)} issues")
     for i, issue in enumerate(issues[:3], 1):  # Afficher 3 premières issues
@@ -108,44 +332,19 @@ def process_file(file_path: str, api_key: str):
     if len(issues) > 3:
         print(f"   ... and {len(issues)-3} more")
 
-    # 4. Fixer (UNE SEULE FOIS d'abord)
-    print(f"🔧 Fixing issues...")
-    fixed_file = fix_code(file_path, issues, api_key)
-
-    # Vérifier qualité après fixing
-    score_after_fix = get_pylint_score(fixed_file)
-    print(f"📊 Pylint AFTER fix: {score_after_fix:.2f}/10")
-
-    # Si qualité baisse BEAUCOUP, restaurer
-    if score_after_fix < score_before - 1.0:
-        print(f"⚠️  CRITICAL: Fixing DEGRADED quality significantly!")
-        print(f"⚠️  Restoring original version...")
-        write_file(fixed_file, original_code)
-        score_after_fix = score_before
-        fixed_file = file_path
-
-    # 5. Tests finaux
-    print(f"🧪 Running tests (generate: {not skip_test_generation})...")
-    success, feedback = run_tests(
-        fixed_file, api_key, module_name, generate_tests=not skip_test_generation
-    )
-
-    # UNE seule tentative de re-fix si échec
-    if not success and MAX_FIXER_RETRIES > 0:
-        print(f"❌ Tests failed, trying ONE re-fix with feedback...")
-        # Limiter le feedback aux premières lignes
-        short_feedback = "\n".join(feedback.split("\n")[:10])
-        fixed_file = fix_code(
-            fixed_file, issues, api_key, judge_feedback=short_feedback
-        )
-
-        # Re-tester
-        success, feedback = run_tests(
-            fixed_file, api_key, module_name, generate_tests=False
+    # 4. Copie de travail : fixer et tests écrivent dans la copie, l'original
+    #    n'est remplacé qu'à la fin, par rename atomique (rien à restaurer si ça plante)
+    workspace = Scratch(file_path)
+    try:
+        success = await _fix_in_workspace(
+            workspace, issues, api_key, module_name, score_local, skip_test_generation, use_async, speculative
         )
+        score_final = await _agent(use_async, get_pylint_score, _pylint_score_async, workspace.file_path)
+        workspace.commit()
+    finally:
+        workspace.discard()
 
     # 6. Résultats finaux
-    score_final = get_pylint_score(fixed_file)
     improvement = score_final - score_before
 
     print(f"📊 Pylint FINAL: {score_final:.2f}/10")
@@ -174,36 +373,285 @@ def process_file(file_path: str, api_key: str):
             "score_after": score_final,
             "improvement": improvement,
             "test_success": success,
+            "model": route.model,
+            "escalations": route.escalations,
+            "llm_calls": route.calls,
+            "prompt_tokens": route.prompt_tokens,
+            "response_tokens": route.response_tokens,
+            "cost_usd": cost(route.model, route.prompt_tokens, route.response_tokens),
             "input_prompt": f"Analyze {file_path}",
             "output_response": f"Before: {score_before}, After: {score_final}, Tests: {'PASS' if success else 'FAIL'}",
         },
         status="SUCCESS" if success else "FAILURE",
     )
 
+    result = _file_result(file_path, "SUCCESS" if success else "FAILURE", score_before, score_final, success)
+    result.update(model=route.model, tokens=route.prompt_tokens + route.response_tokens)
+    return result
+
+
+def process_file(file_path: str, api_key: str, issues: list = None, speculative: int = 1) -> dict:
+    """Version bloquante de process_file_async (agents synchrones, une boucle par appel)."""
+    return asyncio.run(process_file_async(file_path, api_key, issues, use_async=False, speculative=speculative))
+
+
+def print_summary(results: list) -> None:
+    """Affiche le bilan de la run, un fichier par ligne."""
+    print("\n📋 Summary")
+    for result in results:
+        if result is None:
+            continue
+        before = result.get("score_before")
+        after = result.get("score_after")
+        scores = f"{before:.2f} → {after:.2f}" if before is not None else "n/a"
+        print(f"   {result['status']:<9} {scores:<16} {result['file']}")
+    counts = {}
+    for result in results:
+        if result is not None:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print("   " + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--target_dir",
         type=str,
-        required=True,
+        default=None,
         help="Directory containing Python files to refactor",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files processed concurrently (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=None,
+        help="Max simultaneous Gemini calls (default: 4)",
+    )
+    parser.add_argument(
+        "--cpu-concurrency",
+        type=int,
+        default=None,
+        help="Max simultaneous pylint/pytest subprocesses (default: CPU count)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the on-disk Gemini response cache",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Ignore cached responses but store the new ones",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=None,
+        help="Client-side limit of Gemini requests per minute (default: GEMINI_RPM or 60)",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        default=None,
+        help="Client-side limit of Gemini tokens per minute (default: GEMINI_TPM or 1000000)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip files (and their tests) unchanged since the last successful run",
+    )
+    parser.add_argument(
+        "--batch-audit",
+        action="store_true",
+        help="Audit small files several at a time in one Gemini request",
+    )
+    parser.add_argument(
+        "--order",
+        choices=ORDERS,
+        default="discovery",
+        help="Processing order: as discovered (starts immediately), smallest files first, "
+        "or worst last pylint score first",
+    )
+    parser.add_argument(
+        "--test-timeout",
+        type=float,
+        default=DEFAULT_TEST_TIMEOUT,
+        help="Per-test timeout in seconds for the pytest workers",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=str,
+        default=None,
+        help="Write per-stage/per-file timings as JSON to this path",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run the async agents in one event loop instead of worker threads (needs aiohttp)",
+    )
+    parser.add_argument(
+        "--in-flight",
+        type=int,
+        default=100,
+        help="With --async: number of files processed concurrently (default: 100)",
+    )
+    parser.add_argument(
+        "--speculative",
+        type=int,
+        default=1,
+        metavar="K",
+        help="Race K fix candidates (different temperatures) in scratch copies; the first one that "
+        "passes the tests without lowering the Pylint score wins (default: 1 = off)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop calling the LLM once the run has used N tokens (prompt + response); "
+        "remaining files get the BUDGET status (default: no limit)",
+    )
+    parser.add_argument(
+        "--no-routing",
+        action="store_true",
+        help="Send every file to the standard model (GEMINI_MODEL) instead of routing small or "
+        "low-risk files to GEMINI_MODEL_FAST and escalating failures to GEMINI_MODEL_STRONG",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report the import time of the CLI and of a pytest worker, then exit",
+    )
     args = parser.parse_args()
 
+    if args.profile_startup:
+        from src.utils.startup import print_startup_profile
+
+        print_startup_profile()
+        return
+    if args.target_dir is None:
+        parser.error("the following arguments are required: --target_dir")
+
+    # Ensure the API key is loaded (checked here so that importing main has no side effect)
+    api_key = get_api_key()
+    if not api_key:
+        print(
+            "❌ API_KEY not found in the environment variables. Please ensure it's set in the .env file."
+        )
+        exit(1)
+
     target_dir = args.target_dir
+    configure_limits(llm_slots=args.llm_concurrency, cpu_slots=args.cpu_concurrency)
+    configure_client(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, token_budget=args.token_budget)
+    configure_router(adaptive=not args.no_routing)
+    cache = configure_cache(enabled=not args.no_cache, refresh=args.refresh_cache)
+    # Workers pytest et pylint pré-démarrés : au plus un par place CPU, au plus un par fichier en vol
+    cpu_slots = args.cpu_concurrency or DEFAULT_CPU_SLOTS
+    pool_size = cpu_slots if args.use_async else min(args.workers, cpu_slots)
+    configure_test_pool(size=pool_size, test_timeout=args.test_timeout)
+    configure_engine(size=pool_size)
 
     # Validate the path
     validate_sandbox_path(target_dir)
 
-    # Process each Python file in the directory
-    python_files = [
-        f
-        for f in list_python_files(target_dir)
-        if not f.endswith("_test.py")  # Skip tests générés!
-    ]
-    for file_path in python_files:
-        process_file(file_path, API_KEY)
+    # Process each Python file in the directory (tests générés exclus, parcours au fil de l'eau)
+    python_files = iter_python_files(target_dir)
+
+    # Manifeste de la dernière run (toujours mis à jour, utilisé avec --incremental)
+    manifest = RunManifest(target_dir)
+    skipped = []
+    if args.incremental:
+
+        def changed_files(files):
+            for f in files:
+                if manifest.is_unchanged(f):
+                    skipped.append(f)
+                else:
+                    yield f
+
+        python_files = changed_files(python_files)
+
+    if args.order != "discovery":
+        # Un tri demande la liste complète avant de démarrer
+        python_files = order_files(python_files, args.order, manifest)
+
+    pre_audits = {}
+    if args.batch_audit:
+        python_files = list(python_files)
+        print(f"🔍 Batched audit of small files...")
+        pre_audits = analyze_codes(python_files, api_key, workers=args.workers)
+        print(f"🔍 {len(pre_audits)} files audited in batches")
+
+    def process_and_record(file_path: str, api_key: str) -> dict:
+        metrics.set_current_file(file_path)
+        with metrics.stage("file"):
+            result = process_file(
+                file_path, api_key, issues=pre_audits.get(file_path), speculative=args.speculative
+            )
+        manifest.record(file_path, result)
+        return result
+
+    async def process_and_record_async(file_path: str, api_key: str) -> dict:
+        metrics.set_current_file(file_path)
+        with metrics.stage("file"):
+            result = await process_file_async(
+                file_path, api_key, issues=pre_audits.get(file_path), speculative=args.speculative
+            )
+        manifest.record(file_path, result)
+        return result
+
+    async def run_async() -> list:
+        try:
+            return await run_files_async(
+                python_files, process_and_record_async, api_key, concurrency=args.in_flight
+            )
+        finally:
+            await get_async_client().close()
+
+    try:
+        if args.use_async:
+            results = asyncio.run(run_async())
+        else:
+            results = run_files(
+                python_files, process_and_record, api_key, workers=args.workers
+            )
+    finally:
+        # Même interrompue (Ctrl+C), la run laisse un manifeste cohérent
+        manifest.save()
+        close_test_pool()
+        close_engine()
+        remove_scratch_dirs()
+    if args.incremental:
+        print(f"⏭️  Incremental: {len(skipped)} unchanged files skipped")
+    print_summary(results)
+    metrics.print_summary()
+    get_client().budget.print_summary()
+    if args.metrics_out:
+        metrics.export_json(args.metrics_out)
+        print(f"⏱️  Metrics written to {args.metrics_out}")
+
+    sources = get_sources()
+    print(f"📄 Sources: {sources.reads} disk reads, {sources.hits} served from memory")
+
+    cache_stats = cache.stats()
+    print(
+        f"💾 Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+        f"{cache.evict()} evicted"
+    )
+
+    # Le journal JSONL est réexporté au format tableau pour les outils d'analyse
+    exported = export_json()
+    print(f"📝 {exported} log entries exported to logs/experiment_data.json")
+    # Historique indexé (python -m src.utils.history summary / runs / file ...)
+    from src.utils.history import DEFAULT_HISTORY_PATH, ingest_run_log
+
+    print(f"🗄️  {ingest_run_log()} entries added to {DEFAULT_HISTORY_PATH}")
 
     print("✅ Mission Complete")
 
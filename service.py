@@ -0,0 +1,349 @@
+# service.py
+"""
+Mode service : un démon garde au chaud le client HTTP Gemini, le moteur pylint,
+les workers pytest et les caches, et traite des jobs de refactoring envoyés
+par une API HTTP locale. Les jobs sont stockés dans une file SQLite persistante.
+
+    python service.py serve --workers 4
+    python service.py submit --target_dir sandbox/project --files sandbox/project/a.py --wait
+
+API (JSON) :
+    POST /jobs            {"target_dir": ..., "files": [...], "incremental": false, "speculative": 1}
+    GET  /jobs            derniers jobs
+    GET  /jobs/<id>       état, progression (done/total) et résultats ; ?after=<seq> pour la suite
+    GET  /health          état du démon et de la file
+    POST /export          exporte le journal (logs/experiment_data.json) et l'historique SQLite
+
+Le journal JSONL est écrit au fil des jobs ; son export au format tableau et
+l'import dans l'historique, proportionnels à toute la taille du journal, ne
+sont faits qu'à la demande (POST /export) et à l'arrêt du démon.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from main import get_api_key, process_file
+from src.agents.judge import forget_failures
+from src.utils import metrics
+from src.utils.cache import configure_cache
+from src.utils.discovery import iter_python_files
+from src.utils.job_queue import DEFAULT_QUEUE_PATH, FINAL_STATUSES, JobQueue
+from src.utils.lint import close_engine, configure_engine, get_engine
+from src.utils.llm_client import configure_client
+from src.utils.history import ingest_run_log
+from src.utils.logger import export_json, flush_logs, start_run
+from src.utils.manifest import RunManifest
+from src.utils.scheduler import DEFAULT_CPU_SLOTS, configure_limits, run_files
+from src.utils.source_cache import get_sources
+from src.utils.test_runner import DEFAULT_TEST_TIMEOUT, close_test_pool, configure_test_pool
+from src.utils.tool import validate_sandbox_path
+from src.utils.workspace import remove_scratch_dirs
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8740
+# Statuts de fichier considérés comme un succès par `submit --wait`
+OK_STATUSES = ("SUCCESS", "SKIPPED", "AUTOFIXED", "UNCHANGED")
+
+
+# =========================================================
+# Exécution d'un job
+# =========================================================
+
+
+def check_spec(spec) -> dict:
+    """Valide un job soumis ; lève ValueError (ou FileNotFoundError) s'il est invalide."""
+    if not isinstance(spec, dict) or not isinstance(spec.get("target_dir"), str):
+        raise ValueError("target_dir is required")
+    target_dir = os.path.normpath(spec["target_dir"])
+    validate_sandbox_path(target_dir)
+    checked = {
+        "target_dir": target_dir,
+        "incremental": bool(spec.get("incremental", False)),
+        "speculative": int(spec.get("speculative", 1)),
+    }
+    if checked["speculative"] < 1:
+        raise ValueError("speculative must be >= 1")
+
+    files = spec.get("files")
+    if files is not None:
+        if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+            raise ValueError("files must be a list of paths")
+        root = os.path.abspath(target_dir)
+        checked["files"] = []
+        for file_path in files:
+            file_path = os.path.normpath(file_path)
+            validate_sandbox_path(file_path)
+            if not file_path.endswith(".py") or os.path.commonpath([root, os.path.abspath(file_path)]) != root:
+                raise ValueError(f"not a Python file of {target_dir}: {file_path}")
+            checked["files"].append(file_path)
+    return checked
+
+
+def run_job(job_id: int, spec: dict, queue: JobQueue, workers: int) -> dict:
+    """Traite les fichiers du job ; chaque résultat est enregistré dès qu'il est connu."""
+    target_dir = spec["target_dir"]
+    manifest = RunManifest(target_dir)
+    already_done = queue.done_files(job_id)  # job repris après un redémarrage
+    metrics.reset()
+    start_run(f"job-{job_id}")  # entrées du journal et de l'historique rattachées au job
+
+    def selected_files():
+        seen = 0
+        files = spec.get("files") or iter_python_files(target_dir)
+        for file_path in files:
+            seen += 1
+            if file_path in already_done:
+                continue
+            if spec["incremental"] and manifest.is_unchanged(file_path):
+                queue.record(job_id, {"file": file_path, "status": "UNCHANGED"})
+                continue
+            yield file_path
+        queue.set_total(job_id, seen)
+
+    def process_and_record(file_path: str, api_key: str) -> dict:
+        metrics.set_current_file(file_path)
+        try:
+            with metrics.stage("file"):
+                result = process_file(file_path, api_key, speculative=spec["speculative"])
+            manifest.record(file_path, result)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"file": file_path, "status": "ERROR", "error": str(e)}
+        queue.record(job_id, result)
+        return result
+
+    try:
+        run_files(selected_files(), process_and_record, get_api_key(), workers=workers)
+    finally:
+        manifest.save()
+        remove_scratch_dirs()
+        flush_logs()
+        # État propre au job : le démon ne doit pas grossir d'un job à l'autre
+        get_sources().clear()
+        get_engine().clear()
+        forget_failures()
+
+    # Tous les fichiers du job, y compris ceux d'avant un redémarrage et les inchangés
+    statuses = {}
+    for result in queue.get(job_id)["results"]:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return {"statuses": statuses, "stages": metrics.summary()["stages"]}
+
+
+def export_logs() -> dict:
+    """Export du journal au format tableau et import de ses nouvelles entrées dans l'historique."""
+    flush_logs()
+    return {"exported": export_json(), "history": ingest_run_log()}
+
+
+def _dispatch(queue: JobQueue, workers: int, wakeup: threading.Event, stop: threading.Event) -> None:
+    """Thread unique qui exécute les jobs dans l'ordre d'arrivée."""
+    while not stop.is_set():
+        claimed = queue.claim()
+        if claimed is None:
+            wakeup.wait(1.0)
+            wakeup.clear()
+            continue
+        job_id, spec = claimed
+        print(f"▶️  Job {job_id}: {spec['target_dir']}", flush=True)
+        start = time.monotonic()
+        try:
+            summary = run_job(job_id, spec, queue, workers)
+        except Exception as e:
+            traceback.print_exc()
+            queue.finish(job_id, error=str(e))
+            print(f"❌ Job {job_id} failed: {e}", flush=True)
+        else:
+            queue.finish(job_id, summary)
+            print(f"✅ Job {job_id} done in {time.monotonic() - start:.1f}s {summary['statuses']}", flush=True)
+
+
+# =========================================================
+# API HTTP
+# =========================================================
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "RefactoringSwarm/1.0"
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass  # la console du démon affiche les jobs, pas chaque requête de suivi
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        queue = self.server.queue
+        if parts == ["health"]:
+            self._send(200, {"status": "ok", "jobs": queue.counts()})
+        elif parts == ["jobs"]:
+            self._send(200, queue.list())
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            try:
+                after = int(parse_qs(url.query).get("after", ["0"])[0])
+            except ValueError:
+                return self._send(400, {"error": "after must be an integer"})
+            job = queue.get(int(parts[1]), after=after)
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            self._send(200, job)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/export":
+            return self._send(200, export_logs())
+        if path != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            spec = check_spec(json.loads(self.rfile.read(length) or b"{}"))
+        except (ValueError, FileNotFoundError) as e:
+            return self._send(400, {"error": str(e)})
+        job_id = self.server.queue.submit(spec)
+        self.server.wakeup.set()
+        self._send(202, {"id": job_id, "status": "queued", "url": f"/jobs/{job_id}"})
+
+
+def serve(args) -> None:
+    if not get_api_key():
+        print("❌ API_KEY not found in the environment variables. Please ensure it's set in the .env file.")
+        sys.exit(1)
+
+    configure_limits(llm_slots=args.llm_concurrency, cpu_slots=args.cpu_concurrency)
+    configure_client(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    configure_cache(enabled=not args.no_cache)
+    cpu_slots = args.cpu_concurrency or DEFAULT_CPU_SLOTS
+    configure_test_pool(size=min(args.workers, cpu_slots), test_timeout=args.test_timeout)
+    configure_engine(size=min(args.workers, cpu_slots))  # pylint chargé une fois pour toutes par worker
+
+    queue = JobQueue(args.queue)
+    recovered = queue.recover()
+    if recovered:
+        print(f"♻️  {recovered} interrupted job(s) queued again")
+
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.daemon_threads = True
+    server.queue = queue
+    server.wakeup = threading.Event()
+    stop = threading.Event()
+    dispatcher = threading.Thread(
+        target=_dispatch, args=(queue, args.workers, server.wakeup, stop), name="jobs", daemon=True
+    )
+    dispatcher.start()
+    print(f"🛰️  Refactoring service on http://{args.host}:{args.port} (queue: {args.queue})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping (a job in progress is resumed at the next start)")
+    finally:
+        stop.set()
+        server.server_close()
+        close_test_pool()
+        close_engine()
+        exported = export_logs()
+        print(f"📝 {exported['exported']} log entries exported, {exported['history']} added to the history")
+
+
+# =========================================================
+# Client : soumettre un job et suivre sa progression
+# =========================================================
+
+
+def _request(url: str, payload: dict = None) -> dict:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get("error", e.reason)
+        except ValueError:
+            message = e.reason
+        raise SystemExit(f"❌ {e.code}: {message}")
+
+
+def submit(args) -> int:
+    base_url = args.url.rstrip("/")
+    spec = {"target_dir": args.target_dir, "incremental": args.incremental, "speculative": args.speculative}
+    if args.files:
+        spec["files"] = args.files
+    job = _request(f"{base_url}/jobs", spec)
+    job_id = job["id"]
+    print(f"📨 Job {job_id} queued")
+    if not args.wait:
+        return 0
+
+    after, results = 0, []
+    while True:
+        job = _request(f"{base_url}/jobs/{job_id}?after={after}")
+        for result in job["results"]:
+            after = result["seq"]
+            results.append(result)
+            scores = ""
+            if result.get("score_before") is not None:
+                scores = f"{result['score_before']:.2f} → {result['score_after']:.2f}"
+            total = job["total"] if job["total"] is not None else "?"
+            print(f"   [{len(results)}/{total}] {result['status']:<9} {scores:<16} {result['file']}", flush=True)
+        if job["status"] in FINAL_STATUSES:
+            break
+        time.sleep(args.poll)
+
+    if job["status"] == "failed":
+        print(f"❌ Job {job_id} failed: {job['error']}")
+        return 1
+    print(f"✅ Job {job_id} done: {job['summary']['statuses']}")
+    return 0 if all(result["status"] in OK_STATUSES for result in results) else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refactoring service (daemon + job queue)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--queue", type=str, default=DEFAULT_QUEUE_PATH, help="SQLite job queue")
+    serve_parser.add_argument("--workers", type=int, default=4, help="Files processed concurrently per job")
+    serve_parser.add_argument("--llm-concurrency", type=int, default=None)
+    serve_parser.add_argument("--cpu-concurrency", type=int, default=None)
+    serve_parser.add_argument("--rpm", type=int, default=None, help="Default: GEMINI_RPM or 60")
+    serve_parser.add_argument("--tpm", type=int, default=None, help="Default: GEMINI_TPM or 1000000")
+    serve_parser.add_argument("--no-cache", action="store_true")
+    serve_parser.add_argument("--test-timeout", type=float, default=DEFAULT_TEST_TIMEOUT)
+
+    submit_parser = commands.add_parser("submit", help="Submit a job to a running daemon")
+    submit_parser.add_argument("--url", type=str, default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    submit_parser.add_argument("--target_dir", type=str, required=True)
+    submit_parser.add_argument("--files", nargs="*", default=None, help="Only these files (default: whole directory)")
+    submit_parser.add_argument("--incremental", action="store_true")
+    submit_parser.add_argument("--speculative", type=int, default=1)
+    submit_parser.add_argument("--wait", action="store_true", help="Follow the progress until the job ends")
+    submit_parser.add_argument("--poll", type=float, default=1.0, help="Seconds between progress checks")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        sys.exit(submit(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,413 @@
 # src/agents/auditor.py
+import asyncio
+import contextvars
+import json
 import os
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.async_llm import get_async_client
+from src.utils.code_units import chunk_ranges
+from src.utils.llm_client import LLMError, estimate_tokens, get_client
 from src.utils.logger import log_experiment, ActionType
-from src.utils.tool import read_file
+from src.utils.model_router import current_model
+from src.utils.scheduler import llm_limit
+from src.utils.source_cache import get_sources
+from src.utils.tool import read_file, read_source
+
+
+# Mode batch : plusieurs petits fichiers par requête, dans la limite d'un budget de tokens
+BATCH_TOKEN_BUDGET = 6000
+SMALL_FILE_TOKENS = 1500
+# Mode gros fichier : audit par sections en parallèle, au-delà de LARGE_FILE_TOKENS
+LARGE_FILE_TOKENS = 6000
+CHUNK_TOKEN_BUDGET = 3000
+SEVERITIES = ("bug", "warning", "style")
+
 
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+def _parse_issues(output_response: str) -> list:
+    """Keep parsing conservative: split lines, strip bullets."""
+    return [line.strip(" -*•") for line in output_response.splitlines() if line.strip()]
+
+
+def _audit_prompt(code: str) -> str:
+    return (
+        "You are a senior Python auditor.\n"
+        "Analyze the following Python code and list concrete problems (bugs, bad practices, missing tests, missing docstrings).\n\n"
+        f"{code}"
+    )
+
+
+def _log_audit(input_prompt: str, response=None, error: LLMError = None) -> list:
+    """Parse la réponse (ou l'erreur), journalise et retourne les issues."""
+    details = {"input_prompt": input_prompt}
+    if error is not None:
+        output_response = str(error)
+        issues = ["Gemini API error during analysis"]
+        status = "FAILURE"
+    else:
+        output_response = response.text
+        issues = _parse_issues(output_response)
+        status = "SUCCESS"
+        if response.cache_hit:
+            details["cache_hit"] = True
+
+    # Mandatory logging of prompt + response per teacher's instruction
+    details.update({"output_response": output_response, "issues_found": issues})
+    log_experiment(
+        agent_name="AuditorAgent",
+        model_used=current_model(),
+        action=ActionType.ANALYSIS,
+        details=details,
+        status=status,
+    )
+    return issues
 
 
 def analyze_code(code_file: str, api_key: str) -> list:
     """
     Read file, send audit prompt to LLM, log result and return parsed issues (list).
+    Large files are audited section by section (see analyze_code_chunked).
     """
+    source = read_source(code_file)
+    if source.tokens > LARGE_FILE_TOKENS:
+        return analyze_code_chunked(code_file, api_key)
     # read the fileee
-    code = read_file(code_file)
+    code = source.text
+    input_prompt = _audit_prompt(code)
+    try:
+        response = get_client().generate(input_prompt, api_key, cache_content=code)
+    except LLMError as e:
+        return _log_audit(input_prompt, error=e)
+    return _log_audit(input_prompt, response)
 
-    input_prompt = (
+
+async def analyze_code_async(code_file: str, api_key: str) -> list:
+    """Version asynchrone de analyze_code (même prompt, même journalisation)."""
+    source = read_source(code_file)
+    if source.tokens > LARGE_FILE_TOKENS:
+        return await analyze_code_chunked_async(code_file, api_key)
+    code = source.text
+    input_prompt = _audit_prompt(code)
+    try:
+        response = await get_async_client().generate(input_prompt, api_key, cache_content=code)
+    except LLMError as e:
+        return _log_audit(input_prompt, error=e)
+    return _log_audit(input_prompt, response)
+
+
+# =========================================================
+# Gros fichiers : audit par sections (map) puis fusion (reduce)
+# =========================================================
+
+
+def _chunk_prompt(code_file: str, lines: list, start: int, end: int, names: list) -> str:
+    numbered = "\n".join(f"{number:>5}| {line}" for number, line in enumerate(lines[start - 1 : end], start))
+    return (
         "You are a senior Python auditor.\n"
-        "Analyze the following Python code and list concrete problems (bugs, bad practices, missing tests, missing docstrings).\n\n"
-        f"{code}"
+        f"Below are lines {start}-{end} of `{os.path.basename(code_file)}` ({len(lines)} lines in total), "
+        "each prefixed with its line number. Other top-level names defined in the module: "
+        f"{', '.join(names) or 'none'}.\n"
+        "List concrete problems in THIS section only (bugs, bad practices, missing docstrings).\n"
+        'Answer with ONLY a JSON object: {"issues": [{"line": <line number>, '
+        f'"severity": one of {list(SEVERITIES)}, "message": "<one sentence>"}}]}}. '
+        'Use {"issues": []} if the section has no problem.\n\n'
+        f"{numbered}"
     )
 
-    payload = {"contents": [{"parts": [{"text": input_prompt}]}]}
 
+def _parse_chunk_issues(output_response: str, start: int, end: int) -> list:
+    """Issues {line, severity, message} d'une section ; lève ValueError si la réponse n'est pas exploitable."""
+    text = output_response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1 :] if "\n" in text else text
+    data = json.loads(text)
+    items = data.get("issues") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("chunk audit response has no issue list")
+
+    issues = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("message", "")).strip():
+            continue
+        try:
+            line = int(item.get("line"))
+        except (TypeError, ValueError):
+            line = None
+        if line is not None and not start <= line <= end:
+            line = None  # numéro hors de la section : on garde l'issue sans ligne
+        severity = str(item.get("severity", "warning")).lower()
+        issues.append(
+            {
+                "line": line,
+                "severity": severity if severity in SEVERITIES else "warning",
+                "message": str(item["message"]).strip(),
+            }
+        )
+    return issues
+
+
+def _chunk_plan(code_file: str) -> tuple:
+    """(lignes du fichier, sections (début, fin), noms de premier niveau)."""
+    source = read_source(code_file)
+    lines = source.text.splitlines()
+    try:
+        tree = source.tree
+    except SyntaxError:
+        # Code invalide : simples fenêtres de lignes
+        per_chunk = max(1, CHUNK_TOKEN_BUDGET * 4 // 80)
+        ranges = [(start, min(start + per_chunk - 1, len(lines))) for start in range(1, len(lines) + 1, per_chunk)]
+        return lines, ranges, []
+    names = [node.name for node in tree.body if hasattr(node, "name")]
+    return lines, chunk_ranges(source.text, CHUNK_TOKEN_BUDGET, tree, estimate_tokens), names
+
+
+def _log_chunk(code_file: str, input_prompt: str, start: int, end: int, response=None, error=None):
+    """Journalise l'audit d'une section et retourne ses issues structurées (None si l'appel a échoué)."""
+    details = {"input_prompt": input_prompt, "chunk": f"{code_file}:{start}-{end}"}
+    issues = []
+    if error is not None:
+        output_response, status, issues = str(error), "FAILURE", None
+    else:
+        output_response, status = response.text, "SUCCESS"
+        if response.cache_hit:
+            details["cache_hit"] = True
+        try:
+            issues = _parse_chunk_issues(output_response, start, end)
+        except ValueError:
+            # Réponse libre : une issue par ligne, rattachée à la section
+            issues = [
+                {"line": None, "severity": "warning", "message": f"(lines {start}-{end}) {message}"}
+                for message in _parse_issues(output_response)
+            ]
+    details.update({"output_response": output_response, "issues_found": issues})
+    log_experiment(
+        agent_name="AuditorAgent",
+        model_used=current_model(),
+        action=ActionType.ANALYSIS,
+        details=details,
+        status=status,
+    )
+    return issues
+
+
+def _normalized(message: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", message.lower()).strip()
+
+
+def merge_chunk_issues(chunk_issues: list) -> list:
+    """
+    Fusionne les issues des sections : doublons retirés (même message normalisé
+    sur la même ligne, ou même message sans ligne), tri par numéro de ligne.
+    """
+    merged, seen = [], set()
+    for issues in chunk_issues:
+        for issue in issues or []:
+            key = (issue["line"], _normalized(issue["message"]))
+            if key in seen or (None, key[1]) in seen:
+                continue
+            seen.add(key)
+            merged.append(issue)
+    merged.sort(key=lambda issue: (issue["line"] is None, issue["line"] or 0))
+    return merged
+
+
+def format_issue(issue: dict) -> str:
+    """Issue structurée -> texte pour le fixer ("line 12" lui permet de cibler la bonne fonction)."""
+    where = f"line {issue['line']}: " if issue["line"] is not None else ""
+    return f"{where}[{issue['severity']}] {issue['message']}"
+
+
+def _audit_chunk(code_file: str, api_key: str, lines: list, start: int, end: int, names: list) -> list:
+    input_prompt = _chunk_prompt(code_file, lines, start, end, names)
+    section = "\n".join(lines[start - 1 : end])
     try:
-        response = requests.post(
-            f"{GEMINI_URL}?key={api_key}", json=payload, timeout=120
+        response = get_client().generate(
+            input_prompt,
+            api_key,
+            cache_content=section,
+            generation_config={"responseMimeType": "application/json"},
         )
-    except requests.exceptions.RequestException as e:
-        output_response = str(e)
-        issues = ["Gemini API error during analysis"]
-        status = "FAILURE"
-        # Mandatory logging of prompt + response per teacher's instruction
-        log_experiment(
-            agent_name="AuditorAgent",
-            model_used="gemini-1.5-flash",
-            action=ActionType.ANALYSIS,
-            details={
-                "input_prompt": input_prompt,
-                "output_response": output_response,
-                "issues_found": issues,
-            },
-            status=status,
+    except LLMError as e:
+        return _log_chunk(code_file, input_prompt, start, end, error=e)
+    return _log_chunk(code_file, input_prompt, start, end, response)
+
+
+async def _audit_chunk_async(code_file: str, api_key: str, lines: list, start: int, end: int, names: list) -> list:
+    input_prompt = _chunk_prompt(code_file, lines, start, end, names)
+    section = "\n".join(lines[start - 1 : end])
+    try:
+        response = await get_async_client().generate(
+            input_prompt,
+            api_key,
+            cache_content=section,
+            generation_config={"responseMimeType": "application/json"},
         )
-        return issues
+    except LLMError as e:
+        return _log_chunk(code_file, input_prompt, start, end, error=e)
+    return _log_chunk(code_file, input_prompt, start, end, response)
+
+
+def _chunked_result(chunk_issues: list) -> list:
+    if all(issues is None for issues in chunk_issues):
+        return ["Gemini API error during analysis"]  # même signal que analyze_code
+    return [format_issue(issue) for issue in merge_chunk_issues(chunk_issues)]
+
+
+def analyze_code_chunked(code_file: str, api_key: str) -> list:
+    """
+    Audit d'un gros fichier : sections coupées aux frontières de classes/fonctions
+    (CHUNK_TOKEN_BUDGET tokens max), auditées en parallèle, puis issues fusionnées,
+    dédupliquées et triées par ligne ("line N: [gravité] message").
+    """
+    lines, ranges, names = _chunk_plan(code_file)
+    print(f"🧩 Large file: auditing {len(ranges)} sections in parallel")
+    with ThreadPoolExecutor(max_workers=max(1, min(len(ranges), llm_limit()))) as pool:
+        # Chaque section garde le contexte de l'appelant (fichier courant, sortie et journal capturés)
+        futures = [
+            pool.submit(contextvars.copy_context().run, _audit_chunk, code_file, api_key, lines, *section, names)
+            for section in ranges
+        ]
+        chunk_issues = [future.result() for future in futures]
+    return _chunked_result(chunk_issues)
+
+
+async def analyze_code_chunked_async(code_file: str, api_key: str) -> list:
+    """Version asynchrone de analyze_code_chunked (les sections partent toutes en même temps)."""
+    lines, ranges, names = _chunk_plan(code_file)
+    print(f"🧩 Large file: auditing {len(ranges)} sections in parallel")
+    chunk_issues = await asyncio.gather(
+        *(_audit_chunk_async(code_file, api_key, lines, start, end, names) for start, end in ranges)
+    )
+    return _chunked_result(chunk_issues)
+
+
+# =========================================================
+# Audit par lots (plusieurs petits fichiers par appel)
+# =========================================================
+
+
+def plan_audit_batches(
+    code_files: list,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    small_file_tokens: int = SMALL_FILE_TOKENS,
+) -> tuple:
+    """
+    Regroupe les petits fichiers en lots tenant dans token_budget.
+    Returns (batches: list[list[str]], singles: list[str]) ; les fichiers trop
+    gros pour un lot restent dans `singles` et sont audités seuls.
+    """
+    sized = []
+    singles = []
+    for code_file in code_files:
+        tokens = get_sources().get(code_file).tokens
+        if tokens > small_file_tokens:
+            singles.append(code_file)
+        else:
+            sized.append((tokens, code_file))
 
-    if response.status_code != 200:
+    batches = []
+    current, current_tokens = [], 0
+    for tokens, code_file in sized:
+        if current and current_tokens + tokens > token_budget:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(code_file)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches, singles
+
+
+def _parse_batch_response(output_response: str, code_files: list) -> dict:
+    """Découpe la réponse JSON {chemin: [issues]} ; lève ValueError si inexploitable."""
+    text = output_response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1 :] if "\n" in text else text
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("batch audit response is not a JSON object")
+
+    results = {}
+    for code_file in code_files:
+        issues = data.get(code_file)
+        if isinstance(issues, list):
+            results[code_file] = [str(issue).strip() for issue in issues if str(issue).strip()]
+    return results
+
+
+def analyze_code_batch(code_files: list, api_key: str) -> dict:
+    """
+    Audite plusieurs fichiers en une seule requête et retourne {chemin: issues}.
+    Les fichiers absents d'une réponse tronquée ou invalide sont réaudités un par un.
+    """
+    if len(code_files) == 1:
+        return {code_files[0]: analyze_code(code_files[0], api_key)}
+
+    sources = {code_file: read_file(code_file) for code_file in code_files}
+    input_prompt = (
+        "You are a senior Python auditor.\n"
+        "Analyze each of the following Python files and list concrete problems (bugs, bad practices, missing tests, missing docstrings).\n"
+        "Answer with ONLY a JSON object mapping each file path (exactly as given) to a list of issue strings. "
+        "Use an empty list for a file without problems.\n\n"
+    )
+    input_prompt += "".join(
+        f"### FILE: {code_file}\n{code}\n\n" for code_file, code in sources.items()
+    )
+
+    details = {"input_prompt": input_prompt, "batch_files": list(code_files)}
+    results = {}
+    try:
+        response = get_client().generate(
+            input_prompt,
+            api_key,
+            cache_content="".join(sources.values()),
+            generation_config={"responseMimeType": "application/json"},
+        )
         output_response = response.text
-        issues = ["Gemini API error during analysis"]
+        results = _parse_batch_response(output_response, code_files)
+        status = "SUCCESS" if len(results) == len(code_files) else "FAILURE"
+        if response.cache_hit:
+            details["cache_hit"] = True
+    except LLMError as e:
+        output_response = str(e)
+        status = "FAILURE"
+    except ValueError as e:
+        output_response = f"{response.text}\n\n[unparsable batch response: {e}]"
         status = "FAILURE"
-    else:
-        output_response = response.json()["candidates"][0]["content"]["parts"][0][
-            "text"
-        ]
-        # Keep parsing conservative: split lines, strip bullets
-        issues = [
-            line.strip(" -*•") for line in output_response.splitlines() if line.strip()
-        ]
-        status = "SUCCESS"
 
+    details.update({"output_response": output_response, "issues_found": results})
     log_experiment(
         agent_name="AuditorAgent",
-        model_used="gemini-1.5-flash",
+        model_used=current_model(),
         action=ActionType.ANALYSIS,
-        details={
-            "input_prompt": input_prompt,
-            "output_response": output_response,
-            "issues_found": issues,
-        },
+        details=details,
         status=status,
     )
 
-    return issues
+    # Repli : audit individuel pour tout ce que le lot n'a pas couvert
+    for code_file in code_files:
+        if code_file not in results:
+            results[code_file] = analyze_code(code_file, api_key)
+    return results
+
+
+def analyze_codes(
+    code_files: list,
+    api_key: str,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    workers: int = 1,
+) -> dict:
+    """
+    Pré-audit par lots des petits fichiers de code_files (lots envoyés en parallèle).
+    Retourne {chemin: issues} ; les gros fichiers ne sont pas inclus et
+    restent audités normalement par analyze_code.
+    """
+    batches, _ = plan_audit_batches(code_files, token_budget)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch_result in pool.map(lambda batch: analyze_code_batch(batch, api_key), batches):
+            results.update(batch_result)
+    return results
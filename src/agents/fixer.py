@@ -1,77 +1,306 @@
 # src/agents/fixer.py
-import requests
+import ast
+import os
+import re
+
+from src.utils.code_units import context_for, merge_returned_units, select_units, split_units
+from src.utils.async_llm import get_async_client
+from src.utils.llm_client import LLMError, get_client
 from src.utils.logger import log_experiment, ActionType
-from src.utils.tool import read_file, write_file
+from src.utils.model_router import current_model
+from src.utils.source_cache import SourceEntry
+from src.utils.tool import read_source, write_file
 
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+# Texte libre toléré avant un bloc ```python avant d'abandonner la génération
+PROSE_LIMIT = 400
+PYTHON_START = re.compile(
+    r"""^\s*(#|@|import\s|from\s|def\s|async\s+def\s|class\s|if\s|for\s|while\s|"""
+    r"""try:|with\s|\"\"\"|\'\'\'|[A-Za-z_][\w.]*\s*(=|\(|:|\[))"""
+)
 
+# Envoi partiel : seulement pour les fichiers assez longs, et si les unités
+# concernées représentent une part limitée du fichier
+MIN_PARTIAL_LINES = 60
+MAX_PARTIAL_SHARE = 0.6
 
-def fix_code(
-    code_file: str, issues: list, api_key: str, judge_feedback: str = None
-) -> str:
+
+class CodeStreamParser:
     """
-    Send refactoring prompt to LLM, optionally include judge feedback, save fixed code back to file.
-    Returns path to the fixed file (same as input).
+    Extrait le code Python d'une réponse reçue morceau par morceau.
+    - réponse qui commence par ```python : on garde le contenu du bloc ;
+    - réponse qui commence par du code : on garde tout (jusqu'à un éventuel ```) ;
+    - réponse qui commence par du texte : on attend un bloc ``` pendant PROSE_LIMIT
+      caractères, puis abort_reason est renseigné.
     """
-    # read the fileee
-    code = read_file(code_file)
-    # Build prompt: include issues found and the judge feedback if present
-    input_prompt = (
-        "You are a Python refactoring expert.\n"
-        "Fix the following code based strictly on these issues:\n"
-        f"{issues}\n\n"
-    )
+
+    def __init__(self):
+        self.raw = ""
+        self.mode = None  # None, "prose", "fenced" ou "raw"
+        self.start = None
+        self.end = None
+        self.abort_reason = None
+
+    def feed(self, chunk: str) -> None:
+        self.raw += chunk
+        if self.end is not None or self.abort_reason:
+            return
+
+        if self.mode is None:
+            text = self.raw.lstrip()
+            if not text:
+                return
+            if text.startswith("`"):
+                self.mode = "prose"  # le bloc ``` est cherché juste en dessous
+            elif "\n" in text or len(text) > 80:
+                first_line = text.split("\n", 1)[0]
+                if PYTHON_START.match(first_line):
+                    self.mode = "raw"
+                    self.start = len(self.raw) - len(text)
+                else:
+                    self.mode = "prose"
+            else:
+                return
+
+        if self.mode == "prose":
+            fence = self.raw.find("```")
+            if fence == -1:
+                if len(self.raw) > PROSE_LIMIT:
+                    self.abort_reason = "response does not look like Python code"
+                return
+            newline = self.raw.find("\n", fence)
+            if newline == -1:
+                return  # ligne ```python pas encore complète
+            self.mode = "fenced"
+            self.start = newline + 1
+
+        closing = self.raw.find("```", self.start)
+        if closing != -1:
+            self.end = closing
+
+    def code(self) -> str:
+        if self.start is None:
+            return ""
+        return self.raw[self.start : self.end]
+
+
+def _plan_partial(source: SourceEntry, issues: list, judge_feedback: str, file_name: str):
+    """Retourne (unités, unités_choisies) si un prompt partiel suffit, sinon None."""
+    lines = source.text.splitlines()
+    if len(lines) < MIN_PARTIAL_LINES:
+        return None
+    try:
+        units = split_units(source.text, source.tree)
+    except SyntaxError:
+        return None
+    selected = select_units(units, issues, judge_feedback, file_name)
+    if not selected:
+        return None
+    size = sum(unit.end - unit.start + 1 for unit in selected)
+    if size > MAX_PARTIAL_SHARE * len(lines):
+        return None
+    return units, selected
+
+
+def _fix_prompt(source: SourceEntry, code_file: str, issues: list, judge_feedback: str) -> tuple:
+    """Construit le prompt du fixer. Retourne (prompt, unités demandées ou None si fichier entier)."""
+    code = source.text
+    issues_text = "\n".join(f"- {issue}" for issue in issues)
+
+    # Gros fichier dont les problèmes sont localisés : on n'envoie que les unités concernées
+    partial = _plan_partial(source, issues, judge_feedback, os.path.basename(code_file))
+    names = None
+    if partial:
+        units, selected = partial
+        names = [unit.name for unit in selected]
+        input_prompt = (
+            "You are a Python refactoring expert.\n"
+            f"Fix the following functions/classes of `{os.path.basename(code_file)}` based strictly on these issues:\n"
+            f"{issues_text}\n\n"
+        )
+    else:
+        # Build prompt: include issues found and the judge feedback if present
+        input_prompt = (
+            "You are a Python refactoring expert.\n"
+            "Fix the following code based strictly on these issues:\n"
+            f"{issues_text}\n\n"
+        )
     if judge_feedback:
         input_prompt += (
             "The tests failed with the following pytest output. Use this feedback to correct the code (do NOT regenerate tests):\n"
             f"{judge_feedback}\n\n"
         )
 
-    input_prompt += "Return ONLY the corrected Python code, nothing else.\n\n" f"{code}"
-
-    payload = {"contents": [{"parts": [{"text": input_prompt}]}]}
-
-    try:
-        response = requests.post(
-            f"{GEMINI_URL}?key={api_key}", json=payload, timeout=120
-        )
-    except requests.exceptions.RequestException as e:
-        output_response = str(e)
-        fixed_code = code  # fallback: keep original code
-        status = "FAILURE"
-        # Logging required fields
-        log_experiment(
-            agent_name="FixerAgent",
-            model_used="gemini-1.5-flash",
-            action=ActionType.FIX,
-            details={"input_prompt": input_prompt, "output_response": output_response},
-            status=status,
+    if partial:
+        input_prompt += (
+            "Rest of the module, for context only (do NOT return it):\n"
+            f"```python\n{context_for(code, units, selected)}\n```\n\n"
+            f"Return ONLY the corrected definitions of {', '.join(names)} "
+            "(complete code for each, plus any new import they need), nothing else.\n\n"
+            + "\n\n\n".join(unit.source for unit in selected)
         )
-        # Save (unchanged) to maintain consistency
-        write_file(code_file, fixed_code)
-        return code_file
+    else:
+        input_prompt += "Return ONLY the corrected Python code, nothing else.\n\n" f"{code}"
+    return input_prompt, names
+
 
-    if response.status_code != 200:
-        output_response = response.text
-        fixed_code = code  # If request fails, return original code unchanged
+def _check_fix(
+    code: str,
+    input_prompt: str,
+    names: list,
+    parser: CodeStreamParser,
+    cache_hit: bool = False,
+    error: LLMError = None,
+    temperature: float = None,
+):
+    """Valide la réponse accumulée par le parser et journalise ; retourne le code corrigé ou None."""
+    details = {"input_prompt": input_prompt}
+    if names:
+        details["partial_units"] = names
+    if temperature is not None:
+        details["temperature"] = temperature
+    fixed_code = None
+    if error is not None:
+        output_response = str(error)
         status = "FAILURE"
     else:
-        fixed_code = response.json()["candidates"][0]["content"]["parts"][0]["text"]
-        output_response = fixed_code
-        status = "SUCCESS"
-        # Clean triple-backticks if any
-        fixed_code = fixed_code.replace("```python", "").replace("```", "").strip()
+        output_response = parser.raw
+        if cache_hit:
+            details["cache_hit"] = True
+        if parser.abort_reason:
+            details["aborted"] = parser.abort_reason
+            status = "FAILURE"
+        else:
+            # Vérification syntaxique AVANT toute écriture sur disque
+            fixed_code = parser.code().strip()
+            try:
+                if not fixed_code:
+                    raise SyntaxError("empty code in response")
+                ast.parse(fixed_code)
+                if names:
+                    # Les définitions corrigées remplacent les anciennes dans le fichier complet
+                    fixed_code, replaced = merge_returned_units(code, fixed_code, names)
+                    if not replaced:
+                        raise SyntaxError("none of the requested definitions was returned")
+                    fixed_code = fixed_code.strip()
+                status = "SUCCESS"
+            except SyntaxError as e:
+                details["syntax_error"] = str(e)
+                fixed_code = None
+                status = "FAILURE"
 
     #  LOG ICI (pour SUCCESS et FAILURE)
+    details["output_response"] = output_response
     log_experiment(
         agent_name="FixerAgent",
-        model_used="gemini-1.5-flash",
+        model_used=current_model(),
         action=ActionType.FIX,
-        details={"input_prompt": input_prompt, "output_response": output_response},
+        details=details,
         status=status,
     )
+    return fixed_code + "\n" if fixed_code is not None else None
 
-    # Sauvegarder le fichier
-    write_file(code_file, fixed_code)
 
+def _write_fix(code_file: str, fixed_code: str) -> str:
+    # Sauvegarder le fichier (seulement du Python valide ; sinon l'original reste intact)
+    if fixed_code is not None:
+        write_file(code_file, fixed_code)
+    else:
+        print(f"⚠️ Fixer output rejected, original code kept")
     return code_file
+
+
+def _generation_config(temperature: float = None):
+    return {"temperature": temperature} if temperature is not None else None
+
+
+def propose_fix(
+    code_file: str,
+    issues: list,
+    api_key: str,
+    judge_feedback: str = None,
+    temperature: float = None,
+    cancel=None,
+):
+    """
+    Demande une correction au LLM sans toucher au fichier.
+    Retourne le code complet corrigé (Python valide) ou None.
+    cancel : threading.Event optionnel ; s'il est levé, le flux est interrompu.
+    """
+    source = read_source(code_file)
+    input_prompt, names = _fix_prompt(source, code_file, issues, judge_feedback)
+
+    parser = CodeStreamParser()
+    try:
+        stream = get_client().stream_generate(
+            input_prompt,
+            api_key,
+            cache_content=source.text,
+            generation_config=_generation_config(temperature),
+        )
+        try:
+            for chunk in stream:
+                parser.feed(chunk)
+                if cancel is not None and cancel.is_set():
+                    parser.abort_reason = "cancelled: another candidate was selected"
+                if parser.abort_reason:
+                    break  # inutile d'attendre la fin : ce n'est pas du Python
+        finally:
+            stream.close()
+    except LLMError as e:
+        return _check_fix(source.text, input_prompt, names, parser, error=e, temperature=temperature)
+    return _check_fix(
+        source.text, input_prompt, names, parser, cache_hit=stream.cache_hit, temperature=temperature
+    )
+
+
+async def propose_fix_async(
+    code_file: str,
+    issues: list,
+    api_key: str,
+    judge_feedback: str = None,
+    temperature: float = None,
+    cancel=None,
+):
+    """Version asynchrone de propose_fix (la tâche peut aussi être annulée directement)."""
+    source = read_source(code_file)
+    input_prompt, names = _fix_prompt(source, code_file, issues, judge_feedback)
+
+    parser = CodeStreamParser()
+    try:
+        stream = await get_async_client().stream_generate(
+            input_prompt,
+            api_key,
+            cache_content=source.text,
+            generation_config=_generation_config(temperature),
+        )
+        try:
+            async for chunk in stream:
+                parser.feed(chunk)
+                if cancel is not None and cancel.is_set():
+                    parser.abort_reason = "cancelled: another candidate was selected"
+                if parser.abort_reason:
+                    break
+        finally:
+            await stream.aclose()
+    except LLMError as e:
+        return _check_fix(source.text, input_prompt, names, parser, error=e, temperature=temperature)
+    return _check_fix(
+        source.text, input_prompt, names, parser, cache_hit=stream.cache_hit, temperature=temperature
+    )
+
+
+def fix_code(
+    code_file: str, issues: list, api_key: str, judge_feedback: str = None
+) -> str:
+    """
+    Send refactoring prompt to LLM, optionally include judge feedback, save fixed code back to file.
+    Returns path to the fixed file (same as input).
+    """
+    return _write_fix(code_file, propose_fix(code_file, issues, api_key, judge_feedback))
+
+
+async def fix_code_async(
+    code_file: str, issues: list, api_key: str, judge_feedback: str = None
+) -> str:
+    """Version asynchrone de fix_code (même prompt, même validation, même journalisation)."""
+    return _write_fix(code_file, await propose_fix_async(code_file, issues, api_key, judge_feedback))
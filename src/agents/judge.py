@@ -1,22 +1,21 @@
 # src/agents/judge.py
-import subprocess
+import asyncio
 import os
-import sys
-import time
-import requests
+import threading
+from src.utils import metrics
+from src.utils.async_llm import get_async_client
+from src.utils.llm_client import LLMError, get_client
 from src.utils.logger import log_experiment, ActionType
+from src.utils.model_router import current_model
+from src.utils.scheduler import cpu_slot
+from src.utils.test_impact import failed_node_ids, select_tests
+from src.utils.test_runner import get_test_pool
 from src.utils.tool import read_file, write_file
+from src.utils.workspace import origin_path, pytest_args
 
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
 
-
-def generate_tests_for_code(code: str, api_key: str, module_name: str) -> str:
-    """
-    Generate pytest-compatible unit tests for the given Python code.
-    Returns the tests code string, or empty string on failure.
-    Also logs the generation interaction.
-    """
-    input_prompt = (
+def _tests_prompt(code: str, module_name: str) -> str:
+    return (
         f"You are a Python QA engineer.\n"
         f"Please write valid pytest unit tests for the following Python code. Ensure the test functions start with `test_` and are written correctly to use pytest.\n"
         f"Make sure to include edge cases where relevant and avoid unnecessary assertions.\n"
@@ -25,125 +24,250 @@ def generate_tests_for_code(code: str, api_key: str, module_name: str) -> str:
         f"{code}"
     )
 
-    payload = {"contents": [{"parts": [{"text": input_prompt}]}]}
-
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                f"{GEMINI_URL}?key={api_key}", json=payload, timeout=120
-            )
-            if response.status_code == 200:
-                tests_code = response.json()["candidates"][0]["content"]["parts"][0][
-                    "text"
-                ]
-                tests_code = (
-                    tests_code.replace("```python", "").replace("```", "").strip()
-                )
-                # Log successful generation
-                log_experiment(
-                    agent_name="JudgeAgent",
-                    model_used="gemini-1.5-flash",
-                    action=ActionType.GENERATION,
-                    details={
-                        "input_prompt": input_prompt,
-                        "output_response": tests_code,
-                    },
-                    status="SUCCESS",
-                )
-                return tests_code
-            else:
-                # log failure response content
-                log_experiment(
-                    agent_name="JudgeAgent",
-                    model_used="gemini-1.5-flash",
-                    action=ActionType.GENERATION,
-                    details={
-                        "input_prompt": input_prompt,
-                        "output_response": response.text,
-                    },
-                    status="FAILURE",
-                )
-        except requests.exceptions.RequestException as e:
-            log_experiment(
-                agent_name="JudgeAgent",
-                model_used="gemini-1.5-flash",
-                action=ActionType.DEBUG,
-                details={"input_prompt": input_prompt, "output_response": str(e)},
-                status="FAILURE",
-            )
-            if attempt == retries - 1:
-                break
-            time.sleep(5)
-
-    return ""
 
+def _log_generation(input_prompt: str, response=None, error: LLMError = None) -> str:
+    """Extrait le code des tests, journalise la génération et le retourne ("" en cas d'échec)."""
+    if error is not None:
+        log_experiment(
+            agent_name="JudgeAgent",
+            model_used=current_model(),
+            action=ActionType.GENERATION,
+            details={"input_prompt": input_prompt, "output_response": str(error)},
+            status="FAILURE",
+        )
+        return ""
 
-def run_tests(
-    code_file: str, api_key: str, module_name: str, generate_tests: bool = True
-) -> tuple:
+    tests_code = response.text.replace("```python", "").replace("```", "").strip()
+    details = {"input_prompt": input_prompt, "output_response": tests_code}
+    if response.cache_hit:
+        details["cache_hit"] = True
+    # Log successful generation
+    log_experiment(
+        agent_name="JudgeAgent",
+        model_used=current_model(),
+        action=ActionType.GENERATION,
+        details=details,
+        status="SUCCESS",
+    )
+    return tests_code
+
+
+def generate_tests_for_code(code: str, api_key: str, module_name: str) -> str:
     """
-    Run pytest for the target code file. If generate_tests is True, generate tests first.
-    Returns (success: bool, feedback: str) where feedback is pytest output or error message.
+    Generate pytest-compatible unit tests for the given Python code.
+    Returns the tests code string, or empty string on failure.
+    Also logs the generation interaction.
     """
-    directory = os.path.dirname(code_file)
-    if directory not in sys.path:
-        sys.path.insert(0, directory)
+    input_prompt = _tests_prompt(code, module_name)
+    # Retries (backoff + jitter sur 429/5xx) gérés par le client partagé
+    try:
+        response = get_client().generate(input_prompt, api_key, cache_content=code)
+    except LLMError as e:
+        return _log_generation(input_prompt, error=e)
+    return _log_generation(input_prompt, response)
 
-    test_file_path = code_file.replace(".py", "_test.py")
 
-    if generate_tests:
-        # Read codeee to send for test generation
-        code = read_file(code_file)
+async def generate_tests_for_code_async(code: str, api_key: str, module_name: str) -> str:
+    """Version asynchrone de generate_tests_for_code."""
+    input_prompt = _tests_prompt(code, module_name)
+    try:
+        response = await get_async_client().generate(input_prompt, api_key, cache_content=code)
+    except LLMError as e:
+        return _log_generation(input_prompt, error=e)
+    return _log_generation(input_prompt, response)
+
+
+# Tests en échec lors de la dernière exécution, par fichier de tests d'origine
+# (chaque tentative tourne dans sa propre copie de travail) : noms des tests, sans chemin
+_last_failures = {}
+_failures_lock = threading.Lock()
+
+
+def forget_failures(code_file: str = None) -> None:
+    """Fichier terminé : oublie ses derniers échecs de tests (tous les fichiers si code_file=None)."""
+    with _failures_lock:
+        if code_file is None:
+            _last_failures.clear()
+        else:
+            _last_failures.pop(origin_path(code_file.replace(".py", "_test.py")), None)
+
+
+def _run_pytest(test_file_path: str, **kwargs) -> dict:
+    """Un passage de pytest dans le pool (worker déjà chaud, timeout par test)."""
+    kwargs.setdefault("args", pytest_args(test_file_path))
+    with cpu_slot(), metrics.stage("pytest") as measure:
+        result = get_test_pool().run(test_file_path, **kwargs)
+        measure["ok"] = result["success"]
+    return result
+
+
+def _merge_results(first: dict, second: dict) -> dict:
+    merged = dict(second)
+    for key in ("passed", "failed", "errors", "skipped", "duration"):
+        merged[key] = first.get(key, 0) + second.get(key, 0)
+    merged["failures"] = first.get("failures", []) + second.get("failures", [])
+    merged["output"] = first.get("output", "") + second.get("output", "")
+    merged["success"] = first["success"] and second["success"]
+    return merged
 
+
+def generate_test_file(code_file: str, api_key: str, module_name: str) -> bool:
+    """Génère les tests de code_file et les écrit dans <module>_test.py. Retourne False en cas d'échec."""
+    # Read codeee to send for test generation
+    code = read_file(code_file)
+
+    with metrics.stage("generate_tests"):
         tests_code = generate_tests_for_code(code, api_key, module_name)
-        if not tests_code:
-            # Log generation failure (already logged inside generate_tests_for_code), return failure
-            feedback = "Failed to generate pytest tests.."
-            log_experiment(
-                agent_name="JudgeAgent",
-                model_used="gemini-1.5-flash",
-                action=ActionType.DEBUG,
-                details={
-                    "input_prompt": "Generate tests for code",
-                    "output_response": feedback,
-                },
-                status="FAILURE",
-            )
-            return False, feedback
-
-        # Write tests to file
-        write_file(test_file_path, tests_code)
+    if not tests_code:
+        return False
+
+    # Write tests to file
+    write_file(code_file.replace(".py", "_test.py"), tests_code)
+    return True
+
+
+async def generate_test_file_async(code_file: str, api_key: str, module_name: str) -> bool:
+    """Version asynchrone de generate_test_file."""
+    code = read_file(code_file)
+    with metrics.stage("generate_tests"):
+        tests_code = await generate_tests_for_code_async(code, api_key, module_name)
+    if not tests_code:
+        return False
+    write_file(code_file.replace(".py", "_test.py"), tests_code)
+    return True
 
+
+def _generation_failed() -> tuple:
+    # Log generation failure (already logged inside generate_tests_for_code), return failure
+    feedback = "Failed to generate pytest tests.."
+    log_experiment(
+        agent_name="JudgeAgent",
+        model_used=current_model(),
+        action=ActionType.DEBUG,
+        details={
+            "input_prompt": "Generate tests for code",
+            "output_response": feedback,
+        },
+        status="FAILURE",
+    )
+    return False, feedback
+
+
+def _tests_missing() -> tuple:
+    feedback = "Test file not found; cannot re-run tests."
+    log_experiment(
+        agent_name="JudgeAgent",
+        model_used="local",
+        action=ActionType.DEBUG,
+        details={
+            "input_prompt": "Check test file existence",
+            "output_response": feedback,
+        },
+        status="FAILURE",
+    )
+    return False, feedback
+
+
+def _execute_tests(code_file: str, test_file_path: str, module_name: str, changed_units: set) -> tuple:
+    """Passe pytest (tests impactés d'abord si changed_units), journalise, retourne (succès, sortie)."""
+    selected = None
+    if changed_units is not None:
+        selected = select_tests(
+            test_file_path, read_file(test_file_path), read_file(code_file), module_name, changed_units
+        )
+    origin = origin_path(test_file_path)
+    if selected is not None:
+        with _failures_lock:
+            last_failures = list(_last_failures.get(origin, []))
+        for test_id in last_failures:
+            node_id = f"{test_file_path}::{test_id}"
+            if node_id not in selected:
+                selected.append(node_id)
+
+    # Run pytest on the test file (worker already warm, per-test timeout)
+    if selected:
+        print(f"🎯 Running {len(selected)} impacted test(s) first")
+        result = _run_pytest(test_file_path, node_ids=selected)
+        if result["success"]:
+            # Contrôle de sécurité : le reste du fichier sur la même version du code
+            result = _merge_results(result, _run_pytest(test_file_path, exclude=selected))
     else:
-        # If not generating tests, make sure test file exists
-        if not os.path.exists(test_file_path):
-            feedback = "Test file not found; cannot re-run tests."
-            log_experiment(
-                agent_name="JudgeAgent",
-                model_used="local",
-                action=ActionType.DEBUG,
-                details={
-                    "input_prompt": "Check test file existence",
-                    "output_response": feedback,
-                },
-                status="FAILURE",
-            )
-            return False, feedback
-
-    # Run pytest on the test file
-    result = subprocess.run(["pytest", test_file_path], capture_output=True, text=True)
-
-    output = result.stdout + result.stderr
-    status = "SUCCESS" if result.returncode == 0 else "FAILURE"
+        result = _run_pytest(test_file_path)
+    failed = [node_id.split("::", 1)[1] for node_id in failed_node_ids(test_file_path, result.get("failures", []))]
+    with _failures_lock:
+        _last_failures[origin] = failed
+
+    output = result["output"]
+    status = "SUCCESS" if result["success"] else "FAILURE"
 
     # Log pytest execution (DEBUG)
     log_experiment(
         agent_name="JudgeAgent",
         model_used="local",
         action=ActionType.DEBUG,
-        details={"input_prompt": "pytest execution", "output_response": output},
+        details={
+            "input_prompt": "pytest execution",
+            "output_response": output,
+            "passed": result.get("passed", 0),
+            "failed": result.get("failed", 0),
+            "errors": result.get("errors", 0),
+            "duration": result.get("duration", 0.0),
+            "impacted_tests": len(selected) if selected is not None else None,
+        },
         status=status,
     )
 
-    return result.returncode == 0, output
+    return result["success"], output
+
+
+def run_tests(
+    code_file: str,
+    api_key: str,
+    module_name: str,
+    generate_tests: bool = True,
+    changed_units: set = None,
+) -> tuple:
+    """
+    Run pytest for the target code file. If generate_tests is True, generate tests first.
+    With changed_units (names of the functions/classes the fixer changed), the tests
+    that exercise them and the tests that failed last time run first; the rest of
+    the file only runs if they pass, so the whole file is still checked once.
+    Returns (success: bool, feedback: str) where feedback is pytest output or error message.
+    """
+    test_file_path = code_file.replace(".py", "_test.py")
+
+    if generate_tests:
+        if not generate_test_file(code_file, api_key, module_name):
+            return _generation_failed()
+
+    elif not os.path.exists(test_file_path):
+        # If not generating tests, make sure test file exists
+        return _tests_missing()
+
+    return _execute_tests(code_file, test_file_path, module_name, None if generate_tests else changed_units)
+
+
+async def run_tests_async(
+    code_file: str,
+    api_key: str,
+    module_name: str,
+    generate_tests: bool = True,
+    changed_units: set = None,
+) -> tuple:
+    """
+    Version asynchrone de run_tests. La génération passe par le client asynchrone ;
+    pytest tourne dans le pool de workers déjà démarrés, attendu depuis un thread
+    pour ne pas bloquer la boucle.
+    """
+    test_file_path = code_file.replace(".py", "_test.py")
+
+    if generate_tests:
+        if not await generate_test_file_async(code_file, api_key, module_name):
+            return _generation_failed()
+
+    elif not os.path.exists(test_file_path):
+        return _tests_missing()
+
+    return await asyncio.to_thread(
+        _execute_tests, code_file, test_file_path, module_name, None if generate_tests else changed_units
+    )
@@ -0,0 +1,117 @@
+# src/agents/speculative.py
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from src.agents.fixer import propose_fix, propose_fix_async
+from src.utils import metrics
+from src.utils.lint import lint_file
+from src.utils.logger import log_experiment, ActionType
+from src.utils.scheduler import cpu_slot
+from src.utils.test_runner import get_test_pool
+from src.utils.workspace import Scratch, pytest_args
+
+# Température de génération de chaque candidat (dans l'ordre, puis on recommence)
+TEMPERATURES = (0.2, 0.7, 1.0, 0.4, 0.9, 0.0)
+
+
+@dataclass
+class Candidate:
+    index: int
+    temperature: float
+    code: str = None
+    score: float = 0.0
+    success: bool = False
+    passed: int = 0
+    output: str = ""
+
+
+def _evaluate(workspace: Scratch, candidate: Candidate, cancel: threading.Event) -> Candidate:
+    """Score pylint et tests du candidat, dans sa propre copie de l'espace de travail."""
+    if candidate.code is None or cancel.is_set():
+        return candidate
+
+    with workspace.fork(f"cand{candidate.index}") as scratch:
+        scratch.write(candidate.code)
+        with metrics.stage("pylint"):
+            candidate.score = lint_file(scratch.file_path, slot=cpu_slot).score
+        if cancel.is_set():
+            return candidate
+        with cpu_slot(), metrics.stage("pytest") as measure:
+            result = get_test_pool().run(scratch.test_path, args=pytest_args(scratch.test_path))
+            measure["ok"] = result["success"]
+
+    candidate.success = result["success"]
+    candidate.passed = result.get("passed", 0)
+    candidate.output = result["output"]
+    log_experiment(
+        agent_name="JudgeAgent",
+        model_used="local",
+        action=ActionType.DEBUG,
+        details={
+            "input_prompt": f"pytest execution (speculative candidate {candidate.index}, temperature {candidate.temperature})",
+            "output_response": candidate.output,
+            "score": candidate.score,
+            "passed": candidate.passed,
+            "failed": result.get("failed", 0),
+            "errors": result.get("errors", 0),
+        },
+        status="SUCCESS" if candidate.success else "FAILURE",
+    )
+    return candidate
+
+
+async def race_fixes(
+    workspace: Scratch,
+    issues: list,
+    api_key: str,
+    score_floor: float,
+    count: int,
+    use_async: bool = False,
+) -> tuple:
+    """
+    Demande `count` corrections en parallèle (températures différentes) et évalue
+    chacune dans sa propre copie de `workspace`. Le premier candidat qui passe les tests avec
+    un score pylint >= score_floor gagne ; les autres sont annulés.
+    Retourne (gagnant ou None, meilleur candidat évalué ou None).
+    """
+    cancel = threading.Event()
+    candidates = [Candidate(index, TEMPERATURES[index % len(TEMPERATURES)]) for index in range(count)]
+
+    async def attempt(candidate: Candidate) -> Candidate:
+        try:
+            if use_async:
+                candidate.code = await propose_fix_async(
+                    workspace.file_path, issues, api_key, temperature=candidate.temperature, cancel=cancel
+                )
+            else:
+                candidate.code = await asyncio.to_thread(
+                    propose_fix, workspace.file_path, issues, api_key, None, candidate.temperature, cancel
+                )
+            return await asyncio.to_thread(_evaluate, workspace, candidate, cancel)
+        except Exception as e:  # un candidat en erreur ne doit pas arrêter la course
+            candidate.code = None
+            candidate.output = str(e)
+            return candidate
+
+    tasks = [asyncio.create_task(attempt(candidate)) for candidate in candidates]
+    winner = None
+    evaluated = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            candidate = await next_done
+            if candidate.code is None:
+                continue
+            evaluated.append(candidate)
+            if candidate.success and candidate.score >= score_floor:
+                winner = candidate
+                break
+    finally:
+        # Les perdants s'arrêtent au prochain morceau reçu / avant leurs tests
+        cancel.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    best = max(evaluated, key=lambda c: (c.success, c.passed, c.score), default=None)
+    return winner, best
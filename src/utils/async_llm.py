@@ -0,0 +1,249 @@
+# src/utils/async_llm.py
+import asyncio
+import time
+
+from src.utils import metrics
+from src.utils.cache import get_cache
+from src.utils.llm_client import (
+    RETRY_STATUSES,
+    GeminiClient,
+    LLMError,
+    LLMResponse,
+    estimate_tokens,
+    get_client,
+    sse_texts,
+)
+from src.utils.scheduler import llm_limit
+
+
+def _import_aiohttp():
+    """aiohttp n'est nécessaire qu'en mode asynchrone."""
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise RuntimeError("The async agents need aiohttp: pip install aiohttp") from e
+    return aiohttp
+
+
+def _transient_errors(aiohttp) -> tuple:
+    """Erreurs réseau réessayées : connexion, délai, corps de réponse coupé (comme le client synchrone)."""
+    return (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+class AsyncLLMStream:
+    """Version asynchrone de LLMStream : `async for chunk in stream`, puis `await stream.aclose()`."""
+
+    def __init__(self, chunks, cache_hit: bool = False, model: str = None):
+        self._chunks = chunks
+        self.cache_hit = cache_hit
+        self.model = model
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+    async def aclose(self) -> None:
+        aclose = getattr(self._chunks, "aclose", None)
+        if aclose:
+            await aclose()
+
+
+async def _cached_chunks(text: str):
+    yield text
+
+
+class AsyncGeminiClient:
+    """
+    Client Gemini pour asyncio (aiohttp). Seul le transport lui est propre :
+    URL, modèle, backoff, traitement des réponses et du SSE, limiteur RPM/TPM,
+    budget, cache et métriques sont ceux du client synchrone partagé.
+    Le nombre de requêtes simultanées suit la limite LLM du scheduler.
+    """
+
+    def __init__(self, client: GeminiClient = None, connections: int = None):
+        self.client = client or get_client()
+        self.connections = connections or llm_limit()
+        self._session = None
+        self._loop = None
+        self._slots = None
+
+    async def _ensure_session(self):
+        # Une session aiohttp est liée à sa boucle : on la recrée si la boucle a changé
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            aiohttp = _import_aiohttp()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections),
+                timeout=aiohttp.ClientTimeout(total=self.client.timeout),
+            )
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.connections)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _acquire(self, tokens: int) -> None:
+        while True:
+            wait = self.client.limiter.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def generate(
+        self,
+        prompt: str,
+        api_key: str,
+        cache_content: str = None,
+        model: str = None,
+        generation_config: dict = None,
+    ) -> LLMResponse:
+        """Équivalent asynchrone de GeminiClient.generate()."""
+        aiohttp = _import_aiohttp()
+        model = model or self.client.model_for()
+        cache_key, cached = self.client._cache_lookup(model, prompt, cache_content, generation_config)
+        if cached is not None:
+            return LLMResponse(text=cached, cache_hit=True, model=model)
+
+        session = await self._ensure_session()
+        body = self.client._body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        self.client.budget.reserve(estimated)
+        response = None
+        try:
+            response = await self._post(aiohttp, session, model, body, api_key, estimated, cache_key)
+            return response
+        finally:
+            if response is None:
+                self.client.budget.settle(model, estimated)
+            else:
+                self.client.budget.settle(model, estimated, response.prompt_tokens, response.response_tokens)
+
+    async def _post(self, aiohttp, session, model: str, body: bytes, api_key: str, estimated: int, cache_key: str):
+        last_error = None
+        for attempt in range(self.client.max_retries + 1):
+            await self._acquire(estimated)
+            retry_after = None
+            counters = {"bytes_sent": len(body)}
+            start = time.perf_counter()
+            try:
+                async with self._slots:
+                    async with session.post(
+                        self.client.url(model), data=body, headers=self.client._headers(api_key)
+                    ) as response:
+                        status = response.status
+                        raw = await response.read()
+                        retry_after = response.headers.get("Retry-After")
+            except _transient_errors(aiohttp) as e:
+                metrics.record("llm.generate", time.perf_counter() - start, ok=False, **counters)
+                last_error = LLMError(str(e) or type(e).__name__)
+            except aiohttp.ClientError as e:
+                metrics.record("llm.generate", time.perf_counter() - start, ok=False, **counters)
+                raise LLMError(str(e))
+            else:
+                try:
+                    return self.client._completion(status, raw, counters, start, model, estimated, cache_key, attempt)
+                except LLMError as e:
+                    if e.status_code not in RETRY_STATUSES:
+                        raise
+                    last_error = e
+
+            if attempt < self.client.max_retries:
+                await asyncio.sleep(self.client._backoff(attempt, retry_after))
+
+        raise last_error
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        api_key: str,
+        cache_content: str = None,
+        model: str = None,
+        generation_config: dict = None,
+    ) -> AsyncLLMStream:
+        """Équivalent asynchrone de GeminiClient.stream_generate() (SSE)."""
+        model = model or self.client.model_for()
+        cache_key, cached = self.client._cache_lookup(model, prompt, cache_content, generation_config)
+        if cached is not None:
+            return AsyncLLMStream(_cached_chunks(cached), cache_hit=True, model=model)
+
+        body = self.client._body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        self.client.budget.reserve(estimated)
+        start = time.perf_counter()
+        try:
+            response = await self._open_stream(model, body, api_key, estimated)
+        except BaseException:
+            self.client.budget.settle(model, estimated)
+            raise
+        return AsyncLLMStream(
+            self._iter_stream(response, cache_key, model, start, len(body), estimated), model=model
+        )
+
+    async def _open_stream(self, model: str, body: bytes, api_key: str, estimated: int):
+        aiohttp = _import_aiohttp()
+        session = await self._ensure_session()
+        url = f"{self.client.url(model, 'streamGenerateContent')}?alt=sse"
+        last_error = None
+        for attempt in range(self.client.max_retries + 1):
+            await self._acquire(estimated)
+            retry_after = None
+            try:
+                async with self._slots:
+                    response = await session.post(url, data=body, headers=self.client._headers(api_key))
+                    if response.status != 200:
+                        text_body = await response.text(errors="replace")
+                        response.release()
+            except _transient_errors(aiohttp) as e:
+                last_error = LLMError(str(e) or type(e).__name__)
+            except aiohttp.ClientError as e:
+                raise LLMError(str(e))
+            else:
+                if response.status == 200:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                last_error = LLMError(text_body, status_code=response.status)
+                if response.status not in RETRY_STATUSES:
+                    raise last_error
+
+            if attempt < self.client.max_retries:
+                await asyncio.sleep(self.client._backoff(attempt, retry_after))
+
+        raise last_error
+
+    async def _iter_stream(
+        self, response, cache_key: str, model: str, start: float, bytes_sent: int, estimated: int
+    ):
+        aiohttp = _import_aiohttp()
+        parts = []
+        counters = {"bytes_sent": bytes_sent, "bytes_received": 0}
+        complete = False
+        try:
+            async with self._slots:
+                async for raw_line in response.content:
+                    counters["bytes_received"] += len(raw_line)
+                    for text in sse_texts(raw_line.decode("utf-8", errors="replace"), counters):
+                        parts.append(text)
+                        yield text
+            complete = True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise LLMError(str(e) or type(e).__name__)
+        finally:
+            response.close()
+            self.client._end_stream(parts, counters, start, model, estimated, complete)
+
+        if cache_key is not None:
+            get_cache().put(cache_key, "".join(parts), model=model)
+
+
+_async_client = None
+
+
+def get_async_client() -> AsyncGeminiClient:
+    """Client asynchrone partagé, recréé si le client synchrone a été reconfiguré."""
+    global _async_client
+    client = get_client()
+    if _async_client is None or _async_client.client is not client:
+        _async_client = AsyncGeminiClient(client)
+    return _async_client
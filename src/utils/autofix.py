@@ -0,0 +1,337 @@
+# src/utils/autofix.py
+import ast
+import io
+import re
+import tokenize
+from dataclasses import dataclass, field
+
+# Messages pylint corrigés localement (réécritures sûres, sans appel au LLM)
+FIXABLE = {
+    "trailing-whitespace": "C0303",
+    "missing-final-newline": "C0304",
+    "trailing-newlines": "C0305",
+    "unused-import": "W0611",
+    "multiple-imports": "C0410",
+    "singleton-comparison": "C0121",
+    "unnecessary-semicolon": "W0301",
+    "unnecessary-pass": "W0107",
+    "useless-return": "R1711",
+}
+
+# "Unused import os" / "Unused sqrt imported from math" / "Unused numpy imported as np"
+_UNUSED_IMPORT = re.compile(r"^Unused (?:import (?P<module>[\w.]+)|(?P<name>[\w.]+) imported (?:from [\w.]+|as (?P<alias>\w+)))")
+
+
+@dataclass
+class AutofixResult:
+    source: str
+    applied: dict = field(default_factory=dict)  # symbole pylint -> nombre de messages corrigés
+    remaining: list = field(default_factory=list)  # messages pylint à traiter par le LLM
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.applied)
+
+
+class _Edits:
+    """
+    Modifications d'un fichier, exprimées sur les numéros de ligne d'origine :
+    remplacement de blocs de lignes (imports, instructions supprimées) et
+    transformations d'une ligne (espaces, ';', comparaisons), appliqués en une fois.
+    Les transformations d'une ligne sont repérées par leur colonne d'origine et
+    appliquées de droite à gauche : une réécriture ne décale pas les suivantes.
+    """
+
+    def __init__(self, lines: list):
+        self.lines = lines
+        self.blocks = {}  # première ligne -> (dernière ligne, nouvelles lignes)
+        self.line_fixes = {}  # ligne -> [(colonne, fonction(texte) -> texte)]
+        self.removed = {}  # id(liste d'instructions) -> instructions déjà supprimées de ce bloc
+
+    def _overlaps(self, start: int, end: int) -> bool:
+        return any(s <= end and start <= e for s, (e, _) in self.blocks.items())
+
+    def replace(self, start: int, end: int, new_lines: list) -> bool:
+        if self._overlaps(start, end):
+            return False
+        self.blocks[start] = (end, new_lines)
+        return True
+
+    def can_remove_from(self, body: list) -> bool:
+        """Il restera au moins une instruction dans le bloc après une suppression de plus."""
+        return len(body) - self.removed.get(id(body), 0) > 1
+
+    def remove_from(self, body: list, start: int, end: int) -> bool:
+        """Supprime les lignes d'une instruction de body, en comptant la suppression."""
+        if not self.replace(start, end, []):
+            return False
+        self.removed[id(body)] = self.removed.get(id(body), 0) + 1
+        return True
+
+    def fix_line(self, line: int, column: int, fix) -> None:
+        self.line_fixes.setdefault(line, []).append((column, fix))
+
+    def apply(self) -> list:
+        result = []
+        number = 1
+        while number <= len(self.lines):
+            if number in self.blocks:
+                end, new_lines = self.blocks[number]
+                result.extend(new_lines)
+                number = end + 1
+                continue
+            text = self.lines[number - 1]
+            for _, fix in sorted(self.line_fixes.get(number, ()), key=lambda item: item[0], reverse=True):
+                text = fix(text)
+            result.append(text)
+            number += 1
+        return result
+
+
+def _string_lines(source: str) -> set:
+    """Lignes dont la fin est à l'intérieur d'une chaîne multiligne (leurs espaces font partie de la chaîne)."""
+    inside = set()
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.STRING and token.end[0] > token.start[0]:
+            inside.update(range(token.start[0], token.end[0]))
+    return inside
+
+
+def _token_positions(source: str) -> tuple:
+    """Colonnes des '==' / '!=' suivis de None, et des ';' en fin de ligne logique, par ligne."""
+    comparisons, semicolons = {}, {}
+    tokens = [t for t in tokenize.generate_tokens(io.StringIO(source).readline) if t.type != tokenize.NL]
+    for token, following in zip(tokens, tokens[1:]):
+        if token.type != tokenize.OP:
+            continue
+        if token.string in ("==", "!=") and following.type == tokenize.NAME and following.string == "None":
+            comparisons.setdefault(token.start[0], []).append((token.start[1], token.end[1], token.string))
+        elif token.string == ";" and following.type in (tokenize.NEWLINE, tokenize.COMMENT, tokenize.ENDMARKER):
+            semicolons[token.start[0]] = token.start[1]
+    return comparisons, semicolons
+
+
+def _alone_on_lines(node, lines: list) -> bool:
+    """L'instruction occupe seule ses lignes (pas de `a; b`, commentaire final toléré)."""
+    before = lines[node.lineno - 1][: node.col_offset]
+    after = lines[node.end_lineno - 1][node.end_col_offset :].strip()
+    return not before.strip() and (not after or after.startswith("#"))
+
+
+def _parents(tree: ast.AST) -> dict:
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return parents
+
+
+def _body_of(node, parents: dict) -> list:
+    """Liste d'instructions (body, orelse, finalbody...) qui contient node."""
+    parent = parents.get(node)
+    for name in ("body", "orelse", "finalbody", "handlers"):
+        block = getattr(parent, name, None)
+        if isinstance(block, list) and node in block:
+            return block
+    return []
+
+
+def _remove_statement(edits: _Edits, node, lines: list, parents: dict) -> bool:
+    """Supprime une instruction (remplacée par `pass` si c'est la dernière qui reste dans son bloc)."""
+    if not _alone_on_lines(node, lines):
+        return False
+    body = _body_of(node, parents)
+    if edits.can_remove_from(body) or isinstance(parents.get(node), ast.Module):
+        return edits.remove_from(body, node.lineno, node.end_lineno)
+    indent = lines[node.lineno - 1][: node.col_offset]
+    return edits.replace(node.lineno, node.end_lineno, [f"{indent}pass"])
+
+
+def _import_text(node, aliases: list) -> str:
+    names = ", ".join(alias.name + (f" as {alias.asname}" if alias.asname else "") for alias in aliases)
+    if isinstance(node, ast.ImportFrom):
+        return f"from {'.' * node.level}{node.module or ''} import {names}"
+    return f"import {names}"
+
+
+def _bound_name(alias) -> str:
+    return alias.asname or alias.name.split(".")[0]
+
+
+def _unused_name(message: str):
+    """Nom lié par l'import inutilisé, d'après le texte du message pylint (None si non reconnu)."""
+    match = _UNUSED_IMPORT.match(message)
+    if not match or "wildcard" in message:
+        return None
+    if match.group("module"):
+        return match.group("module")
+    return match.group("alias") or match.group("name")
+
+
+def _fix_imports(edits, lines, tree, parents, unused: list, multiple: list) -> set:
+    """unused-import et multiple-imports : réécrit chaque instruction import concernée."""
+    handled = set()
+    imports = {
+        node.lineno: node
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and not (isinstance(node, ast.ImportFrom) and node.module == "__future__")
+    }
+    by_node = {}
+    for index, message in unused:
+        node = imports.get(message["line"])
+        name = _unused_name(message["message"])
+        if node is None or name is None:
+            continue
+        by_node.setdefault(node, ([], []))[0].append((index, name))
+    for index, message in multiple:
+        node = imports.get(message["line"])
+        if node is not None:
+            by_node.setdefault(node, ([], []))[1].append(index)
+
+    for node, (unused_names, split) in by_node.items():
+        if not _alone_on_lines(node, lines):
+            continue
+        names = {name for _, name in unused_names}
+        kept = [
+            alias
+            for alias in node.names
+            if _bound_name(alias) not in names and alias.name not in names and alias.asname not in names
+        ]
+        if len(kept) == len(node.names) and not split:
+            continue  # nom du message introuvable dans l'instruction : on n'y touche pas
+        if not kept:
+            done = _remove_statement(edits, node, lines, parents)
+        else:
+            indent = lines[node.lineno - 1][: node.col_offset]
+            comment = lines[node.end_lineno - 1][node.end_col_offset :].strip()
+            if isinstance(node, ast.Import):
+                new_lines = [f"{indent}{_import_text(node, [alias])}" for alias in kept]
+            else:
+                new_lines = [f"{indent}{_import_text(node, kept)}"]
+            if comment:
+                new_lines[-1] += f"  {comment}"
+            done = edits.replace(node.lineno, node.end_lineno, new_lines)
+        if done:
+            handled.update(index for index, _ in unused_names)
+            handled.update(split)  # un import par ligne (ou plus d'import du tout)
+    return handled
+
+
+def _fix_statements(edits, lines, tree, parents, passes: list, returns: list) -> set:
+    """
+    unnecessary-pass et useless-return : suppression d'instructions sans effet.
+    Un bloc garde toujours au moins une instruction, même si plusieurs messages le vident.
+    """
+    handled = set()
+    pass_nodes = {node.lineno: node for node in ast.walk(tree) if isinstance(node, ast.Pass)}
+    for index, message in passes:
+        node = pass_nodes.get(message["line"])
+        if node is None or not _alone_on_lines(node, lines):
+            continue
+        body = _body_of(node, parents)
+        if edits.can_remove_from(body) and edits.remove_from(body, node.lineno, node.end_lineno):
+            handled.add(index)
+
+    functions = {
+        node.lineno: node for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+    for index, message in returns:
+        function = functions.get(message["line"])
+        if function is None or not edits.can_remove_from(function.body):
+            continue
+        last = function.body[-1]
+        is_useless = isinstance(last, ast.Return) and (
+            last.value is None or (isinstance(last.value, ast.Constant) and last.value.value is None)
+        )
+        if not is_useless or not _alone_on_lines(last, lines):
+            continue
+        if edits.remove_from(function.body, last.lineno, last.end_lineno):
+            handled.add(index)
+    return handled
+
+
+def _fix_tokens(edits, source: str, comparisons: list, semicolons: list) -> set:
+    """singleton-comparison (== None) et unnecessary-semicolon, à partir des tokens."""
+    handled = set()
+    comparison_cols, semicolon_cols = _token_positions(source)
+
+    for index, message in comparisons:
+        if "None" not in message["message"] or message["line"] not in comparison_cols:
+            continue  # `== True` ne se remplace pas par `is True` sans changer le sens
+        handled.add(index)
+    for line in {message["line"] for index, message in comparisons if index in handled}:
+        for start, end, operator in comparison_cols[line]:
+            replacement = "is" if operator == "==" else "is not"
+            edits.fix_line(
+                line, start, lambda text, start=start, end=end, new=replacement: f"{text[:start]}{new}{text[end:]}"
+            )
+
+    for index, message in semicolons:
+        line = message["line"]
+        if line not in semicolon_cols:
+            continue
+        col = semicolon_cols.pop(line)
+        edits.fix_line(line, col, lambda text, col=col: text[:col].rstrip() + text[col + 1 :])
+        handled.add(index)
+    return handled
+
+
+def fix_source(source: str, messages: list) -> AutofixResult:
+    """
+    Applique les corrections locales aux messages pylint de FIXABLE.
+    Les autres messages, et ceux qu'une réécriture sûre ne couvre pas
+    (instruction partagée avec une autre sur la ligne, etc.), restent dans `remaining`.
+    Si le résultat ne se compile plus, le code d'origine est retourné tel quel.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return AutofixResult(source=source, remaining=list(messages))
+
+    lines = source.splitlines()
+    parents = _parents(tree)
+    edits = _Edits(lines)
+    by_symbol = {}
+    for index, message in enumerate(messages):
+        by_symbol.setdefault(message["symbol"], []).append((index, message))
+
+    handled = _fix_imports(
+        edits, lines, tree, parents, by_symbol.get("unused-import", []), by_symbol.get("multiple-imports", [])
+    )
+    handled |= _fix_statements(
+        edits, lines, tree, parents, by_symbol.get("unnecessary-pass", []), by_symbol.get("useless-return", [])
+    )
+    handled |= _fix_tokens(
+        edits, source, by_symbol.get("singleton-comparison", []), by_symbol.get("unnecessary-semicolon", [])
+    )
+
+    in_strings = _string_lines(source)
+    for index, message in by_symbol.get("trailing-whitespace", []):
+        if message["line"] not in in_strings:
+            edits.fix_line(message["line"], len(lines[message["line"] - 1]), str.rstrip)
+            handled.add(index)
+
+    new_lines = edits.apply()
+    # Fin de fichier : exactement un saut de ligne (missing-final-newline, trailing-newlines)
+    while new_lines and not new_lines[-1].strip():
+        new_lines.pop()
+    new_source = "\n".join(new_lines) + "\n" if new_lines else ""
+    for symbol in ("missing-final-newline", "trailing-newlines"):
+        handled.update(index for index, _ in by_symbol.get(symbol, []))
+
+    try:
+        compile(new_source, "<autofix>", "exec")
+    except SyntaxError:
+        return AutofixResult(source=source, remaining=list(messages))
+
+    applied = {}
+    for index in handled:
+        symbol = messages[index]["symbol"]
+        applied[symbol] = applied.get(symbol, 0) + 1
+    remaining = [message for index, message in enumerate(messages) if index not in handled]
+    return AutofixResult(source=new_source, applied=applied, remaining=remaining)
+
+
+def format_message(message: dict) -> str:
+    """Message pylint sous la forme d'une issue d'audit ("line N: [symbol] message")."""
+    return f"line {message['line']}: [{message['symbol']}] {message['message']}"
@@ -0,0 +1,159 @@
+# src/utils/cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Cache disque des réponses LLM : une entrée JSON par clé, rangée par préfixe
+CACHE_DIR = os.path.join(".cache", "llm")
+MAX_CACHE_BYTES = 200 * 1024 * 1024  # 200 Mo
+MAX_CACHE_AGE = 7 * 24 * 3600  # 7 jours
+EVICT_EVERY = 100  # éviction par taille tous les N put()
+
+
+class ResponseCache:
+    """
+    Cache des réponses Gemini adressé par contenu (sha256 de modèle + prompt + fichier).
+    - enabled=False : aucune lecture ni écriture (--no-cache)
+    - refresh=True  : on ignore les entrées existantes mais on réécrit (--refresh-cache)
+    """
+
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        max_bytes: int = MAX_CACHE_BYTES,
+        max_age: float = MAX_CACHE_AGE,
+        enabled: bool = True,
+        refresh: bool = False,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, content: str = "", *extra: str) -> str:
+        """Clé stable pour (modèle, prompt, contenu du fichier[, paramètres de génération])."""
+        digest = hashlib.sha256()
+        for part in (model, prompt, content, *extra):
+            data = part.encode("utf-8")
+            # Préfixe de longueur : ("ab", "c") et ("a", "bc") ne collisionnent pas
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """Retourne le texte en cache, ou None (miss, expiré, désactivé ou refresh)."""
+        if not self.enabled:
+            return None
+        if self.refresh:
+            self._count(hit=False)
+            return None
+
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            self._count(hit=False)
+            return None
+
+        # Marque l'entrée comme récemment utilisée (éviction LRU par mtime)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hit=True)
+        return text
+
+    def put(self, key: str, text: str, model: str = "") -> None:
+        """Enregistre une réponse (écriture atomique par renommage)."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": model, "created": time.time(), "text": text}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.writes += 1
+            should_evict = self.writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Supprime les entrées expirées puis les plus anciennes au-delà de max_bytes."""
+        if not os.path.isdir(self.directory):
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    removed += _remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            removed += _remove(path)
+            total -= size
+        return removed
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+def _remove(path: str) -> int:
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
+
+
+_cache = ResponseCache()
+
+
+def get_cache() -> ResponseCache:
+    """Cache partagé par tous les agents."""
+    return _cache
+
+
+def configure_cache(enabled: bool = True, refresh: bool = False) -> ResponseCache:
+    """Applique les options --no-cache / --refresh-cache."""
+    _cache.enabled = enabled
+    _cache.refresh = refresh
+    return _cache
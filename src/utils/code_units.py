@@ -0,0 +1,282 @@
+# src/utils/code_units.py
+import ast
+import re
+from dataclasses import dataclass, field
+
+# Références à des lignes dans les issues ("line 12", "L12") et les tracebacks ("calc.py:12:")
+LINE_REFERENCE = re.compile(r"(?:\bline\s+|\bL|\.py:)(\d+)", re.IGNORECASE)
+
+# Nom spécial : le code de module (imports, constantes) a changé, tout est concerné
+ALL_UNITS = "*"
+
+
+@dataclass
+class CodeUnit:
+    """Fonction ou classe de premier niveau, avec ses décorateurs."""
+
+    name: str
+    kind: str  # "function" ou "class"
+    start: int  # première ligne (1-based, décorateurs inclus)
+    end: int  # dernière ligne incluse
+    source: str
+    signature: str
+    members: list = field(default_factory=list)  # noms des méthodes d'une classe
+
+
+def _signature(node, lines: list) -> str:
+    """Ligne(s) d'en-tête de la définition, jusqu'au ':' du corps."""
+    header_end = node.body[0].lineno - 1 if node.body else node.lineno
+    header = lines[node.lineno - 1 : max(node.lineno, header_end)]
+    text = "\n".join(header).rstrip()
+    if isinstance(node, ast.ClassDef):
+        return text
+    return f"{text}\n    ..."
+
+
+def split_units(source: str, tree: ast.Module = None) -> list:
+    """Découpe un module en unités (fonctions et classes de premier niveau)."""
+    if tree is None:
+        tree = ast.parse(source)
+    lines = source.splitlines()
+    units = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        end = node.end_lineno
+        members = []
+        if isinstance(node, ast.ClassDef):
+            members = [
+                child.name
+                for child in node.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+        units.append(
+            CodeUnit(
+                name=node.name,
+                kind="class" if isinstance(node, ast.ClassDef) else "function",
+                start=start,
+                end=end,
+                source="\n".join(lines[start - 1 : end]),
+                signature=_signature(node, lines),
+                members=members,
+            )
+        )
+    return units
+
+
+def referenced_lines(text: str, file_name: str = None) -> set:
+    """Numéros de ligne cités ; avec file_name, seulement ceux du traceback de ce fichier."""
+    if file_name:
+        pattern = re.compile(rf"{re.escape(file_name)}\"?(?:, line |:)(\d+)")
+        return {int(number) for number in pattern.findall(text or "")}
+    return {int(number) for number in LINE_REFERENCE.findall(text or "")}
+
+
+def _mentions(text: str, name: str) -> bool:
+    return re.search(rf"\b{re.escape(name)}\b", text) is not None
+
+
+def units_for_text(units: list, text: str, file_name: str = None) -> list:
+    """Unités désignées par un texte (numéro de ligne ou nom de fonction/classe/méthode)."""
+    lines = referenced_lines(text, file_name)
+    selected = []
+    for unit in units:
+        by_line = any(unit.start <= line <= unit.end for line in lines)
+        by_name = _mentions(text, unit.name) or any(_mentions(text, m) for m in unit.members)
+        if by_line or by_name:
+            selected.append(unit)
+    return selected
+
+
+def select_units(units: list, issues: list, judge_feedback: str = None, file_name: str = None):
+    """
+    Unités à envoyer au fixer, ou None s'il faut envoyer tout le fichier :
+    - avec un retour de pytest : les unités citées par le traceback ;
+    - sinon : les unités citées par les issues, à condition que CHAQUE issue
+      désigne au moins une unité (une issue globale demande le fichier entier).
+    """
+    if judge_feedback:
+        selected = units_for_text(units, judge_feedback, file_name)
+        return selected or None
+
+    selected = []
+    for issue in issues:
+        matches = units_for_text(units, str(issue))
+        if not matches:
+            return None
+        for unit in matches:
+            if unit not in selected:
+                selected.append(unit)
+    return selected or None
+
+
+def _module_level(source: str, units: list) -> list:
+    """Lignes non vides du module hors fonctions/classes (imports, constantes...)."""
+    covered = set()
+    for unit in units:
+        covered.update(range(unit.start, unit.end + 1))
+    return [
+        line.rstrip()
+        for number, line in enumerate(source.splitlines(), 1)
+        if number not in covered and line.strip()
+    ]
+
+
+def context_for(source: str, units: list, selected: list) -> str:
+    """
+    Contexte minimal pour les unités choisies : code de module hors unités
+    (imports, constantes) et signatures des autres fonctions/classes.
+    """
+    module_level = _module_level(source, units)
+    signatures = [unit.signature for unit in units if unit not in selected]
+
+    parts = []
+    module_text = "\n".join(module_level).strip()
+    if module_text:
+        parts.append(module_text)
+    if signatures:
+        parts.append("\n\n".join(signatures))
+    return "\n\n".join(parts)
+
+
+def splice_units(source: str, replacements: dict, new_imports: list = None) -> str:
+    """
+    Remplace dans source les unités nommées dans replacements {nom: code}.
+    Les imports nouveaux sont insérés après le dernier import de premier niveau.
+    """
+    units = {unit.name: unit for unit in split_units(source)}
+    lines = source.splitlines()
+    for unit in sorted(
+        (units[name] for name in replacements if name in units),
+        key=lambda u: u.start,
+        reverse=True,
+    ):
+        lines[unit.start - 1 : unit.end] = replacements[unit.name].rstrip("\n").splitlines()
+
+    if new_imports:
+        tree = ast.parse("\n".join(lines))
+        import_nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+        if import_nodes:
+            insert_at = import_nodes[-1].end_lineno
+        elif ast.get_docstring(tree) is not None:
+            insert_at = tree.body[0].end_lineno
+        else:
+            insert_at = 0
+        lines[insert_at:insert_at] = new_imports
+
+    return "\n".join(lines) + "\n"
+
+
+def _imported_names(node) -> set:
+    """Noms importés par une instruction, indépendamment de sa mise en forme."""
+    module = getattr(node, "module", None)
+    level = getattr(node, "level", 0)
+    return {(module, level, alias.name, alias.asname) for alias in node.names}
+
+
+def merge_returned_units(source: str, returned_code: str, allowed: list):
+    """
+    Réinjecte dans source les définitions renvoyées par le LLM.
+    Seules les unités de `allowed` sont remplacées ; les imports inédits sont ajoutés
+    (un import déjà présent, même écrit autrement, n'est pas dupliqué).
+    Retourne (nouveau_source, noms_remplacés) ; lève SyntaxError si le code est invalide.
+    """
+    tree = ast.parse(returned_code)
+    returned_lines = returned_code.splitlines()
+    existing = set()
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            existing |= _imported_names(node)
+    replacements = {}
+    new_imports = []
+    for unit in split_units(returned_code):
+        if unit.name in allowed:
+            replacements[unit.name] = unit.source
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if not _imported_names(node) <= existing:
+                new_imports.append("\n".join(returned_lines[node.lineno - 1 : node.end_lineno]))
+
+    merged = splice_units(source, replacements, new_imports)
+    ast.parse(merged)
+    return merged, sorted(replacements)
+
+
+def changed_unit_names(old_source: str, new_source: str) -> set:
+    """
+    Noms des fonctions/classes ajoutées, supprimées ou modifiées entre deux versions.
+    Contient ALL_UNITS si le code de module a changé ou si une version ne parse pas.
+    """
+    try:
+        old_units = split_units(old_source)
+        new_units = split_units(new_source)
+    except SyntaxError:
+        return {ALL_UNITS}
+    old_map = {u.name: u.source for u in old_units}
+    new_map = {u.name: u.source for u in new_units}
+    changed = {
+        name for name in set(old_map) | set(new_map) if old_map.get(name) != new_map.get(name)
+    }
+    if _module_level(old_source, old_units) != _module_level(new_source, new_units):
+        changed.add(ALL_UNITS)
+    return changed
+
+
+# =========================================================
+# Découpage d'un gros module en sections (audit par morceaux)
+# =========================================================
+
+
+def _node_start(node) -> int:
+    return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+
+def chunk_ranges(source: str, token_budget: int, tree: ast.Module = None, measure=None) -> list:
+    """
+    Découpe le module en sections contiguës (première, dernière ligne) d'au plus
+    token_budget tokens. Les coupes se font entre deux instructions de premier
+    niveau, entre deux membres d'une classe trop grosse, et en dernier recours
+    entre deux lignes d'une fonction trop grosse.
+    """
+    if tree is None:
+        tree = ast.parse(source)
+    lines = source.splitlines()
+    measure = measure or (lambda text: max(1, len(text) // 4))
+    prefix = [0]
+    for line in lines:
+        prefix.append(prefix[-1] + measure(line + "\n"))
+
+    def tokens(start: int, end: int) -> int:
+        return prefix[end] - prefix[start - 1]
+
+    cuts = {1}
+    for node in tree.body:
+        cuts.add(_node_start(node))
+        if isinstance(node, ast.ClassDef) and tokens(_node_start(node), node.end_lineno) > token_budget:
+            cuts.update(_node_start(child) for child in node.body)
+    boundaries = sorted(cut for cut in cuts if cut <= len(lines))
+    segments = [
+        (start, (boundaries[i + 1] - 1) if i + 1 < len(boundaries) else len(lines))
+        for i, start in enumerate(boundaries)
+    ]
+
+    chunks = []
+    current = None
+    for start, end in segments:
+        if current and tokens(current[0], end) <= token_budget:
+            current = (current[0], end)
+            continue
+        if current:
+            chunks.append(current)
+        current = (start, end)
+        # Section seule trop grosse : fenêtres de lignes
+        while tokens(*current) > token_budget and current[0] < current[1]:
+            split = current[0]
+            while split < current[1] and tokens(current[0], split + 1) <= token_budget:
+                split += 1
+            chunks.append((current[0], split))
+            current = (split + 1, current[1])
+    if current:
+        chunks.append(current)
+    return chunks
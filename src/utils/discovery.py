@@ -0,0 +1,253 @@
+# src/utils/discovery.py
+import os
+import queue
+import re
+import threading
+
+from src.utils.tool import validate_sandbox_path
+
+# Dossiers jamais parcourus (environnements virtuels, caches, VCS)
+IGNORED_DIRS = {
+    ".git",
+    ".hg",
+    ".venv",
+    "venv",
+    "__pycache__",
+    "site-packages",
+    ".tox",
+    ".nox",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".cache",
+    "node_modules",
+    ".refactor_scratch",  # copies de travail (src/utils/workspace.py)
+}
+# Fichiers de règles lus dans chaque dossier, syntaxe .gitignore
+IGNORE_FILES = (".gitignore", ".refactorignore")
+DEFAULT_WALK_THREADS = 4
+ORDERS = ("discovery", "size", "score")
+
+
+def _pattern_to_regex(pattern: str) -> str:
+    """Traduit un motif gitignore (*, ?, [..], **) en regex sur un chemin relatif."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    Règles d'exclusion façon .gitignore, empilées dossier par dossier.
+    Gère les commentaires, la négation (!), les motifs de dossier (build/)
+    et les motifs ancrés (/docs, src/*.py) relatifs au dossier du fichier de règles.
+    """
+
+    def __init__(self, rules: tuple = ()):
+        self.rules = rules  # (base, regex, negated, dir_only)
+
+    def extend(self, base: str, lines) -> "IgnoreRules":
+        """Nouvel ensemble = règles courantes + celles d'un fichier situé dans base."""
+        added = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            regex = _pattern_to_regex(line)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            added.append((base, re.compile(regex + r"\Z"), negated, dir_only))
+        if not added:
+            return self
+        return IgnoreRules(self.rules + tuple(added))
+
+    def load(self, directory: str, rel_dir: str) -> "IgnoreRules":
+        """Ajoute les fichiers de règles présents dans directory (rel_dir relatif à la racine)."""
+        rules = self
+        for name in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    rules = rules.extend(rel_dir, f.readlines())
+            except (OSError, UnicodeDecodeError):
+                continue
+        return rules
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """La dernière règle qui correspond l'emporte (comme git)."""
+        result = False
+        for base, regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                candidate = rel_path[len(base) + 1 :]
+            else:
+                candidate = rel_path
+            if regex.match(candidate):
+                result = not negated
+        return result
+
+
+def _scan(directory: str, rel_dir: str, rules: IgnoreRules, skip_tests: bool):
+    """Lit un dossier : retourne (fichiers .py, sous-dossiers à parcourir)."""
+    rules = rules.load(directory, rel_dir)
+    files, subdirs = [], []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files, subdirs
+    for entry in entries:
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir:
+            if entry.name in IGNORED_DIRS or rules.ignored(rel_path, True):
+                continue
+            subdirs.append((entry.path, rel_path, rules))
+        elif entry.name.endswith(".py"):
+            if skip_tests and entry.name.endswith("_test.py"):
+                continue
+            if rules.ignored(rel_path, False):
+                continue
+            files.append(entry.path)
+    files.sort()
+    return files, subdirs
+
+
+def iter_python_files(target_dir: str, skip_tests: bool = True, threads: int = DEFAULT_WALK_THREADS):
+    """
+    Générateur des .py du dossier cible, produits au fil du parcours.
+    Les dossiers sont lus en parallèle ; les tests générés (*_test.py),
+    les environnements virtuels/caches et les chemins ignorés sont exclus.
+    La racine n'est validée qu'une fois (tous les chemins sont dessous).
+    """
+    validate_sandbox_path(target_dir)
+    root = os.path.normpath(target_dir)
+    rules = IgnoreRules()
+    if threads <= 1:
+        pending = [(root, "", rules)]
+        while pending:
+            files, subdirs = _scan(*pending.pop(0), skip_tests)
+            yield from files
+            pending.extend(sorted(subdirs))
+        return
+
+    results = queue.Queue()
+    state = {"pending": 0, "stop": False}
+    lock = threading.Lock()
+    work = queue.Queue()
+
+    def submit(item):
+        with lock:
+            state["pending"] += 1
+        work.put(item)
+
+    def walker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            if not state["stop"]:
+                try:
+                    files, subdirs = _scan(*item, skip_tests)
+                except Exception as e:
+                    results.put(e)
+                    files, subdirs = [], []
+                if files:
+                    results.put(files)
+                for subdir in sorted(subdirs):
+                    submit(subdir)
+            with lock:
+                state["pending"] -= 1
+                finished = state["pending"] == 0
+            if finished:
+                results.put(None)
+
+    submit((root, "", rules))
+    pool = [threading.Thread(target=walker, daemon=True) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    try:
+        while True:
+            batch = results.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield from batch
+    finally:
+        # Consommateur arrêté tôt (ou parcours terminé) : on libère les threads
+        state["stop"] = True
+        for _ in pool:
+            work.put(None)
+
+
+def order_files(files, order: str = "discovery", manifest=None) -> list:
+    """
+    Ordonne les fichiers avant traitement :
+    - "size" : les plus petits d'abord (résultats rapides) ;
+    - "score" : les plus mauvais scores pylint de la dernière run d'abord,
+      les fichiers jamais notés en tête ;
+    - "discovery" : ordre du parcours.
+    """
+    files = list(files)
+    if order == "size":
+        sizes = {}
+        for path in files:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        return sorted(files, key=lambda path: sizes[path])
+    if order == "score":
+
+        def last_score(path):
+            entry = manifest.get(path) if manifest else None
+            score = entry.get("score") if entry else None
+            return (score is not None, score or 0.0)
+
+        return sorted(files, key=last_score)
+    if order != "discovery":
+        raise ValueError(f"unknown order: {order}")
+    return files
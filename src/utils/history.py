@@ -0,0 +1,389 @@
+# src/utils/history.py
+"""
+Historique compact et interrogeable des runs, construit à partir du journal JSONL.
+
+Chaque entrée du journal devient une ligne indexée (run, fichier, agent, statut,
+scores) ; les prompts et réponses, souvent identiques d'une run à l'autre, sont
+stockés une seule fois, compressés, et référencés par leur sha256.
+
+    python -m src.utils.history ingest
+    python -m src.utils.history summary --by agent
+    python -m src.utils.history runs
+    python -m src.utils.history file sandbox/project/a.py
+    python -m src.utils.history show <entry id>
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+
+from src.utils.logger import STREAM_FILE, flush_logs
+
+DEFAULT_HISTORY_PATH = os.path.join("logs", "history.sqlite3")
+# Champs de `details` stockés en blobs (gros textes, très répétés)
+BLOB_FIELDS = ("input_prompt", "output_response")
+# Champs de `details` promus en colonnes indexables
+SCORE_FIELDS = ("score_before", "score_after", "improvement")
+GROUP_COLUMNS = ("agent", "model", "action", "status", "run_id", "file")
+INSERT_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    run_id TEXT,
+    timestamp TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT,
+    action TEXT NOT NULL,
+    status TEXT,
+    file TEXT,
+    score_before REAL,
+    score_after REAL,
+    improvement REAL,
+    prompt_hash TEXT REFERENCES blobs(hash),
+    response_hash TEXT REFERENCES blobs(hash),
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_run ON entries(run_id);
+CREATE INDEX IF NOT EXISTS entries_file ON entries(file);
+CREATE INDEX IF NOT EXISTS entries_agent ON entries(agent, status);
+CREATE INDEX IF NOT EXISTS entries_status ON entries(status);
+CREATE INDEX IF NOT EXISTS entries_time ON entries(timestamp);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _blob(text) -> tuple:
+    """(sha256, taille, contenu compressé) d'un texte."""
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    data = text.encode("utf-8")
+    return hashlib.sha256(data).hexdigest(), len(data), zlib.compress(data, 6)
+
+
+def _read_from(path: str, offset: int):
+    """(entrée, offset après la ligne) pour chaque ligne complète du journal à partir d'offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                return  # ligne en cours d'écriture : reprise au prochain ingest
+            offset += len(raw)
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), offset
+            except ValueError:
+                yield None, offset  # ligne tronquée (processus tué) : ignorée
+
+
+class HistoryStore:
+    """Base SQLite de l'historique (une connexion par instance)."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    # =========================================================
+    # Import
+    # =========================================================
+
+    def _row(self, entry: dict, blobs: dict) -> tuple:
+        details = dict(entry.get("details") or {})
+        hashes = []
+        for field in BLOB_FIELDS:
+            if field in details:
+                digest, size, data = _blob(details.pop(field))
+                blobs[digest] = (digest, size, data)
+                hashes.append(digest)
+            else:
+                hashes.append(None)
+        scores = []
+        for field in SCORE_FIELDS:
+            value = details.pop(field, None)
+            scores.append(value if isinstance(value, (int, float)) else None)
+        file_path = entry.get("file") or details.pop("file", None)
+        return (
+            entry["id"],
+            entry.get("run_id"),
+            entry.get("timestamp", ""),
+            entry.get("agent", ""),
+            entry.get("model"),
+            entry.get("action", ""),
+            entry.get("status"),
+            file_path,
+            *scores,
+            *hashes,
+            json.dumps(details, ensure_ascii=False) if details else None,
+        )
+
+    def _insert(self, rows: list, blobs: dict) -> int:
+        self._db.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)", blobs.values())
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        return self._db.total_changes - before
+
+    def ingest(self, entries) -> int:
+        """Ajoute des entrées du journal (déjà présentes : ignorées). Retourne le nombre d'entrées nouvelles."""
+        added = 0
+        rows, blobs = [], {}
+        with self._db:
+            for entry in entries:
+                if not isinstance(entry, dict) or "id" not in entry:
+                    continue
+                rows.append(self._row(entry, blobs))
+                if len(rows) >= INSERT_BATCH:
+                    added += self._insert(rows, blobs)
+                    rows, blobs = [], {}
+            if rows:
+                added += self._insert(rows, blobs)
+        return added
+
+    def _meta(self, key: str, default: str = None) -> str:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def ingest_log(self, path: str = STREAM_FILE) -> int:
+        """
+        Importe la fin du journal JSONL non encore lue (position mémorisée) ;
+        un journal recréé ou plus court est relu depuis le début.
+        """
+        flush_logs()
+        if not os.path.exists(path):
+            return 0
+        key = f"offset:{os.path.abspath(path)}"
+        offset = int(self._meta(key, "0"))
+        if offset > os.path.getsize(path):
+            offset = 0
+        position = {"offset": offset}
+
+        def entries():
+            for entry, next_offset in _read_from(path, offset):
+                position["offset"] = next_offset
+                if entry is not None:
+                    yield entry
+
+        added = self.ingest(entries())
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(position["offset"])))
+        return added
+
+    # =========================================================
+    # Requêtes (agrégats calculés par SQLite, rien n'est chargé en mémoire)
+    # =========================================================
+
+    @staticmethod
+    def _filters(run_id: str = None, agent: str = None, status: str = None, file: str = None, since: str = None):
+        clauses, params = [], []
+        for column, value in (("run_id", run_id), ("agent", agent), ("status", status), ("file", file)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(self, by: str = "agent", **filters) -> list:
+        """Par valeur de `by` : entrées, succès, taux de succès, amélioration et score final moyens."""
+        if by not in GROUP_COLUMNS:
+            raise ValueError(f"by must be one of {GROUP_COLUMNS}")
+        where, params = self._filters(**filters)
+        rows = self._db.execute(
+            f"""
+            SELECT {by} AS key,
+                   COUNT(*) AS entries,
+                   SUM(status = 'SUCCESS') AS successes,
+                   AVG(improvement) AS avg_improvement,
+                   AVG(score_after) AS avg_score_after
+            FROM entries{where}
+            GROUP BY {by}
+            ORDER BY entries DESC
+            """,
+            params,
+        ).fetchall()
+        return [dict(row, success_rate=row["successes"] / row["entries"]) for row in rows]
+
+    def runs(self, limit: int = 20) -> list:
+        rows = self._db.execute(
+            """
+            SELECT run_id,
+                   MIN(timestamp) AS started,
+                   MAX(timestamp) AS finished,
+                   COUNT(*) AS entries,
+                   COUNT(DISTINCT file) AS files,
+                   AVG(improvement) AS avg_improvement,
+                   SUM(agent = 'QualityChecker' AND status = 'SUCCESS') AS files_ok
+            FROM entries
+            GROUP BY run_id
+            ORDER BY started DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def file_history(self, file_path: str) -> list:
+        """Bilan (QualityChecker) de chaque run qui a traité ce fichier, du plus récent au plus ancien."""
+        rows = self._db.execute(
+            """
+            SELECT run_id, timestamp, status, score_before, score_after, improvement
+            FROM entries
+            WHERE file = ? AND agent = 'QualityChecker'
+            ORDER BY timestamp DESC
+            """,
+            (file_path,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def text(self, digest: str):
+        row = self._db.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        return zlib.decompress(row["data"]).decode("utf-8") if row else None
+
+    def entry(self, entry_id: str):
+        """Entrée complète, au format du journal (prompts et réponses reconstitués), ou None."""
+        row = self._db.execute("SELECT * FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        details = json.loads(row["extra"]) if row["extra"] else {}
+        for field in SCORE_FIELDS:
+            if row[field] is not None:
+                details[field] = row[field]
+        for field, digest in zip(BLOB_FIELDS, (row["prompt_hash"], row["response_hash"])):
+            if digest is not None:
+                details[field] = self.text(digest)
+        entry = {key: row[key] for key in ("id", "run_id", "timestamp", "agent", "model", "action")}
+        entry.update({"details": details, "status": row["status"]})
+        if row["file"]:
+            entry["file"] = row["file"]
+        return entry
+
+    def stats(self) -> dict:
+        entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        blobs, raw, stored = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+        ).fetchone()
+        # Taille qu'auraient les textes sans déduplication (une copie par entrée)
+        referenced = 0
+        for column in ("prompt_hash", "response_hash"):
+            referenced += self._db.execute(
+                f"SELECT COALESCE(SUM(b.size), 0) FROM entries e JOIN blobs b ON b.hash = e.{column}"
+            ).fetchone()[0]
+        return {
+            "entries": entries,
+            "blobs": blobs,
+            "referenced_bytes": referenced,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+        }
+
+
+def ingest_run_log(path: str = DEFAULT_HISTORY_PATH) -> int:
+    """Importe dans l'historique ce que la run vient d'ajouter au journal."""
+    store = HistoryStore(path)
+    try:
+        return store.ingest_log()
+    finally:
+        store.close()
+
+
+# =========================================================
+# CLI
+# =========================================================
+
+
+def _number(value, digits: int = 2) -> str:
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the run history")
+    parser.add_argument("--db", type=str, default=DEFAULT_HISTORY_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Import the new entries of the JSONL log")
+    ingest_parser.add_argument("--log", type=str, default=STREAM_FILE)
+
+    summary_parser = commands.add_parser("summary", help="Aggregates grouped by a column")
+    summary_parser.add_argument("--by", choices=GROUP_COLUMNS, default="agent")
+    for name in ("run-id", "agent", "status", "file", "since"):
+        summary_parser.add_argument(f"--{name}", type=str, default=None)
+
+    runs_parser = commands.add_parser("runs", help="Latest runs")
+    runs_parser.add_argument("--limit", type=int, default=20)
+
+    file_parser = commands.add_parser("file", help="Result of every run for one file")
+    file_parser.add_argument("path", type=str)
+
+    show_parser = commands.add_parser("show", help="One entry with its prompt and response")
+    show_parser.add_argument("entry_id", type=str)
+
+    commands.add_parser("stats", help="Store size and deduplication")
+
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+    try:
+        if args.command == "ingest":
+            print(f"🗄️  {store.ingest_log(args.log)} new entries imported into {args.db}")
+        elif args.command == "summary":
+            filters = {"run_id": args.run_id, "agent": args.agent, "status": args.status, "file": args.file, "since": args.since}
+            print(f"   {args.by:<40} {'entries':>8} {'success':>8} {'avg impr.':>10} {'avg score':>10}")
+            for row in store.summary(args.by, **filters):
+                print(
+                    f"   {str(row['key']):<40} {row['entries']:>8} {row['success_rate']:>8.0%} "
+                    f"{_number(row['avg_improvement']):>10} {_number(row['avg_score_after']):>10}"
+                )
+        elif args.command == "runs":
+            for row in store.runs(args.limit):
+                print(
+                    f"   {row['run_id']}  {row['started'][:19]}  {row['entries']:>6} entries  "
+                    f"{row['files']:>5} files  {row['files_ok']:>5} ok  avg impr. {_number(row['avg_improvement'])}"
+                )
+        elif args.command == "file":
+            for row in store.file_history(args.path):
+                print(
+                    f"   {row['timestamp'][:19]}  {row['status']:<8} "
+                    f"{_number(row['score_before'])} → {_number(row['score_after'])}  ({row['run_id']})"
+                )
+        elif args.command == "show":
+            entry = store.entry(args.entry_id)
+            if entry is None:
+                raise SystemExit(f"❌ Unknown entry: {args.entry_id}")
+            print(json.dumps(entry, indent=4, ensure_ascii=False))
+        else:
+            stats = store.stats()
+            referenced = stats["referenced_bytes"]
+            saved = 1 - stats["stored_bytes"] / referenced if referenced else 0.0
+            print(
+                f"🗄️  {stats['entries']} entries, {referenced / 1e6:.1f} MB of prompts/responses "
+                f"({stats['blobs']} distinct texts, {stats['raw_bytes'] / 1e6:.1f} MB) "
+                f"stored in {stats['stored_bytes'] / 1e6:.1f} MB ({saved:.0%} saved)"
+            )
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# src/utils/job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# File d'attente persistante du mode service (survit à un redémarrage du démon)
+DEFAULT_QUEUE_PATH = os.path.join("logs", "jobs.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    total INTEGER,
+    done INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    file TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_job ON results(job_id, seq);
+"""
+
+# États d'un job : queued -> running -> done | failed (running -> queued au redémarrage)
+FINAL_STATUSES = ("done", "failed")
+
+
+class JobQueue:
+    """
+    Jobs de refactoring (dossier ou liste de fichiers) et résultats fichier par
+    fichier, dans une base SQLite. Une seule connexion, protégée par un verrou :
+    le serveur HTTP et le thread qui exécute les jobs la partagent.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def submit(self, spec: dict) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (status, spec, submitted) VALUES ('queued', ?, ?)",
+                (json.dumps(spec), time.time()),
+            )
+            return cursor.lastrowid
+
+    def recover(self) -> int:
+        """Remet en file les jobs interrompus (démon arrêté en cours de job). Retourne leur nombre."""
+        with self._lock:
+            return self._db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def claim(self):
+        """Prend le plus ancien job en attente : (id, spec), ou None si la file est vide."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, spec FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started = COALESCE(started, ?) WHERE id = ?",
+                        (time.time(), row["id"]),
+                    )
+            finally:
+                self._db.execute("COMMIT")
+        if row is None:
+            return None
+        return row["id"], json.loads(row["spec"])
+
+    def set_total(self, job_id: int, total: int) -> None:
+        self._execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def done_files(self, job_id: int) -> set:
+        """Fichiers déjà traités par ce job (reprise après redémarrage)."""
+        return {row["file"] for row in self._execute("SELECT file FROM results WHERE job_id = ?", (job_id,))}
+
+    def record(self, job_id: int, result: dict) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT INTO results (job_id, file, status, result, finished) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, result["file"], result["status"], json.dumps(result), time.time()),
+                )
+                self._db.execute("UPDATE jobs SET done = done + 1 WHERE id = ?", (job_id,))
+            finally:
+                self._db.execute("COMMIT")
+
+    def finish(self, job_id: int, summary: dict = None, error: str = None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, finished = ?, summary = ?, error = ? WHERE id = ?",
+            ("failed" if error else "done", time.time(), json.dumps(summary or {}), error, job_id),
+        )
+
+    @staticmethod
+    def _job(row) -> dict:
+        job = dict(row)
+        job["spec"] = json.loads(job["spec"])
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        return job
+
+    def get(self, job_id: int, after: int = 0):
+        """Job et ses résultats de numéro > after (suivi de la progression), ou None."""
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = self._job(rows[0])
+        job["results"] = [
+            {"seq": row["seq"], **json.loads(row["result"])}
+            for row in self._execute(
+                "SELECT seq, result FROM results WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            )
+        ]
+        return job
+
+    def list(self, limit: int = 50) -> list:
+        rows = self._execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [self._job(row) for row in rows]
+
+    def counts(self) -> dict:
+        return {row["status"]: row["n"] for row in self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,192 @@
+# src/utils/leases.py
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+# Durée d'un bail : un worker qui ne le renouvelle pas à temps est considéré comme mort
+DEFAULT_LEASE_SECONDS = 60.0
+# Au-delà, un fichier dont les baux expirent toujours (il fait planter les workers) est abandonné
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Task:
+    file: str
+    state: str = "pending"  # pending -> leased -> done
+    token: str = None
+    worker: str = None
+    deadline: float = 0.0
+    attempts: int = 0
+    result: dict = None
+
+
+class LeaseTable:
+    """
+    Fichiers d'une run distribuée, prêtés aux workers avec un bail.
+    Un worker renouvelle ses baux tant qu'il travaille ; un bail expiré remet
+    le fichier en attente pour un autre worker. Le résultat d'un bail expiré
+    puis repris par un autre worker est refusé (jeton périmé).
+    """
+
+    def __init__(self, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._tasks = {}  # fichier -> Task, dans l'ordre d'ajout
+        self._by_token = {}
+        self._workers = {}  # worker -> dernier contact
+        self.requeued = 0
+        self._changed = threading.Condition()
+
+    def add(self, file_path: str) -> None:
+        with self._changed:
+            if file_path not in self._tasks:
+                self._tasks[file_path] = Task(file=file_path)
+                self._changed.notify_all()
+
+    def _finish(self, task: Task, result: dict) -> None:
+        self._by_token.pop(task.token, None)
+        task.state, task.token, task.result = "done", None, result
+        self._changed.notify_all()
+
+    def _expire(self, now: float) -> None:
+        """Remet en attente les fichiers dont le bail a expiré (appelée sous le verrou)."""
+        for task in self._tasks.values():
+            if task.state != "leased" or task.deadline > now:
+                continue
+            if task.attempts >= self.max_attempts:
+                print(f"⏰ Lease of {task.file} expired {task.attempts} times, giving up")
+                self._finish(
+                    task,
+                    {"file": task.file, "status": "ERROR", "error": f"lease expired {task.attempts} times"},
+                )
+            else:
+                print(f"⏰ Lease of {task.file} expired (worker {task.worker}), queued again")
+                self._by_token.pop(task.token, None)
+                task.state, task.token, task.worker = "pending", None, None
+                self.requeued += 1
+
+    def acquire(self, worker: str, count: int = 1) -> list:
+        """Prête jusqu'à `count` fichiers en attente à ce worker : [(fichier, jeton)]."""
+        now = time.monotonic()
+        leased = []
+        with self._changed:
+            self._workers[worker] = now
+            self._expire(now)
+            for task in self._tasks.values():
+                if len(leased) >= count:
+                    break
+                if task.state != "pending":
+                    continue
+                task.state, task.worker = "leased", worker
+                task.token = uuid.uuid4().hex
+                task.deadline = now + self.lease_seconds
+                task.attempts += 1
+                self._by_token[task.token] = task
+                leased.append((task.file, task.token))
+        return leased
+
+    def renew(self, worker: str, tokens: list) -> list:
+        """Prolonge les baux encore valides de ce worker ; retourne leurs jetons."""
+        now = time.monotonic()
+        valid = []
+        with self._changed:
+            self._workers[worker] = now
+            self._expire(now)
+            for token in tokens:
+                task = self._by_token.get(token)
+                if task is not None and task.worker == worker:
+                    task.deadline = now + self.lease_seconds
+                    valid.append(token)
+        return valid
+
+    def complete(self, token: str, result: dict) -> bool:
+        """Enregistre le résultat d'un bail. False si le jeton est périmé (fichier repris ailleurs)."""
+        with self._changed:
+            task = self._by_token.get(token)
+            if task is None:
+                return False
+            self._workers[task.worker] = time.monotonic()
+            self._finish(task, result)
+            return True
+
+    def release(self, worker: str) -> int:
+        """Arrêt propre d'un worker : ses fichiers repartent tout de suite en attente."""
+        with self._changed:
+            released = 0
+            for task in self._tasks.values():
+                if task.state == "leased" and task.worker == worker:
+                    self._by_token.pop(task.token, None)
+                    task.state, task.token, task.worker = "pending", None, None
+                    task.attempts -= 1  # pas un échec du fichier
+                    released += 1
+            self._workers.pop(worker, None)
+            self._changed.notify_all()
+            return released
+
+    def wait_all(self, poll: float = 1.0) -> list:
+        """
+        Attend que tous les fichiers aient un résultat ; les baux expirés sont
+        repris même si aucun worker ne se manifeste. Retourne les résultats
+        dans l'ordre d'ajout.
+        """
+        with self._changed:
+            while not self.finished():
+                self._expire(time.monotonic())
+                self._changed.wait(poll)
+            return [task.result for task in self._tasks.values()]
+
+    def finished(self) -> bool:
+        return all(task.state == "done" for task in self._tasks.values())
+
+    def counts(self) -> dict:
+        with self._changed:
+            counts = {"pending": 0, "leased": 0, "done": 0}
+            for task in self._tasks.values():
+                counts[task.state] += 1
+            return counts
+
+    def workers(self, now: float = None) -> dict:
+        """Workers connus -> (secondes depuis le dernier contact, fichiers en cours)."""
+        now = now or time.monotonic()
+        with self._changed:
+            busy = {}
+            for task in self._tasks.values():
+                if task.state == "leased":
+                    busy[task.worker] = busy.get(task.worker, 0) + 1
+            return {worker: (now - seen, busy.get(worker, 0)) for worker, seen in self._workers.items()}
+
+
+class Allowances:
+    """
+    Quotas d'une run distribuée partagés entre les workers actifs : chacun reçoit
+    rpm/N et tpm/N, et un plafond de tokens égal à ce qu'il a déjà consommé plus
+    sa part de ce qui reste du budget de la run (token_budget=None : pas de plafond).
+    Les workers déclarent leur consommation à chaque demande de bail et renouvellement.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, token_budget: int = None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.token_budget = token_budget
+        self._spent = {}  # worker -> tokens consommés (y compris par un worker disparu)
+        self._lock = threading.Lock()
+
+    def report(self, worker: str, spent: int) -> None:
+        with self._lock:
+            self._spent[worker] = max(self._spent.get(worker, 0), int(spent or 0))
+
+    def grant(self, worker: str, spent: int, active: int) -> dict:
+        """Part de ce worker quand `active` workers se partagent la run."""
+        self.report(worker, spent)
+        active = max(1, active)
+        with self._lock:
+            allowance = {"rpm": max(1, self.rpm // active), "tpm": max(1, self.tpm // active)}
+            if self.token_budget is not None:
+                remaining = max(0, self.token_budget - sum(self._spent.values()))
+                allowance["token_limit"] = self._spent[worker] + remaining // active
+            return allowance
+
+    def spent(self) -> int:
+        with self._lock:
+            return sum(self._spent.values())
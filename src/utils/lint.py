@@ -0,0 +1,274 @@
+# src/utils/lint.py
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from src.utils.source_cache import get_sources
+
+# Options passées à pylint pour chaque analyse (pas de stats persistées sur disque)
+PYLINT_OPTIONS = ["--persistent=n"]
+# Résultats mémorisés par (fichier, sha256 du contenu)
+MEMO_SIZE = 4096
+# Délai maximal d'une analyse dans un worker (secondes)
+LINT_TIMEOUT = 120
+WARM_UP_SOURCE = '"""Warm-up."""\n'
+
+
+@dataclass
+class LintResult:
+    score: float
+    messages: list = field(default_factory=list)
+    error: str = None
+
+    def message_ids(self) -> set:
+        return {m["msg_id"] for m in self.messages}
+
+
+# =========================================================
+# Côté worker : processus qui garde un linter pylint configuré
+# =========================================================
+
+
+class _WarmLinter:
+    """
+    PyLinter construit une seule fois (options, checkers, plugins) puis réutilisé
+    pour chaque fichier ; seul le module analysé est retiré du cache astroid.
+    """
+
+    def __init__(self, options: list):
+        import astroid
+        from pylint.lint import Run
+        from pylint.reporters import CollectingReporter
+
+        self._reporter_class = CollectingReporter
+        self._manager = astroid.MANAGER
+        with tempfile.TemporaryDirectory(prefix="lint_") as tmp_dir:
+            path = os.path.join(tmp_dir, "warm_up.py")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(WARM_UP_SOURCE)
+            self.linter = Run([*options, path], reporter=CollectingReporter(), exit=False).linter
+            self._forget(path)
+
+    def _forget(self, path: str) -> None:
+        """Retire du cache astroid les modules issus de ce fichier (il a pu changer)."""
+        target = os.path.abspath(path)
+        cache = self._manager.astroid_cache
+        for name, module in list(cache.items()):
+            module_file = getattr(module, "file", None)
+            if module_file and os.path.abspath(module_file) == target:
+                cache.pop(name, None)
+
+    def lint(self, path: str) -> dict:
+        reporter = self._reporter_class()
+        self.linter.set_reporter(reporter)
+        self._forget(path)
+        try:
+            self.linter.check([path])
+            self.linter.generate_reports(verbose=False)
+        except Exception as e:  # pylint peut lever sur des fichiers très cassés
+            return {"score": 0.0, "messages": [], "error": str(e)}
+        finally:
+            self._forget(path)
+        messages = [
+            {
+                "msg_id": m.msg_id,
+                "symbol": m.symbol,
+                "category": m.category,
+                "line": m.line,
+                "column": m.column,
+                "obj": m.obj,
+                "message": m.msg,
+            }
+            for m in reporter.messages
+        ]
+        score = getattr(self.linter.stats, "global_note", 0.0) or 0.0
+        return {"score": max(0.0, float(score)), "messages": messages, "error": None}
+
+
+def _worker_main(options: list) -> None:
+    """Boucle du worker : {"path": ...} par ligne sur stdin, un LintResult JSON par ligne."""
+    # Le protocole garde le vrai stdout ; ce que pylint écrit sur fd 1 part sur stderr
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+
+    linter = _WarmLinter(options)
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            result = linter.lint(json.loads(line)["path"])
+        except Exception as e:
+            result = {"score": 0.0, "messages": [], "error": f"Worker error: {e}"}
+        protocol.write(json.dumps(result) + "\n")
+
+
+# =========================================================
+# Côté parent : pool de workers pylint et mémo des résultats
+# =========================================================
+
+
+class PylintEngine:
+    """
+    Pool de processus pylint déjà chauds (un par place CPU) : chaque worker
+    garde son linter configuré et analyse un fichier à la fois, les workers
+    travaillent en parallèle. Un worker qui plante ou dépasse le délai est
+    remplacé. Un fichier dont le contenu n'a pas changé n'est pas réanalysé.
+    """
+
+    def __init__(self, size: int = 2, options: list = None, timeout: float = LINT_TIMEOUT):
+        self.size = size
+        self.options = list(PYLINT_OPTIONS if options is None else options)
+        self.timeout = timeout
+        self._idle = []
+        self._started = 0
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+
+    def _new_worker(self):
+        from src.utils.test_runner import _Worker
+
+        return _Worker(module="src.utils.lint", args=[json.dumps(self.options)])
+
+    def start(self) -> None:
+        """Pré-démarre tous les workers (pylint chargé et configuré dans chacun)."""
+        workers = [self._new_worker() for _ in range(self.size - self._started)]
+        with self._cond:
+            self._idle.extend(workers)
+            self._started += len(workers)
+            self._cond.notify_all()
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._started >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return self._new_worker()
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker, healthy: bool) -> None:
+        with self._cond:
+            if healthy and worker.alive():
+                self._idle.append(worker)
+            else:
+                self._started -= 1
+            self._cond.notify()
+        if not healthy:
+            worker.kill()
+
+    def lint_file(self, file_path: str, slot=None) -> LintResult:
+        """
+        Analyse un fichier et retourne le score /10 et les messages structurés.
+        slot : fabrique de context manager (scheduler.cpu_slot) tenue seulement
+        pendant une vraie analyse, pas pour un résultat déjà mémorisé.
+        """
+        digest = get_sources().hash_of(file_path)
+        key = (os.path.abspath(file_path), digest)
+        if digest is not None:
+            with self._lock:
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    return self._memo[key]
+
+        with slot() if slot is not None else nullcontext():
+            result = self._lint(file_path)
+        if digest is not None and result.error is None:
+            with self._lock:
+                self._memo[key] = result
+                while len(self._memo) > MEMO_SIZE:
+                    self._memo.popitem(last=False)
+        return result
+
+    def _lint(self, file_path: str) -> LintResult:
+        from src.utils.test_runner import TestWorkerError
+
+        try:
+            worker = self._acquire()
+        except Exception as e:
+            return LintResult(score=0.0, error=f"Could not start pylint worker: {e}")
+        try:
+            answer = worker.run({"path": os.path.abspath(file_path)}, self.timeout)
+        except TestWorkerError as e:
+            self._release(worker, healthy=False)
+            return LintResult(score=0.0, error=str(e))
+        self._release(worker, healthy=True)
+        return LintResult(score=answer["score"], messages=answer["messages"], error=answer["error"])
+
+    def lint_source(self, source: str, module_name: str = "module") -> LintResult:
+        """Analyse du code en mémoire (écrit dans un dossier temporaire le temps du lint)."""
+        with tempfile.TemporaryDirectory(prefix="lint_") as tmp_dir:
+            path = os.path.join(tmp_dir, f"{module_name}.py")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(source)
+            return self._lint(path)
+
+    def clear(self) -> None:
+        """Oublie les résultats mémorisés (fin d'un job du service)."""
+        with self._lock:
+            self._memo.clear()
+
+    def close(self) -> None:
+        with self._cond:
+            workers, self._idle = self._idle, []
+            self._started -= len(workers)
+        for worker in workers:
+            try:
+                worker.process.stdin.close()
+            except OSError:
+                pass
+            worker.kill()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> PylintEngine:
+    """Moteur pylint partagé (workers lancés à la demande)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PylintEngine()
+        return _engine
+
+
+def configure_engine(size: int) -> PylintEngine:
+    """Remplace le moteur partagé par un pool de `size` workers, pré-démarrés."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+        _engine = PylintEngine(size=size)
+    _engine.start()
+    return _engine
+
+
+def close_engine() -> None:
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+
+
+def lint_file(file_path: str, slot=None) -> LintResult:
+    return get_engine().lint_file(file_path, slot)
+
+
+def lint_source(source: str, module_name: str = "module") -> LintResult:
+    return get_engine().lint_source(source, module_name)
+
+
+if __name__ == "__main__":
+    _worker_main(json.loads(sys.argv[1]) if len(sys.argv) > 1 else PYLINT_OPTIONS)
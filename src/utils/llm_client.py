@@ -0,0 +1,606 @@
+# src/utils/llm_client.py
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from src.utils import metrics
+from src.utils.cache import get_cache
+from src.utils.model_router import cost, current_model, current_route
+from src.utils.scheduler import llm_slot
+
+# Pointable vers un serveur local (stub) via GEMINI_BASE_URL
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+# Le modèle de chaque appel est choisi par src/utils/model_router.py
+
+# Codes HTTP pour lesquels on réessaie (quota dépassé, erreurs serveur)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # secondes
+BACKOFF_MAX = 60.0
+REQUEST_TIMEOUT = 120
+
+# Quotas côté client (par minute), surchargeables par la CLI ou l'environnement
+# (GEMINI_RPM / GEMINI_TPM, lus à la création du client : le .env est chargé après l'import)
+DEFAULT_RPM = 60
+DEFAULT_TPM = 1_000_000
+
+
+def rate_limits(requests_per_minute: int = None, tokens_per_minute: int = None) -> tuple:
+    """(rpm, tpm) : valeurs données, sinon GEMINI_RPM / GEMINI_TPM, sinon les défauts."""
+    rpm = requests_per_minute or int(os.getenv("GEMINI_RPM") or DEFAULT_RPM)
+    tpm = tokens_per_minute or int(os.getenv("GEMINI_TPM") or DEFAULT_TPM)
+    return rpm, tpm
+
+
+class LLMError(Exception):
+    """Appel Gemini définitivement en échec (après les retries)."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BudgetExceeded(LLMError):
+    """Le budget de tokens de la run ne permet plus cet appel (rien n'a été envoyé)."""
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    cache_hit: bool = False
+    attempts: int = 0
+    model: str = None
+    prompt_tokens: int = 0  # usage réel (usageMetadata), sinon estimé
+    response_tokens: int = 0
+
+
+class LLMStream:
+    """
+    Réponse en streaming : itérer donne les morceaux de texte au fil de l'eau.
+    close() interrompt la génération (connexion fermée, rien n'est mis en cache).
+    """
+
+    def __init__(self, chunks, cache_hit: bool = False, model: str = None):
+        self._chunks = chunks
+        self.cache_hit = cache_hit
+        self.model = model
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+
+
+def _usage_counters(data: dict) -> dict:
+    """Tokens réellement consommés d'après usageMetadata (absent = 0)."""
+    usage = data.get("usageMetadata") or {}
+    return {
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "response_tokens": usage.get("candidatesTokenCount", 0),
+    }
+
+
+def sse_texts(line: str, counters: dict) -> list:
+    """Morceaux de texte d'une ligne SSE ("data: {...}") ; met à jour l'usage dans counters."""
+    line = line.strip()
+    if not line.startswith("data:"):
+        return []
+    try:
+        event = json.loads(line[len("data:"):].strip())
+    except ValueError:
+        return []
+    counters.update(_usage_counters(event))
+    texts = []
+    for candidate in event.get("candidates", [])[:1]:
+        for part in candidate.get("content", {}).get("parts", []):
+            if part.get("text"):
+                texts.append(part["text"])
+    return texts
+
+
+def config_key(generation_config: dict = None) -> tuple:
+    """Paramètres de génération à inclure dans la clé de cache (rien par défaut)."""
+    return (json.dumps(generation_config, sort_keys=True),) if generation_config else ()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière (~4 caractères par token)."""
+    return max(1, len(text) // 4)
+
+
+# =========================================================
+# RateLimiter : seaux à jetons requêtes/minute + tokens/minute
+# =========================================================
+
+
+class RateLimiter:
+    """Bloque l'appelant jusqu'à ce que le quota par minute le permette."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def try_acquire(self, tokens: int) -> float:
+        """Consomme le quota si possible et retourne 0, sinon le délai à attendre (s)."""
+        # Un prompt plus gros que le quota entier passe quand le seau est plein
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            wait_requests = (1 - self._requests) * 60.0 / self.rpm
+            wait_tokens = (tokens - self._tokens) * 60.0 / self.tpm
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def acquire(self, tokens: int) -> None:
+        """Consomme une requête et `tokens` tokens, en attendant si nécessaire."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def adjust(self, extra_tokens: int) -> None:
+        """Corrige le seau une fois la consommation réelle connue (peut être négatif)."""
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens - extra_tokens)
+
+    def resize(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        """Change le quota en cours de run (part attribuée par le coordinateur en mode distribué)."""
+        with self._lock:
+            self._refill()
+            self.rpm = requests_per_minute
+            self.tpm = tokens_per_minute
+            self._requests = min(self._requests, float(requests_per_minute))
+            self._tokens = min(self._tokens, float(tokens_per_minute))
+
+
+# =========================================================
+# TokenBudget : plafond de tokens par run, consommation par modèle
+# =========================================================
+
+
+class TokenBudget:
+    """
+    Tokens consommés pendant la run, par modèle. Avant chaque appel, le prompt
+    estimé est réservé : l'appel est refusé (BudgetExceeded) si la consommation
+    réelle plus les réservations en cours dépasserait la limite. Après l'appel,
+    la réservation est remplacée par l'usage réel (usageMetadata).
+    limit=None : pas de plafond, seulement la comptabilité.
+    """
+
+    def __init__(self, limit: int = None):
+        self.limit = limit
+        self.used = 0
+        self.reserved = 0
+        self.by_model = {}  # modèle -> {"calls", "estimated", "prompt_tokens", "response_tokens"}
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated: int) -> None:
+        with self._lock:
+            if self.limit is not None and self.used + self.reserved + estimated > self.limit:
+                raise BudgetExceeded(
+                    f"Token budget exhausted ({self.used}/{self.limit} used, {estimated} needed)"
+                )
+            self.reserved += estimated
+
+    def settle(self, model: str, estimated: int, prompt_tokens: int = 0, response_tokens: int = 0) -> None:
+        """Libère la réservation et compte l'usage réel (0 si l'appel a échoué)."""
+        with self._lock:
+            self.reserved -= estimated
+            if not prompt_tokens and not response_tokens:
+                return
+            self.used += prompt_tokens + response_tokens
+            usage = self.by_model.setdefault(
+                model, {"calls": 0, "estimated": 0, "prompt_tokens": 0, "response_tokens": 0}
+            )
+            usage["calls"] += 1
+            usage["estimated"] += estimated
+            usage["prompt_tokens"] += prompt_tokens
+            usage["response_tokens"] += response_tokens
+        route = current_route()
+        if route is not None:
+            route.add_usage(prompt_tokens, response_tokens)
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.limit is not None and self.used + self.reserved >= self.limit
+
+    def set_limit(self, limit: int = None) -> None:
+        """Change le plafond (allocation du coordinateur en mode distribué)."""
+        with self._lock:
+            self.limit = limit
+
+    def spent(self) -> int:
+        """Tokens consommés ou réservés par les appels en cours."""
+        with self._lock:
+            return self.used + self.reserved
+
+    def cost(self):
+        """Coût estimé de la run en USD (modèles au prix connu seulement)."""
+        with self._lock:
+            costs = [cost(m, u["prompt_tokens"], u["response_tokens"]) for m, u in self.by_model.items()]
+        return sum(c for c in costs if c is not None)
+
+    def print_summary(self) -> None:
+        with self._lock:
+            by_model = {model: dict(usage) for model, usage in self.by_model.items()}
+        if not by_model:
+            return
+        limit = f" of {self.limit}" if self.limit is not None else ""
+        print(f"\n💰 Tokens: {self.used}{limit} used, estimated cost ${self.cost():.4f}")
+        print(f"   {'model':<24} {'calls':>6} {'estimated':>10} {'prompt':>9} {'response':>9} {'cost $':>9}")
+        for model, usage in sorted(by_model.items()):
+            model_cost = cost(model, usage["prompt_tokens"], usage["response_tokens"])
+            print(
+                f"   {model:<24} {usage['calls']:>6} {usage['estimated']:>10} {usage['prompt_tokens']:>9} "
+                f"{usage['response_tokens']:>9} {model_cost if model_cost is not None else float('nan'):>9.4f}"
+            )
+
+
+def usage_of(counters: dict, estimated: int, text: str) -> tuple:
+    """(tokens prompt, tokens réponse) : usageMetadata, sinon estimation."""
+    prompt_tokens = counters.get("prompt_tokens") or estimated
+    response_tokens = counters.get("response_tokens") or (estimate_tokens(text) if text else 0)
+    return prompt_tokens, response_tokens
+
+
+# =========================================================
+# GeminiClient
+# =========================================================
+
+
+def _import_requests():
+    """requests n'est importé qu'au premier appel réseau (une run servie par le cache démarre plus vite)."""
+    import requests
+
+    return requests
+
+
+def _transient_errors(requests) -> tuple:
+    """Erreurs réseau réessayées : connexion, délai, corps de réponse coupé ou illisible."""
+    errors = requests.exceptions
+    return (errors.ConnectionError, errors.Timeout, errors.ChunkedEncodingError, errors.ContentDecodingError)
+
+
+class GeminiClient:
+    """
+    Client HTTP unique pour les agents : session poolée (keep-alive),
+    retries avec backoff exponentiel + jitter sur 429/5xx, limiteur RPM/TPM
+    et cache des réponses.
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        model: str = None,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+        token_budget: int = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        timeout: float = REQUEST_TIMEOUT,
+        pool_size: int = 16,
+    ):
+        self.base_url = (base_url or os.getenv("GEMINI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.limiter = RateLimiter(*rate_limits(requests_per_minute, tokens_per_minute))
+        self.budget = TokenBudget(token_budget)
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Session HTTP créée au premier appel (requests n'est pas importé au démarrage)."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    requests = _import_requests()
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def url(self, model: str = None, method: str = "generateContent") -> str:
+        return f"{self.base_url}/models/{model or self.model_for()}:{method}"
+
+    def model_for(self) -> str:
+        """Modèle imposé au client, sinon celui que le routeur attribue au fichier en cours."""
+        return self.model or current_model()
+
+    @staticmethod
+    def _body(prompt: str, generation_config: dict = None) -> bytes:
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return json.dumps(payload).encode("utf-8")
+
+    @staticmethod
+    def _headers(api_key: str) -> dict:
+        return {"x-goog-api-key": api_key, "Content-Type": "application/json"}
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        """Délai avant la tentative suivante (Retry-After prioritaire, sinon full jitter)."""
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    # Traitements indépendants du transport, partagés avec AsyncGeminiClient (async_llm.py)
+
+    def _cache_lookup(self, model: str, prompt: str, cache_content: str, generation_config: dict) -> tuple:
+        """(clé de cache, texte en cache ou None) ; pas de clé sans cache_content."""
+        if cache_content is None:
+            return None, None
+        cache = get_cache()
+        cache_key = cache.make_key(self.url(model), prompt, cache_content, *config_key(generation_config))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            metrics.record("llm.cache_hit", 0.0)
+        return cache_key, cached
+
+    def _completion(
+        self,
+        status: int,
+        raw: bytes,
+        counters: dict,
+        start: float,
+        model: str,
+        estimated: int,
+        cache_key: str,
+        attempt: int,
+    ) -> LLMResponse:
+        """
+        Traite une réponse generateContent reçue (métriques, quota TPM, cache).
+        Lève LLMError(status_code=status) si elle n'est pas exploitable :
+        l'appelant réessaie si status est dans RETRY_STATUSES.
+        """
+        counters["bytes_received"] = len(raw)
+        text_body = raw.decode("utf-8", errors="replace")
+        data = {}
+        if status == 200:
+            try:
+                data = json.loads(text_body)
+            except ValueError:
+                pass
+            counters.update(_usage_counters(data))
+        metrics.record("llm.generate", time.perf_counter() - start, ok=bool(data), **counters)
+
+        if status != 200:
+            raise LLMError(text_body, status_code=status)
+        try:
+            text = data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError) as e:
+            raise LLMError(f"Unexpected Gemini response: {text_body[:500]}") from e
+        usage = data.get("usageMetadata", {}).get("totalTokenCount")
+        if usage:
+            self.limiter.adjust(usage - estimated)
+        if cache_key is not None:
+            get_cache().put(cache_key, text, model=model)
+        prompt_tokens, response_tokens = usage_of(counters, estimated, text)
+        return LLMResponse(
+            text=text,
+            attempts=attempt + 1,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+        )
+
+    def _end_stream(
+        self, parts: list, counters: dict, start: float, model: str, estimated: int, complete: bool
+    ) -> None:
+        """Métriques et règlement du budget en fin de flux (complet ou interrompu)."""
+        metrics.record("llm.stream", time.perf_counter() - start, ok=complete, **counters)
+        # Flux interrompu : usageMetadata (en fin de flux) manque, la partie reçue est estimée
+        self.budget.settle(model, estimated, *usage_of(counters, estimated, "".join(parts)))
+
+    def generate(
+        self,
+        prompt: str,
+        api_key: str,
+        cache_content: str = None,
+        model: str = None,
+        generation_config: dict = None,
+    ) -> LLMResponse:
+        """
+        Envoie le prompt à generateContent et retourne le texte de la réponse.
+        Si cache_content est fourni, la réponse est mise en cache pour (modèle, prompt, contenu).
+        Lève LLMError si toutes les tentatives échouent.
+        """
+        model = model or self.model_for()
+        cache_key, cached = self._cache_lookup(model, prompt, cache_content, generation_config)
+        if cached is not None:
+            return LLMResponse(text=cached, cache_hit=True, model=model)
+
+        requests = _import_requests()
+        body = self._body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        self.budget.reserve(estimated)
+        response = None
+        try:
+            response = self._post(requests, model, body, api_key, estimated, cache_key)
+            return response
+        finally:
+            if response is None:
+                self.budget.settle(model, estimated)
+            else:
+                self.budget.settle(model, estimated, response.prompt_tokens, response.response_tokens)
+
+    def _post(self, requests, model: str, body: bytes, api_key: str, estimated: int, cache_key: str) -> LLMResponse:
+        """Envoi avec retries ; retourne la réponse et son usage (réel, sinon estimé)."""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimated)
+            retry_after = None
+            counters = {"bytes_sent": len(body)}
+            start = time.perf_counter()
+            try:
+                with llm_slot():
+                    response = self.session.post(
+                        self.url(model),
+                        data=body,
+                        headers=self._headers(api_key),
+                        timeout=self.timeout,
+                    )
+                    # Corps lu dans le try : une réponse coupée se réessaie comme une erreur de connexion
+                    raw = response.content
+            except _transient_errors(requests) as e:
+                metrics.record("llm.generate", time.perf_counter() - start, ok=False, **counters)
+                last_error = LLMError(str(e))
+            except requests.exceptions.RequestException as e:
+                metrics.record("llm.generate", time.perf_counter() - start, ok=False, **counters)
+                raise LLMError(str(e))
+            else:
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    return self._completion(
+                        response.status_code, raw, counters, start, model, estimated, cache_key, attempt
+                    )
+                except LLMError as e:
+                    if e.status_code not in RETRY_STATUSES:
+                        raise
+                    last_error = e
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, retry_after))
+
+        raise last_error
+
+    def stream_generate(
+        self,
+        prompt: str,
+        api_key: str,
+        cache_content: str = None,
+        model: str = None,
+        generation_config: dict = None,
+    ) -> LLMStream:
+        """
+        Comme generate(), mais via streamGenerateContent (SSE) : le texte arrive par morceaux.
+        Les retries ne s'appliquent qu'avant le premier morceau reçu.
+        La réponse complète est mise en cache seulement si le flux a été lu jusqu'au bout.
+        """
+        model = model or self.model_for()
+        cache_key, cached = self._cache_lookup(model, prompt, cache_content, generation_config)
+        if cached is not None:
+            return LLMStream(iter([cached]), cache_hit=True, model=model)
+
+        body = self._body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        self.budget.reserve(estimated)
+        start = time.perf_counter()
+        try:
+            response = self._open_stream(model, body, api_key, estimated)
+        except BaseException:
+            self.budget.settle(model, estimated)
+            raise
+        return LLMStream(self._iter_stream(response, cache_key, model, start, len(body), estimated), model=model)
+
+    def _open_stream(self, model: str, body: bytes, api_key: str, estimated: int):
+        requests = _import_requests()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimated)
+            retry_after = None
+            try:
+                with llm_slot():
+                    response = self.session.post(
+                        f"{self.url(model, 'streamGenerateContent')}?alt=sse",
+                        data=body,
+                        headers=self._headers(api_key),
+                        timeout=self.timeout,
+                        stream=True,
+                    )
+                    if response.status_code != 200:
+                        error_body = response.text
+                        response.close()
+            except _transient_errors(requests) as e:
+                last_error = LLMError(str(e))
+            except requests.exceptions.RequestException as e:
+                raise LLMError(str(e))
+            else:
+                if response.status_code == 200:
+                    return response
+                last_error = LLMError(error_body, status_code=response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, retry_after))
+
+        raise last_error
+
+    def _iter_stream(self, response, cache_key: str, model: str, start: float, bytes_sent: int, estimated: int):
+        requests = _import_requests()
+        parts = []
+        counters = {"bytes_sent": bytes_sent, "bytes_received": 0}
+        complete = False
+        try:
+            with llm_slot():
+                for line in response.iter_lines(decode_unicode=True):
+                    counters["bytes_received"] += len(line) + 1
+                    for text in sse_texts(line, counters):
+                        parts.append(text)
+                        yield text
+            complete = True
+        except requests.exceptions.RequestException as e:
+            raise LLMError(str(e))
+        finally:
+            response.close()
+            self._end_stream(parts, counters, start, model, estimated, complete)
+
+        if cache_key is not None:
+            get_cache().put(cache_key, "".join(parts), model=model)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GeminiClient:
+    """Client partagé par les trois agents (créé au premier appel)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
+
+
+def configure_client(**kwargs) -> GeminiClient:
+    """Remplace le client partagé (ex: quotas --rpm/--tpm, --token-budget, base_url d'un stub)."""
+    global _client
+    with _client_lock:
+        _client = GeminiClient(**kwargs)
+        return _client
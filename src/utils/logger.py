@@ -1,11 +1,38 @@
+import atexit
+import contextvars
 import json
 import os
+import sys
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum
 
-# Chemin du fichier de logs
+from src.utils import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+# Chemin du fichier de logs (format tableau JSON, lu par les outils d'analyse)
 LOG_FILE = os.path.join("logs", "experiment_data.json")
+# Journal append-only (une entrée JSON par ligne), écrit pendant la run
+STREAM_FILE = os.path.join("logs", "experiment_data.jsonl")
+
+# Le buffer est vidé sur disque toutes les FLUSH_EVERY entrées (ou FLUSH_BYTES octets)
+FLUSH_EVERY = 32
+FLUSH_BYTES = 1 << 20
+
+# Plusieurs fichiers peuvent être traités en parallèle (voir scheduler.py)
+_LOG_LOCK = threading.Lock()
+_buffer = []
+_buffer_bytes = 0
+# Identifiant de la run courante, repris par l'historique (src/utils/history.py)
+_run_id = None
+# Entrées capturées au lieu d'être écrites (worker du mode distribué, voir cluster.py)
+_capture = contextvars.ContextVar("log_capture", default=None)
 
 class ActionType(str, Enum):
     """
@@ -16,13 +43,50 @@ class ActionType(str, Enum):
     DEBUG = "debug"
     FIX = "fix"
 
+def start_run(run_id: str = None) -> str:
+    """Démarre une nouvelle run (ex: un job du mode service) ; les entrées suivantes lui sont rattachées."""
+    global _run_id
+    _run_id = run_id or uuid.uuid4().hex
+    return _run_id
+
+
+def current_run() -> str:
+    return _run_id or start_run()
+
+
+@contextmanager
+def capture_logs():
+    """
+    Les entrées journalisées dans ce contexte (thread ou tâche courante) sont
+    ajoutées à la liste produite au lieu d'être écrites dans le journal local.
+    """
+    entries = []
+    token = _capture.set(entries)
+    try:
+        yield entries
+    finally:
+        _capture.reset(token)
+
+
+def append_entries(entries: list) -> None:
+    """Ajoute au journal des entrées déjà formées (ex: renvoyées par un worker distant)."""
+    global _buffer_bytes
+    with _LOG_LOCK:
+        for entry in entries:
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+            _buffer.append(line)
+            _buffer_bytes += len(line)
+        if len(_buffer) >= FLUSH_EVERY or _buffer_bytes >= FLUSH_BYTES:
+            _flush_locked()
+
+
 def log_experiment(agent_name: str, model_used: str, action: ActionType, details: dict, status: str):
     """
     Enregistre une interaction d'agent pour l'analyse scientifique.
 
     Args:
         agent_name (str): Nom de l'agent (ex: "Auditor", "Fixer").
-        model_used (str): Modèle LLM utilisé (ex: "gemini-1.5-flash").
+        model_used (str): Modèle LLM utilisé (ex: "gemini-2.5-flash").
         action (ActionType): Le type d'action effectué (utiliser l'Enum ActionType).
         details (dict): Dictionnaire contenant les détails. DOIT contenir 'input_prompt' et 'output_response'.
         status (str): "SUCCESS" ou "FAILURE".
@@ -61,6 +125,7 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
     
     entry = {
         "id": str(uuid.uuid4()),
+        "run_id": current_run(),
         "timestamp": datetime.now().isoformat(),
         "agent": agent_name,
         "model": model_used,
@@ -68,23 +133,145 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
         "details": details,
         "status": status
     }
+    file_path = metrics.current_file()
+    if file_path:
+        entry["file"] = file_path
+
+    captured = _capture.get()
+    if captured is not None:
+        captured.append(entry)
+        return
+
+    # --- 4. ÉCRITURE (buffer en mémoire, ajouté au journal par paquets) ---
+    global _buffer_bytes
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _LOG_LOCK:
+        _buffer.append(line)
+        _buffer_bytes += len(line)
+        if len(_buffer) >= FLUSH_EVERY or _buffer_bytes >= FLUSH_BYTES:
+            _flush_locked()
 
-    # --- 4. ÉCRITURE ---
-    data = []
-    if os.path.exists(LOG_FILE):
+
+def flush_logs() -> None:
+    """Écrit sur disque les entrées encore en mémoire."""
+    with _LOG_LOCK:
+        _flush_locked()
+
+
+def _flush_locked() -> None:
+    """Ajoute le buffer à STREAM_FILE en une seule écriture (appelée sous _LOG_LOCK)."""
+    global _buffer, _buffer_bytes
+    if not _buffer:
+        return
+
+    chunk = "".join(_buffer).encode("utf-8")
+    os.makedirs(os.path.dirname(STREAM_FILE) or ".", exist_ok=True)
+    fd = os.open(STREAM_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        # Verrou exclusif : plusieurs processus peuvent écrire dans le même journal
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
         try:
-            with open(LOG_FILE, 'r', encoding='utf-8') as f:
+            if os.fstat(fd).st_size == 0:
+                chunk = _legacy_lines() + chunk
+            view = memoryview(chunk)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+    _buffer = []
+    _buffer_bytes = 0
+
+
+def _legacy_lines() -> bytes:
+    """Convertit l'ancien LOG_FILE (tableau JSON) en lignes JSONL, une seule fois."""
+    if not os.path.exists(LOG_FILE):
+        return b""
+    try:
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        data = json.loads(content) if content else []
+    except json.JSONDecodeError:
+        print(
+            f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. "
+            f"Il n'a pas été repris dans {STREAM_FILE}."
+        )
+        return b""
+    lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in data)
+    return lines.encode("utf-8")
+
+
+def _reset_after_fork() -> None:
+    """Un processus enfant ne doit pas réécrire les entrées héritées du parent."""
+    global _LOG_LOCK, _buffer, _buffer_bytes
+    _LOG_LOCK = threading.Lock()
+    _buffer = []
+    _buffer_bytes = 0
+
+
+atexit.register(flush_logs)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# =========================================================
+# Lecture / export au format historique
+# =========================================================
+
+
+def iter_experiments(path: str = STREAM_FILE):
+    """
+    Parcourt les entrées du journal une par une, sans tout charger en mémoire.
+    Si le journal n'existe pas encore, relit l'ancien LOG_FILE.
+    """
+    flush_logs()
+    if not os.path.exists(path):
+        if os.path.exists(LOG_FILE):
+            with open(LOG_FILE, "r", encoding="utf-8") as f:
                 content = f.read().strip()
-                if content:
-                    data = json.loads(content)
-        except json.JSONDecodeError:
-            print(
-                f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. "
-                f"Une nouvelle liste a été créée."
-            )
-            data = []
+            yield from (json.loads(content) if content else [])
+        return
 
-    data.append(entry)
-    
-    with open(LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Ligne tronquée (processus tué pendant l'écriture) : on l'ignore
+                print(f"⚠️ Ligne {number} illisible dans {path}, ignorée.")
+
+
+def export_json(dest: str = LOG_FILE, source: str = STREAM_FILE) -> int:
+    """
+    Réécrit le journal au format tableau JSON (indent=4) attendu par les outils d'analyse.
+    L'écriture est faite en streaming dans un fichier temporaire puis renommée.
+    Retourne le nombre d'entrées exportées.
+    """
+    count = 0
+    tmp_path = f"{dest}.tmp.{os.getpid()}"
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for entry in iter_experiments(source):
+            block = json.dumps(entry, indent=4, ensure_ascii=False)
+            out.write(",\n" if count else "\n")
+            out.write("\n".join("    " + line for line in block.splitlines()))
+            count += 1
+        out.write("\n]" if count else "]")
+    os.replace(tmp_path, dest)
+    return count
+
+
+if __name__ == "__main__":
+    # python -m src.utils.logger [destination.json]
+    destination = sys.argv[1] if len(sys.argv) > 1 else LOG_FILE
+    exported = export_json(destination)
+    print(f"✅ Exported {exported} entries to {destination}")
@@ -0,0 +1,112 @@
+# src/utils/manifest.py
+import json
+import os
+import threading
+import time
+
+from src.utils.source_cache import get_sources
+
+# Manifeste stocké à la racine du dossier cible
+MANIFEST_NAME = ".refactor_manifest.json"
+MANIFEST_VERSION = 1
+SAVE_INTERVAL = 2.0  # secondes entre deux sauvegardes pendant la run
+# Statuts d'un fichier réellement traité ; les autres (BUDGET...) seront repris à la run suivante
+DONE_STATUSES = ("SUCCESS", "SKIPPED", "AUTOFIXED")
+
+
+def file_hash(file_path: str):
+    """sha256 du contenu du fichier, ou None s'il n'existe pas (via le cache de sources)."""
+    return get_sources().hash_of(file_path)
+
+
+def test_path_for(file_path: str) -> str:
+    """Fichier de tests associé (même convention que main.process_file)."""
+    return file_path.replace(".py", "_test.py")
+
+
+class RunManifest:
+    """
+    Résultat de la dernière run pour chaque fichier du dossier cible :
+    hash du fichier, hash de son fichier de tests, score final, statut traité
+    ou non (done) et résultat des tests (None : pas de fichier de tests).
+    Sauvegardé atomiquement (fichier temporaire + rename) pour qu'une run
+    interrompue puisse reprendre là où elle s'est arrêtée.
+    """
+
+    def __init__(self, target_dir: str):
+        self.target_dir = target_dir
+        self.path = os.path.join(target_dir, MANIFEST_NAME)
+        self.files = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self.load()
+
+    def _key(self, file_path: str) -> str:
+        return os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.target_dir))
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+        else:
+            self.files = {}
+
+    def get(self, file_path: str):
+        with self._lock:
+            return self.files.get(self._key(file_path))
+
+    def is_unchanged(self, file_path: str) -> bool:
+        """
+        True si le fichier et ses tests n'ont pas bougé depuis une run où il a été traité
+        avec des tests qui passent, ou sans fichier de tests.
+        """
+        entry = self.get(file_path)
+        # Entrées écrites avant le champ "done" : seul test_success faisait foi
+        if not entry or not entry.get("done", entry.get("test_success")):
+            return False
+        if not entry.get("test_success") and entry.get("test_hash") is not None:
+            return False
+        return (
+            entry.get("hash") == file_hash(file_path)
+            and entry.get("test_hash") == file_hash(test_path_for(file_path))
+        )
+
+    def record(self, file_path: str, result: dict) -> None:
+        """Enregistre le résultat d'un fichier (hashes calculés après traitement)."""
+        if not result or result.get("status") == "ERROR":
+            return
+        entry = {
+            "hash": file_hash(file_path),
+            "test_hash": file_hash(test_path_for(file_path)),
+            "score": result.get("score_after"),
+            "test_success": result.get("test_success"),
+            "done": result.get("status") in DONE_STATUSES,
+            "status": result.get("status"),
+            "updated": time.time(),
+        }
+        with self._lock:
+            self.files[self._key(file_path)] = entry
+            self._dirty = True
+            if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self._save_locked()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        if not self._dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._last_save = time.monotonic()
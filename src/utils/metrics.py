@@ -0,0 +1,179 @@
+# src/utils/metrics.py
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Compteurs additionnels acceptés sur chaque mesure
+COUNTERS = ("bytes_sent", "bytes_received", "prompt_tokens", "response_tokens")
+
+_records = []
+_lock = threading.Lock()
+# Fichier courant : propre à chaque thread et à chaque tâche asyncio
+_current_file = contextvars.ContextVar("metrics_file", default=None)
+# Liste qui reçoit aussi les mesures du contexte courant (voir capture)
+_capture = contextvars.ContextVar("metrics_capture", default=None)
+
+
+# =========================================================
+# Mesures
+# =========================================================
+
+
+def set_current_file(file_path: str) -> None:
+    """Associe les mesures suivantes du thread (ou de la tâche) courant à ce fichier."""
+    _current_file.set(file_path)
+
+
+def current_file():
+    return _current_file.get()
+
+
+def record(stage_name: str, duration: float, file_path: str = None, ok: bool = True, **counters) -> None:
+    """Enregistre une mesure déjà chronométrée."""
+    entry = {
+        "stage": stage_name,
+        "file": file_path if file_path is not None else current_file(),
+        "duration": duration,
+        "ok": ok,
+    }
+    for name in COUNTERS:
+        entry[name] = int(counters.get(name) or 0)
+    with _lock:
+        _records.append(entry)
+    captured = _capture.get()
+    if captured is not None:
+        captured.append(entry)
+
+
+@contextmanager
+def capture():
+    """Les mesures prises dans ce contexte (thread ou tâche courante) sont aussi ajoutées à la liste produite."""
+    entries = []
+    token = _capture.set(entries)
+    try:
+        yield entries
+    finally:
+        _capture.reset(token)
+
+
+@contextmanager
+def stage(stage_name: str, file_path: str = None):
+    """
+    Chronomètre un bloc. Le dict produit peut recevoir des compteurs :
+        with stage("llm.generate") as m:
+            m["bytes_sent"] = len(body)
+    """
+    counters = {}
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield counters
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record(stage_name, time.perf_counter() - start, file_path, ok=counters.pop("ok", ok), **counters)
+
+
+def merge(entries: list) -> None:
+    """Ajoute des mesures prises ailleurs (ex: par un worker distant) à celles du processus."""
+    with _lock:
+        _records.extend(entries)
+
+
+def reset() -> None:
+    with _lock:
+        _records.clear()
+
+
+def records() -> list:
+    with _lock:
+        return list(_records)
+
+
+# =========================================================
+# Agrégation
+# =========================================================
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    """Percentile au rang le plus proche (valeurs déjà triées)."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def _aggregate(entries: list) -> dict:
+    durations = sorted(e["duration"] for e in entries)
+    result = {
+        "count": len(entries),
+        "failures": sum(1 for e in entries if not e["ok"]),
+        "total": sum(durations),
+        "p50": _percentile(durations, 0.50),
+        "p95": _percentile(durations, 0.95),
+        "max": durations[-1] if durations else 0.0,
+    }
+    for name in COUNTERS:
+        result[name] = sum(e[name] for e in entries)
+    return result
+
+
+def summary() -> dict:
+    """Agrégats par étape et par fichier (durées totales, p50, p95, octets, tokens)."""
+    entries = records()
+    by_stage, by_file = {}, {}
+    for entry in entries:
+        by_stage.setdefault(entry["stage"], []).append(entry)
+        if entry["file"]:
+            by_file.setdefault(entry["file"], {}).setdefault(entry["stage"], []).append(entry)
+
+    return {
+        "stages": {name: _aggregate(items) for name, items in sorted(by_stage.items())},
+        "files": {
+            file_path: {name: _aggregate(items) for name, items in sorted(stages.items())}
+            for file_path, stages in sorted(by_file.items())
+        },
+    }
+
+
+def print_summary(top_files: int = 10) -> None:
+    """Affiche le bilan des étapes puis les fichiers les plus lents."""
+    data = summary()
+    if not data["stages"]:
+        return
+    print("\n⏱️  Stage timings")
+    print(f"   {'stage':<18} {'count':>6} {'total s':>9} {'p50 s':>8} {'p95 s':>8} {'KB out':>8} {'KB in':>8} {'tok in':>8} {'tok out':>8}")
+    for name, agg in data["stages"].items():
+        print(
+            f"   {name:<18} {agg['count']:>6} {agg['total']:>9.2f} {agg['p50']:>8.3f} {agg['p95']:>8.3f} "
+            f"{agg['bytes_sent'] / 1024:>8.1f} {agg['bytes_received'] / 1024:>8.1f} "
+            f"{agg['prompt_tokens']:>8} {agg['response_tokens']:>8}"
+        )
+
+    totals = {
+        file_path: stages.get("file", {}).get("total", 0.0)
+        for file_path, stages in data["files"].items()
+    }
+    slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top_files]
+    if slowest:
+        print(f"\n🐢 Slowest files (top {len(slowest)})")
+        for file_path, total in slowest:
+            stages = data["files"][file_path]
+            detail = ", ".join(
+                f"{name} {agg['total']:.2f}s" for name, agg in stages.items() if name != "file"
+            )
+            print(f"   {total:>8.2f}s  {file_path}  ({detail})")
+
+
+def export_json(path: str) -> None:
+    """Export machine-readable (agrégats + mesures brutes) pour comparer deux versions."""
+    data = summary()
+    data["records"] = records()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
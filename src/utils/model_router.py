@@ -0,0 +1,115 @@
+# src/utils/model_router.py
+import contextvars
+import os
+from dataclasses import dataclass, field
+
+# Niveaux de modèle, du moins cher au plus fort : (variable d'environnement, modèle par défaut).
+# L'environnement est lu à chaque appel : le .env n'est chargé qu'au premier get_api_key()
+TIERS = ("fast", "standard", "strong")
+MODEL_ENV = {
+    "fast": ("GEMINI_MODEL_FAST", "gemini-2.5-flash-lite"),
+    "standard": ("GEMINI_MODEL", "gemini-2.5-flash"),
+    "strong": ("GEMINI_MODEL_STRONG", "gemini-2.5-pro"),
+}
+# Prix publics indicatifs (USD par million de tokens : entrée, sortie), pour estimer le coût
+PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# Petit fichier : modèle rapide
+FAST_FILE_TOKENS = 1500
+# Fichier à faible risque (tests existants qui passent, bon score) : modèle rapide aussi
+LOW_RISK_SCORE = 8.0
+
+_adaptive = True
+_overrides = {}  # niveau -> modèle imposé par configure_router
+# Route du fichier en cours : propre à chaque thread et à chaque tâche asyncio
+_route = contextvars.ContextVar("model_route", default=None)
+
+
+@dataclass
+class FileRoute:
+    """Niveau de modèle d'un fichier, et les tokens consommés pour lui."""
+
+    file: str
+    tier: str
+    escalations: list = field(default_factory=list)
+    calls: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
+    @property
+    def model(self) -> str:
+        return model_of(self.tier)
+
+    def add_usage(self, prompt_tokens: int, response_tokens: int) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.response_tokens += response_tokens
+
+
+def configure_router(adaptive: bool = True, **models) -> None:
+    """adaptive=False : tout passe par le modèle standard. models : fast=..., standard=..., strong=..."""
+    global _adaptive
+    _adaptive = adaptive
+    for tier, model in models.items():
+        if tier not in MODEL_ENV:
+            raise ValueError(f"unknown model tier: {tier}")
+        if model:
+            _overrides[tier] = model
+
+
+def model_of(tier: str) -> str:
+    """Modèle d'un niveau : celui de configure_router, sinon l'environnement, sinon le défaut."""
+    if tier in _overrides:
+        return _overrides[tier]
+    variable, default = MODEL_ENV[tier]
+    return os.getenv(variable) or default
+
+
+def initial_tier(tokens: int, score: float, tests_passed: bool = None) -> str:
+    """Petit fichier, ou fichier déjà bon et couvert par des tests qui passent : modèle rapide."""
+    if not _adaptive:
+        return "standard"
+    if tokens <= FAST_FILE_TOKENS or (tests_passed and score >= LOW_RISK_SCORE):
+        return "fast"
+    return "standard"
+
+
+def start_file(file_path: str, tokens: int, score: float, tests_passed: bool = None) -> FileRoute:
+    """Choisit le modèle du fichier ; les appels LLM suivants du même contexte l'utilisent."""
+    route = FileRoute(file=file_path, tier=initial_tier(tokens, score, tests_passed))
+    _route.set(route)
+    return route
+
+
+def current_route():
+    return _route.get()
+
+
+def current_model() -> str:
+    """Modèle des appels LLM du contexte courant (modèle standard hors d'un fichier)."""
+    route = _route.get()
+    return route.model if route is not None else model_of("standard")
+
+
+def escalate(reason: str) -> bool:
+    """Passe le fichier courant au modèle plus fort. False s'il est déjà au plus fort (ou routage désactivé)."""
+    route = _route.get()
+    if route is None or not _adaptive or route.tier == TIERS[-1]:
+        return False
+    previous = route.model
+    route.tier = TIERS[TIERS.index(route.tier) + 1]
+    route.escalations.append(reason)
+    print(f"🔼 Escalating {previous} → {route.model} ({reason})")
+    return True
+
+
+def cost(model: str, prompt_tokens: int, response_tokens: int):
+    """Coût estimé en USD, ou None si le prix du modèle n'est pas connu."""
+    if model not in PRICES:
+        return None
+    price_in, price_out = PRICES[model]
+    return (prompt_tokens * price_in + response_tokens * price_out) / 1_000_000
@@ -0,0 +1,244 @@
+# src/utils/scheduler.py
+import asyncio
+import contextvars
+import io
+import os
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Limites par défaut : appels LLM (réseau) et sous-processus lourds (pylint/pytest)
+DEFAULT_LLM_SLOTS = 4
+DEFAULT_CPU_SLOTS = os.cpu_count() or 2
+
+_llm_semaphore = threading.BoundedSemaphore(DEFAULT_LLM_SLOTS)
+_cpu_semaphore = threading.BoundedSemaphore(DEFAULT_CPU_SLOTS)
+_limits = {"llm": DEFAULT_LLM_SLOTS, "cpu": DEFAULT_CPU_SLOTS}
+_print_lock = threading.Lock()
+# Buffer de sortie du fichier en cours : propre à chaque thread et à chaque tâche asyncio
+_output = contextvars.ContextVar("output_buffer", default=None)
+
+
+# =========================================================
+# configure_limits(llm_slots, cpu_slots) -> None
+# =========================================================
+
+
+def configure_limits(llm_slots: int = None, cpu_slots: int = None) -> None:
+    """Redimensionne les limites LLM / CPU (à appeler avant de lancer les workers)."""
+    global _llm_semaphore, _cpu_semaphore
+    if llm_slots is not None:
+        if llm_slots < 1:
+            raise ValueError("llm_slots must be >= 1")
+        _llm_semaphore = threading.BoundedSemaphore(llm_slots)
+        _limits["llm"] = llm_slots
+    if cpu_slots is not None:
+        if cpu_slots < 1:
+            raise ValueError("cpu_slots must be >= 1")
+        _cpu_semaphore = threading.BoundedSemaphore(cpu_slots)
+        _limits["cpu"] = cpu_slots
+
+
+def llm_limit() -> int:
+    """Nombre d'appels LLM simultanés autorisés (repris par le client asynchrone)."""
+    return _limits["llm"]
+
+
+@contextmanager
+def llm_slot():
+    """Réserve une place pour un appel LLM (bloque si la limite est atteinte)."""
+    semaphore = _llm_semaphore
+    with semaphore:
+        yield
+
+
+@contextmanager
+def cpu_slot():
+    """Réserve une place pour un sous-processus lourd (pylint, pytest)."""
+    semaphore = _cpu_semaphore
+    with semaphore:
+        yield
+
+
+# =========================================================
+# Sortie console par fichier
+# =========================================================
+
+
+class _CapturedStdout(io.TextIOBase):
+    """Redirige print() vers le buffer du thread / de la tâche courante s'il en a un."""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+
+    def write(self, text):
+        buffer = _output.get()
+        if buffer is None:
+            with _print_lock:
+                return self._fallback.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if _output.get() is None:
+            self._fallback.flush()
+
+
+def emit(text: str, stream=None) -> None:
+    """Écrit un bloc de texte d'un seul tenant (par défaut sur la vraie console)."""
+    stream = stream or sys.__stdout__
+    with _print_lock:
+        stream.write(text)
+        stream.flush()
+
+
+def _run_captured(worker, file_path: str, *args):
+    """Exécute worker(file_path, *args) en capturant sa sortie console."""
+    buffer = io.StringIO()
+    token = _output.set(buffer)
+    try:
+        try:
+            result = worker(file_path, *args)
+        except Exception as e:
+            traceback.print_exc(file=buffer)
+            result = {"file": file_path, "status": "ERROR", "error": str(e)}
+        return result, buffer.getvalue()
+    finally:
+        _output.reset(token)
+
+
+# =========================================================
+# run_files(files, worker, *args, workers=1) -> list[dict]
+# =========================================================
+
+
+def run_files(files, worker, *args, workers: int = 1) -> list:
+    """
+    Lance worker(file_path, *args) pour chaque fichier avec `workers` threads.
+    `files` peut être un générateur : les fichiers sont lancés au fil de l'eau,
+    sans attendre la fin du parcours du dossier.
+    La sortie de chaque fichier est affichée d'un bloc quand il se termine.
+    Retourne les résultats dans l'ordre des fichiers d'entrée.
+    """
+    if workers < 1:
+        raise ValueError("workers must be >= 1")
+
+    total = len(files) if hasattr(files, "__len__") else None
+    results = []
+
+    if workers == 1:
+        # Mode séquentiel : sortie en direct, comme avant
+        for file_path in files:
+            try:
+                results.append(worker(file_path, *args))
+            except Exception as e:
+                traceback.print_exc()
+                results.append({"file": file_path, "status": "ERROR", "error": str(e)})
+        return results
+
+    submitted = []
+    finished = queue.Queue()
+    done = 0
+
+    def report(index: int, future) -> None:
+        nonlocal done
+        result, output = future.result()
+        results[index] = result
+        done += 1
+        progress = f"{done}/{total}" if total is not None else f"{done}/{len(submitted)}+"
+        emit(f"\n===== [{progress}] {submitted[index]} =====\n{output}", previous_stdout)
+
+    def drain(block: bool) -> None:
+        while True:
+            try:
+                index, future = finished.get(block=block)
+            except queue.Empty:
+                return
+            report(index, future)
+            block = False
+
+    previous_stdout = sys.stdout
+    sys.stdout = _CapturedStdout(previous_stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for file_path in files:
+                index = len(submitted)
+                submitted.append(file_path)
+                results.append(None)
+                future = pool.submit(_run_captured, worker, file_path, *args)
+                future.add_done_callback(lambda f, i=index: finished.put((i, f)))
+                drain(block=False)
+            total = len(submitted)  # parcours terminé : le total est connu
+            while done < len(submitted):
+                drain(block=True)
+    finally:
+        sys.stdout = previous_stdout
+
+    return results
+
+
+# =========================================================
+# run_files_async(files, worker, *args, concurrency) -> list[dict]
+# =========================================================
+
+
+async def _run_captured_async(worker, file_path: str, *args):
+    buffer = io.StringIO()
+    _output.set(buffer)  # chaque tâche a sa propre copie du contexte
+    try:
+        result = await worker(file_path, *args)
+    except Exception as e:
+        traceback.print_exc(file=buffer)
+        result = {"file": file_path, "status": "ERROR", "error": str(e)}
+    return result, buffer.getvalue()
+
+
+async def run_files_async(files, worker, *args, concurrency: int = 100) -> list:
+    """
+    Équivalent asynchrone de run_files pour une coroutine worker(file_path, *args) :
+    jusqu'à `concurrency` fichiers en vol dans une seule boucle (les appels LLM
+    restent bornés par la limite LLM, pylint/pytest par la limite CPU).
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    results = []
+    submitted = []
+    in_flight = {}
+    done = 0
+    total = len(files) if hasattr(files, "__len__") else None
+
+    def report(task) -> None:
+        nonlocal done
+        index = in_flight.pop(task)
+        result, output = task.result()
+        results[index] = result
+        done += 1
+        progress = f"{done}/{total}" if total is not None else f"{done}/{len(submitted)}+"
+        emit(f"\n===== [{progress}] {submitted[index]} =====\n{output}", previous_stdout)
+
+    previous_stdout = sys.stdout
+    sys.stdout = _CapturedStdout(previous_stdout)
+    try:
+        for file_path in files:
+            while len(in_flight) >= concurrency:
+                finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    report(task)
+            index = len(submitted)
+            submitted.append(file_path)
+            results.append(None)
+            # create_task copie le contexte : buffer de sortie et fichier courant propres à la tâche
+            task = asyncio.create_task(_run_captured_async(worker, file_path, *args))
+            in_flight[task] = index
+        total = len(submitted)
+        while in_flight:
+            finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                report(task)
+    finally:
+        sys.stdout = previous_stdout
+
+    return results
@@ -0,0 +1,115 @@
+# src/utils/source_cache.py
+import ast
+import hashlib
+import os
+import threading
+
+
+class SourceEntry:
+    """Contenu d'un fichier à un instant donné : texte, hash, et AST / tokens calculés à la demande."""
+
+    def __init__(self, path: str, data: bytes, stamp: tuple):
+        self.path = path
+        # Même texte que Path.read_text() (fins de ligne normalisées), hash des octets sur disque
+        self.text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        self.stamp = stamp  # (mtime_ns, taille) au moment de la lecture
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self._tree = None
+        self._tokens = None
+
+    @property
+    def tree(self) -> ast.Module:
+        """AST du fichier (lève SyntaxError si le code est invalide)."""
+        if self._tree is None:
+            self._tree = ast.parse(self.text, filename=self.path)
+        return self._tree
+
+    @property
+    def tokens(self) -> int:
+        if self._tokens is None:
+            from src.utils.llm_client import estimate_tokens
+
+            self._tokens = estimate_tokens(self.text)
+        return self._tokens
+
+
+def _stamp(path: str) -> tuple:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SourceCache:
+    """
+    Sources lues pendant la run, partagées par les agents et le linter.
+    Une entrée est remplacée quand write_file réécrit le fichier, et relue
+    si le fichier a été modifié par ailleurs (mtime ou taille différents).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.hits = 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: str) -> SourceEntry:
+        """Entrée à jour pour path ; lève OSError si le fichier n'existe pas."""
+        key = self._key(path)
+        stamp = _stamp(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self.hits += 1
+                return entry
+        with open(key, "rb") as f:
+            data = f.read()
+        entry = SourceEntry(key, data, stamp)
+        with self._lock:
+            self._entries[key] = entry
+            self.reads += 1
+        return entry
+
+    def cached(self, path: str) -> bool:
+        """True si path est déjà en cache (et n'a pas changé sur disque)."""
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        try:
+            return entry is not None and entry.stamp == _stamp(key)
+        except OSError:
+            return False
+
+    def put(self, path: str, text: str) -> SourceEntry:
+        """Enregistre le contenu qui vient d'être écrit (évite une relecture)."""
+        key = self._key(path)
+        entry = SourceEntry(key, text.encode("utf-8"), _stamp(key))
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(self._key(path), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.reads = self.hits = 0
+
+    def hash_of(self, path: str):
+        """sha256 du contenu de path, ou None s'il n'existe pas."""
+        try:
+            return self.get(path).sha256
+        except (OSError, UnicodeDecodeError):
+            return None
+
+
+_sources = SourceCache()
+
+
+def get_sources() -> SourceCache:
+    """Cache de sources partagé par tout le processus."""
+    return _sources
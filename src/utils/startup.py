@@ -0,0 +1,58 @@
+# src/utils/startup.py
+import os
+import re
+import subprocess
+import sys
+
+# Racine du dépôt : les imports profilés se font depuis un interpréteur neuf lancé ici
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ce que chaque processus importe au démarrage
+STARTUP_TARGETS = (
+    ("CLI (main.py)", "import main"),
+    ("pytest worker", "import src.utils.test_runner, pytest"),
+)
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(statement: str) -> list:
+    """
+    Exécute `statement` dans un interpréteur neuf avec `python -X importtime`.
+    Retourne [(module, µs propres, µs cumulés, profondeur)] dans l'ordre de chargement.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            entries.append((module, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return entries
+
+
+def summarize(entries: list, top: int = 8) -> tuple:
+    """(temps total en ms, [(paquet, ms)] des paquets les plus lents, temps propre cumulé par paquet)."""
+    by_package = {}
+    for module, own, _, _ in entries:
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + own
+    total = sum(by_package.values()) / 1000
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, [(package, own / 1000) for package, own in heaviest]
+
+
+def print_startup_profile(top: int = 8) -> None:
+    """Affiche le temps d'import de chaque type de processus et les paquets qui le dominent."""
+    print("⏱️  Startup imports (python -X importtime, fresh interpreter)")
+    for label, statement in STARTUP_TARGETS:
+        total, heaviest = summarize(profile_imports(statement), top)
+        print(f"   {label}: {total:.1f} ms")
+        for package, elapsed in heaviest:
+            print(f"      {elapsed:7.1f} ms  {package}")
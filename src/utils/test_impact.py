@@ -0,0 +1,186 @@
+# src/utils/test_impact.py
+import ast
+
+from src.utils.code_units import ALL_UNITS, split_units
+
+# =========================================================
+# Carte d'impact : test -> symboles du module testé
+# =========================================================
+
+
+def _referenced_names(node) -> set:
+    """Noms (Name) et attributs (x.attr) utilisés dans un nœud."""
+    names = set()
+    attribute_bases = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name):
+            names.add(f"{child.value.id}.{child.attr}")
+            attribute_bases.add(id(child.value))
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and id(child) not in attribute_bases:
+            names.add(child.id)
+    return names
+
+
+def _module_aliases(tree: ast.Module, module_name: str, unit_names: set) -> tuple:
+    """
+    Alias locaux vers le module testé :
+    (noms importés {alias: symbole}, alias du module lui-même, import * présent).
+    """
+    imported = {}
+    module_aliases = set()
+    star = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.module.split(".")[-1] == module_name:
+            for alias in node.names:
+                if alias.name == "*":
+                    star = True
+                else:
+                    imported[alias.asname or alias.name] = alias.name
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split(".")[-1] == module_name:
+                    module_aliases.add(alias.asname or alias.name)
+    if star:
+        imported.update({name: name for name in unit_names if name not in imported})
+    return imported, module_aliases, star
+
+
+def _resolve(names: set, imported: dict, module_aliases: set) -> set:
+    """Traduit les noms utilisés en symboles du module (ALL_UNITS pour un usage opaque du module)."""
+    symbols = set()
+    for name in names:
+        if "." in name:
+            base, attr = name.split(".", 1)
+            if base in module_aliases:
+                symbols.add(attr)
+        elif name in imported:
+            symbols.add(imported[name])
+        elif name in module_aliases:
+            symbols.add(ALL_UNITS)  # module passé tel quel : tout peut être concerné
+    return symbols
+
+
+def _test_functions(tree: ast.Module) -> list:
+    """(identifiant pytest relatif au fichier, nœud) pour chaque test de premier niveau ou de classe Test*."""
+    tests = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            tests.append((node.name, node))
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) and child.name.startswith("test"):
+                    tests.append((f"{node.name}::{child.name}", child))
+    return tests
+
+
+def build_impact_map(test_source: str, module_name: str, unit_names: set) -> dict:
+    """
+    {identifiant de test: symboles du module qu'il exerce}, par analyse statique :
+    imports du module, références dans le test, dans les helpers/fixtures
+    du fichier de tests qu'il utilise, et dans le code de niveau module.
+    Lève SyntaxError si le fichier de tests est invalide.
+    """
+    tree = ast.parse(test_source)
+    imported, module_aliases, _ = _module_aliases(tree, module_name, unit_names)
+
+    # Helpers et fixtures locaux : leurs symboles se propagent aux tests qui les utilisent
+    local = {}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("test"):
+            local.setdefault(node.name, set()).update(_referenced_names(node))
+
+    def closure(names: set) -> set:
+        seen, pending = set(), list(names)
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            pending.extend(local.get(name, ()))
+        return seen
+
+    # Code de niveau module (objets construits à l'import du fichier de tests)
+    global_names = set()
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)):
+            global_names.update(_referenced_names(node))
+    global_symbols = _resolve(closure(global_names), imported, module_aliases)
+
+    impact = {}
+    for test_id, node in _test_functions(tree):
+        names = _referenced_names(node)
+        names.update(arg.arg for arg in node.args.args)  # fixtures demandées par le test
+        impact[test_id] = _resolve(closure(names), imported, module_aliases) | global_symbols
+    return impact
+
+
+def module_dependencies(source: str) -> dict:
+    """{unité: unités du module dont elle dépend (transitivement)}."""
+    units = split_units(source)
+    names = {unit.name for unit in units}
+    direct = {}
+    for unit in units:
+        direct[unit.name] = {n for n in _referenced_names(ast.parse(unit.source)) if n in names} - {unit.name}
+
+    resolved = {}
+    for name in direct:
+        seen, pending = set(), list(direct[name])
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            pending.extend(direct.get(current, ()))
+        resolved[name] = seen
+    return resolved
+
+
+def affected_tests(impact: dict, dependencies: dict, changed: set):
+    """
+    Tests touchés par les unités modifiées, ou None s'il faut tout relancer
+    (code de module modifié, ou test qui utilise le module de façon opaque).
+    """
+    if ALL_UNITS in changed:
+        return None
+    selected = []
+    for test_id, symbols in impact.items():
+        if ALL_UNITS in symbols:
+            selected.append(test_id)
+            continue
+        reached = set(symbols)
+        for symbol in symbols:
+            reached |= dependencies.get(symbol, set())
+        if reached & changed:
+            selected.append(test_id)
+    return selected
+
+
+def select_tests(test_path: str, test_source: str, code_source: str, module_name: str, changed: set):
+    """
+    Identifiants pytest "chemin::test" des tests de test_path touchés par `changed`,
+    ou None si la sélection est impossible (fichier invalide, code de module modifié).
+    """
+    try:
+        dependencies = module_dependencies(code_source)
+        impact = build_impact_map(test_source, module_name, set(dependencies))
+    except SyntaxError:
+        return None
+    selected = affected_tests(impact, dependencies, changed)
+    if selected is None:
+        return None
+    return [f"{test_path}::{test_id}" for test_id in selected]
+
+
+def failed_node_ids(test_path: str, failures: list) -> list:
+    """Identifiants "chemin::test" des échecs remontés par le pool (paramètres retirés)."""
+    node_ids = []
+    for failure in failures:
+        nodeid = failure.get("nodeid", "")
+        if "::" not in nodeid:
+            continue
+        test_id = nodeid.split("::", 1)[1].split("[", 1)[0]
+        node_id = f"{test_path}::{test_id}"
+        if node_id not in node_ids:
+            node_ids.append(node_id)
+    return node_ids
@@ -0,0 +1,358 @@
+# src/utils/test_runner.py
+import io
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout
+
+# Racine du dépôt : les workers sont lancés avec `python -m src.utils.test_runner`
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_TEST_TIMEOUT = 30  # secondes par test
+DEFAULT_JOB_TIMEOUT = 300  # secondes pour un fichier de tests complet
+STARTUP_TIMEOUT = 60
+
+
+class TestWorkerError(Exception):
+    """Un worker n'a pas répondu (crash, timeout, démarrage impossible)."""
+
+
+# =========================================================
+# Côté worker : processus qui a déjà importé pytest
+# =========================================================
+
+
+def _test_key(path: str, nodeid: str) -> str:
+    """Identifiant "chemin absolu::test" (classe incluse, paramètres retirés)."""
+    test_id = nodeid.split("::", 1)[1] if "::" in nodeid else ""
+    return f"{os.path.abspath(path)}::{test_id.split('[', 1)[0]}"
+
+
+def _make_collector(test_timeout: float, exclude: list = None):
+    """Plugin pytest qui collecte les résultats et borne la durée de chaque test."""
+    import pytest
+
+    excluded = {entry.split("[", 1)[0] for entry in exclude or []}
+
+    class ResultCollector:
+        def __init__(self):
+            self.passed = 0
+            self.failed = 0
+            self.errors = 0
+            self.skipped = 0
+            self.failures = []
+
+        def pytest_collection_modifyitems(self, session, config, items):
+            # Tests déjà exécutés sur cette version du code : on ne les relance pas
+            if not excluded:
+                return
+            kept, deselected = [], []
+            for item in items:
+                key = _test_key(str(item.path), item.nodeid)
+                (deselected if key in excluded else kept).append(item)
+            if deselected:
+                items[:] = kept
+                config.hook.pytest_deselected(items=deselected)
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_call(self, item):
+            use_alarm = test_timeout and hasattr(signal, "setitimer")
+            if use_alarm:
+                def _on_timeout(signum, frame):
+                    raise TimeoutError(f"Test exceeded {test_timeout}s")
+
+                previous = signal.signal(signal.SIGALRM, _on_timeout)
+                signal.setitimer(signal.ITIMER_REAL, test_timeout)
+            try:
+                yield
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                    signal.signal(signal.SIGALRM, previous)
+
+        def pytest_runtest_logreport(self, report):
+            if report.when == "call":
+                if report.passed:
+                    self.passed += 1
+                elif report.failed:
+                    self.failed += 1
+                    self.failures.append(
+                        {"nodeid": report.nodeid, "longrepr": str(report.longrepr)}
+                    )
+            elif report.failed:
+                self.errors += 1
+                self.failures.append(
+                    {"nodeid": report.nodeid, "longrepr": str(report.longrepr)}
+                )
+            if report.skipped:
+                self.skipped += 1
+
+        def pytest_collectreport(self, report):
+            if report.failed:
+                self.errors += 1
+                self.failures.append(
+                    {"nodeid": report.nodeid, "longrepr": str(report.longrepr)}
+                )
+
+    return ResultCollector()
+
+
+def _run_job(job: dict) -> dict:
+    """Exécute un job pytest puis oublie les modules importés par les tests."""
+    import pytest
+
+    modules_before = set(sys.modules)
+    path_before = list(sys.path)
+    collector = _make_collector(job.get("test_timeout"), job.get("exclude"))
+    buffer = io.StringIO()
+    targets = job.get("node_ids") or [job["test_path"]]
+    args = ["-p", "no:cacheprovider", *job.get("args", []), *targets]
+
+    start = time.monotonic()
+    with redirect_stdout(buffer):
+        try:
+            exit_code = int(pytest.main(args, plugins=[collector]))
+        except BaseException:  # SystemExit, KeyboardInterrupt dans un test...
+            traceback.print_exc(file=buffer)
+            exit_code = -1
+        finally:
+            # Le code testé a pu changer entre deux jobs : on le réimportera
+            for name in set(sys.modules) - modules_before:
+                sys.modules.pop(name, None)
+            sys.path[:] = path_before
+
+    # Tous les tests exclus : "no tests collected" n'est pas un échec
+    all_excluded = exit_code == 5 and job.get("exclude") and not collector.errors
+    return {
+        "success": exit_code == 0 or bool(all_excluded),
+        "exit_code": exit_code,
+        "passed": collector.passed,
+        "failed": collector.failed,
+        "errors": collector.errors,
+        "skipped": collector.skipped,
+        "failures": collector.failures,
+        "output": buffer.getvalue(),
+        "duration": time.monotonic() - start,
+    }
+
+
+def _worker_main() -> None:
+    """Boucle du worker : un job JSON par ligne sur stdin, une réponse par ligne."""
+    # Le protocole garde le vrai stdout ; ce que les tests écrivent sur fd 1 part sur stderr
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+
+    import pytest  # noqa: F401  (chargé une fois pour toutes)
+
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            result = _run_job(json.loads(line))
+        except Exception as e:
+            result = {"success": False, "exit_code": -1, "output": f"Worker error: {e}"}
+        protocol.write(json.dumps(result) + "\n")
+
+
+# =========================================================
+# Côté parent : pool de workers pré-démarrés
+# =========================================================
+
+
+class _Worker:
+    """Processus worker (un job JSON par ligne) ; module : src.utils.test_runner ou src.utils.lint."""
+
+    def __init__(self, module: str = "src.utils.test_runner", args: list = None):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", module, *(args or [])],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=PROJECT_ROOT,
+            env=env,
+            text=True,
+            encoding="utf-8",
+        )
+        self._read(STARTUP_TIMEOUT)
+
+    def _read(self, timeout: float) -> dict:
+        stdout = self.process.stdout
+        ready, _, _ = select.select([stdout], [], [], timeout)
+        if not ready:
+            raise TestWorkerError(f"no answer from test worker after {timeout}s")
+        line = stdout.readline()
+        if not line:
+            try:
+                exit_code = self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                exit_code = None
+            raise TestWorkerError(f"test worker crashed (exit code {exit_code})")
+        return json.loads(line)
+
+    def run(self, job: dict, timeout: float) -> dict:
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise TestWorkerError(f"test worker is gone: {e}")
+        return self._read(timeout)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+
+def _absolute_node_id(node_id: str) -> str:
+    path, sep, rest = node_id.partition("::")
+    return f"{os.path.abspath(path)}{sep}{rest}"
+
+
+class TestWorkerPool:
+    """
+    Pool de processus pytest déjà chauds. Chaque job retourne un résultat structuré
+    (compteurs, tests en échec, sortie). Un worker qui plante ou dépasse le délai
+    est tué et remplacé sans affecter les autres jobs.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        test_timeout: float = DEFAULT_TEST_TIMEOUT,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+    ):
+        self.size = size
+        self.test_timeout = test_timeout
+        self.job_timeout = job_timeout
+        self._idle = []
+        self._started = 0
+        self._cond = threading.Condition()
+
+    def start(self) -> None:
+        """Pré-démarre tous les workers."""
+        workers = [_Worker() for _ in range(self.size - self._started)]
+        with self._cond:
+            self._idle.extend(workers)
+            self._started += len(workers)
+            self._cond.notify_all()
+
+    def _acquire(self) -> _Worker:
+        with self._cond:
+            while not self._idle and self._started >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Worker()
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        with self._cond:
+            if healthy and worker.alive():
+                self._idle.append(worker)
+            else:
+                self._started -= 1
+            self._cond.notify()
+        if not healthy:
+            worker.kill()
+
+    def run(self, test_path: str, node_ids: list = None, args: list = None, exclude: list = None) -> dict:
+        """
+        Lance pytest sur test_path (ou sur les node_ids "chemin::test" donnés) dans un worker.
+        exclude : node_ids à ne pas exécuter (désélectionnés après la collecte).
+        """
+        job = {
+            "test_path": os.path.abspath(test_path),
+            "node_ids": [_absolute_node_id(n) for n in node_ids] if node_ids else None,
+            "exclude": [_absolute_node_id(n) for n in exclude] if exclude else None,
+            "args": args or [],
+            "test_timeout": self.test_timeout,
+        }
+        try:
+            worker = self._acquire()
+        except Exception as e:
+            return _failure(f"Could not start test worker: {e}")
+
+        try:
+            result = worker.run(job, self.job_timeout)
+        except TestWorkerError as e:
+            self._release(worker, healthy=False)
+            return _failure(str(e))
+        self._release(worker, healthy=True)
+        return result
+
+    def close(self) -> None:
+        with self._cond:
+            workers, self._idle = self._idle, []
+            self._started -= len(workers)
+        for worker in workers:
+            try:
+                worker.process.stdin.close()
+            except OSError:
+                pass
+            worker.kill()
+
+
+def _failure(message: str) -> dict:
+    return {
+        "success": False,
+        "exit_code": -1,
+        "passed": 0,
+        "failed": 0,
+        "errors": 1,
+        "skipped": 0,
+        "failures": [],
+        "output": message,
+        "duration": 0.0,
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_test_pool() -> TestWorkerPool:
+    """Pool partagé (créé au premier appel, workers lancés à la demande)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TestWorkerPool()
+        return _pool
+
+
+def configure_test_pool(size: int, test_timeout: float = DEFAULT_TEST_TIMEOUT) -> TestWorkerPool:
+    """Remplace le pool partagé et pré-démarre ses workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = TestWorkerPool(size=size, test_timeout=test_timeout)
+    _pool.start()
+    return _pool
+
+
+def close_test_pool() -> None:
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+
+
+if __name__ == "__main__":
+    _worker_main()
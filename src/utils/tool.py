@@ -1,7 +1,20 @@
 from pathlib import Path
 import os
 
-SANDBOX_PATH = Path("./sandbox").resolve()
+from src.utils.source_cache import SourceEntry, get_sources
+from src.utils.workspace import atomic_write
+
+SANDBOX_DIR = "sandbox"
+_sandbox_path = None
+
+
+def sandbox_path() -> Path:
+    """Racine du sandbox, résolue au premier usage (et non à l'import du module)."""
+    global _sandbox_path
+    if _sandbox_path is None:
+        _sandbox_path = Path(SANDBOX_DIR).resolve()
+    return _sandbox_path
+
 
 # =========================================================
 # def validate_sandbox_path(file_path: str) -> Path:
@@ -11,7 +24,7 @@ SANDBOX_PATH = Path("./sandbox").resolve()
 def validate_sandbox_path(file_path: str) -> Path:
     """Vérifie que le fichier est dans ./sandbox."""
     full_path = Path(file_path).resolve()
-    if not str(full_path).startswith(str(SANDBOX_PATH)):
+    if not str(full_path).startswith(str(sandbox_path())):
         raise ValueError(f"❌ Hors sandbox: {file_path}")
     if not full_path.exists():
         raise FileNotFoundError(f"❌ Introuvable: {file_path}")
@@ -24,10 +37,10 @@ def validate_sandbox_path(file_path: str) -> Path:
 
 
 def list_python_files(target_dir: str) -> list[str]:
-    """Liste tous les .py dans le dossier."""
-    target_path = Path(target_dir)
-    validate_sandbox_path(str(target_path))
-    return [str(p) for p in target_path.rglob("*.py")]
+    """Liste tous les .py dans le dossier (hors .venv, caches et chemins ignorés)."""
+    from src.utils.discovery import iter_python_files
+
+    return list(iter_python_files(target_dir, skip_tests=False))
 
 
 # =========================================================
@@ -37,18 +50,29 @@ def list_python_files(target_dir: str) -> list[str]:
 from pathlib import Path
 
 
-def read_file(file_path: str) -> str:
+def read_source(file_path: str) -> SourceEntry:
     """
-    Read a Python file from the sandbox securely.
-    Returns the content as a string.
+    Read a Python file from the sandbox securely, through the shared source cache.
+    Returns the cached entry (text, sha256, lazily parsed ast).
     """
     safe_path = validate_sandbox_path(file_path)
     if not safe_path.is_file():
         raise FileNotFoundError(f"File not found: '{safe_path}'")
 
-    content = safe_path.read_text(encoding="utf-8")
-    print(f"✅ Read file: '{safe_path}' ({len(content)} characters)")
-    return content
+    sources = get_sources()
+    first_read = not sources.cached(str(safe_path))
+    entry = sources.get(str(safe_path))
+    if first_read:
+        print(f"✅ Read file: '{safe_path}' ({len(entry.text)} characters)")
+    return entry
+
+
+def read_file(file_path: str) -> str:
+    """
+    Read a Python file from the sandbox securely.
+    Returns the content as a string.
+    """
+    return read_source(file_path).text
 
 
 # =========================================================
@@ -70,8 +94,19 @@ def write_file(file_path: str, content: str, mode: str = "w") -> None:
     safe_path = Path(file_path).resolve()
     safe_path.parent.mkdir(parents=True, exist_ok=True)  # ✅ Crée dossiers!
 
-    with safe_path.open(mode, encoding="utf-8") as f:
-        f.write(content)
+    if mode == "w":
+        # Fichier temporaire + rename : jamais de fichier tronqué, et un lien dur
+        # (copie de travail) n'est jamais modifié sur place
+        atomic_write(str(safe_path), content)
+    else:
+        with safe_path.open(mode, encoding="utf-8") as f:
+            f.write(content)
+
+    # Le cache de sources suit le fichier (pas de relecture au prochain read_file)
+    if mode == "w":
+        get_sources().put(str(safe_path), content)
+    else:
+        get_sources().invalidate(str(safe_path))
 
     action = "Appended" if mode == "a" else "Wrote"
     print(f"✅ {action} file: '{safe_path}' ({len(content)} chars)")
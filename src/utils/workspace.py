@@ -0,0 +1,183 @@
+# src/utils/workspace.py
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from src.utils.source_cache import get_sources
+
+# Dossier caché, à côté du fichier traité, qui contient les copies de travail
+SCRATCH_DIR = ".refactor_scratch"
+
+# Dossiers SCRATCH_DIR créés pendant la run : partagés par tous les fichiers d'un même
+# dossier, ils ne sont retirés qu'une fois, en fin de run (remove_scratch_dirs)
+_scratch_roots = set()
+_scratch_lock = threading.Lock()
+
+# ioctl Linux FICLONE : copie "reflink" (btrfs, xfs...), les blocs ne sont dupliqués qu'à l'écriture
+FICLONE = 0x40049409
+
+
+def _reflink(source: str, destination: str) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(destination)
+        except OSError:
+            pass
+        return False
+
+
+def clone_file(source: str, destination: str) -> str:
+    """
+    Copie bon marché de source : reflink si le système de fichiers le permet,
+    sinon lien dur, sinon vraie copie. Retourne la méthode utilisée.
+    Un lien dur partage le fichier d'origine : on ne le modifie donc jamais
+    sur place, toute écriture passe par atomic_write (nouveau fichier + rename).
+    """
+    if _reflink(source, destination):
+        return "reflink"
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        shutil.copy2(source, destination)
+        return "copy"
+
+
+def atomic_write(path: str, content: str) -> None:
+    """Écrit dans un fichier temporaire du même dossier puis le renomme : jamais de fichier à moitié écrit."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        else:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def origin_path(path: str) -> str:
+    """Chemin d'origine d'un fichier de copie de travail (le chemin lui-même hors copie)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    if os.path.basename(root) != SCRATCH_DIR:
+        return os.path.abspath(path)
+    return os.path.join(os.path.dirname(root), os.path.basename(path))
+
+
+def pytest_args(test_path: str) -> list:
+    """Options pytest pour test_path : depuis une copie de travail, les modules voisins d'origine restent importables."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(test_path)))
+    if os.path.basename(root) != SCRATCH_DIR:
+        return []
+    return ["-o", f"pythonpath={os.path.dirname(root)}"]
+
+
+def _make_scratch_dir(root: str, prefix: str) -> str:
+    """Crée un dossier de copie de travail dans root (recréé s'il disparaît entre-temps)."""
+    with _scratch_lock:
+        _scratch_roots.add(root)
+    for _ in range(3):
+        os.makedirs(root, exist_ok=True)
+        try:
+            return tempfile.mkdtemp(prefix=prefix, dir=root)
+        except FileNotFoundError:
+            continue  # root supprimé par un autre processus : on le recrée
+    return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+
+def remove_scratch_dirs() -> int:
+    """Fin de run : retire les dossiers SCRATCH_DIR restés vides. Retourne leur nombre."""
+    with _scratch_lock:
+        roots = list(_scratch_roots)
+        _scratch_roots.clear()
+    removed = 0
+    for root in roots:
+        try:
+            os.rmdir(root)  # seulement s'il est vide
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class Scratch:
+    """
+    Copie de travail d'un module et de son fichier de tests, pour une tentative
+    de correction : les agents écrivent dans la copie, le fichier d'origine
+    n'est remplacé qu'au commit() (rename atomique). Sans commit (échec,
+    plantage), l'original reste intact.
+    Les autres modules du dossier d'origine restent importables par les tests.
+    """
+
+    def __init__(self, file_path: str, test_path: str = None, label: str = "attempt", source_dir: str = None):
+        self.origin = os.path.abspath(file_path)
+        self.test_origin = os.path.abspath(test_path or file_path.replace(".py", "_test.py"))
+        self.source_dir = source_dir or os.path.dirname(self.origin)
+        module = os.path.splitext(os.path.basename(file_path))[0]
+        self.directory = _make_scratch_dir(os.path.join(self.source_dir, SCRATCH_DIR), f"{module}-{label}-")
+        self.file_path = os.path.join(self.directory, os.path.basename(self.origin))
+        self.test_path = os.path.join(self.directory, os.path.basename(self.test_origin))
+        self.method = clone_file(self.origin, self.file_path)
+        if os.path.exists(self.test_origin):
+            clone_file(self.test_origin, self.test_path)
+
+    def fork(self, label: str) -> "Scratch":
+        """Nouvelle copie partant de l'état courant de celle-ci (son commit() revient ici)."""
+        return Scratch(self.file_path, self.test_path, label=label, source_dir=self.source_dir)
+
+    def write(self, content: str) -> None:
+        atomic_write(self.file_path, content)
+        get_sources().invalidate(self.file_path)
+
+    def revert(self) -> None:
+        """Remet le module de la copie dans l'état d'origine."""
+        os.unlink(self.file_path)
+        get_sources().invalidate(self.file_path)
+        clone_file(self.origin, self.file_path)
+
+    def _changed(self, path: str, origin: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        if not os.path.exists(origin):
+            return True
+        return not os.path.samefile(path, origin) and not filecmp.cmp(path, origin, shallow=False)
+
+    def commit(self) -> list:
+        """Remplace les originaux modifiés (module, tests) par rename atomique. Retourne les chemins remplacés."""
+        committed = []
+        for path, origin in ((self.file_path, self.origin), (self.test_path, self.test_origin)):
+            if self._changed(path, origin):
+                os.replace(path, origin)
+                get_sources().invalidate(origin)
+                committed.append(origin)
+        return committed
+
+    def discard(self) -> None:
+        for path in (self.file_path, self.test_path):
+            get_sources().invalidate(path)
+        # Le dossier SCRATCH_DIR parent est partagé avec les autres fichiers en cours : il reste
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "Scratch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.discard()
@@ -0,0 +1,12 @@
+# tests/conftest.py
+import pytest
+
+from benchmarks.stub_gemini import StubGeminiServer
+
+
+@pytest.fixture
+def stub():
+    """Faux serveur Gemini local, arrêté à la fin du test."""
+    server = StubGeminiServer().start()
+    yield server
+    server.stop()
@@ -0,0 +1,58 @@
+# tests/test_autofix.py
+from src.utils.autofix import fix_source
+
+
+def _message(symbol, line, message):
+    return {"symbol": symbol, "line": line, "message": message}
+
+
+def test_semicolon_after_none_comparison_keeps_the_code():
+    # `!= None` -> `is not None` allonge la ligne : le ';' ne doit pas être coupé au mauvais endroit
+    source = "b = 1\na = b != None;\n"
+    messages = [
+        _message("singleton-comparison", 2, "Comparison 'b != None' should be 'b is not None'"),
+        _message("unnecessary-semicolon", 2, "Unnecessary semicolon"),
+    ]
+    result = fix_source(source, messages)
+    assert result.source == "b = 1\na = b is not None\n"
+    assert result.applied == {"singleton-comparison": 1, "unnecessary-semicolon": 1}
+    assert result.remaining == []
+
+
+def test_several_rewrites_on_one_line():
+    source = "x = y = None\nok = x == None and y != None;   \n"
+    messages = [
+        _message("singleton-comparison", 2, "Comparison 'x == None' should be 'x is None'"),
+        _message("singleton-comparison", 2, "Comparison 'y != None' should be 'y is not None'"),
+        _message("unnecessary-semicolon", 2, "Unnecessary semicolon"),
+        _message("trailing-whitespace", 2, "Trailing whitespace"),
+    ]
+    result = fix_source(source, messages)
+    assert result.source == "x = y = None\nok = x is None and y is not None\n"
+    assert result.remaining == []
+
+
+def test_a_block_is_never_emptied_by_several_removals():
+    # pass puis return None : supprimer les deux laisserait g() sans corps (et annulerait tout le reste)
+    source = "import os\n\n\ndef g():\n    pass\n    return None\n"
+    messages = [
+        _message("unused-import", 1, "Unused import os"),
+        _message("unnecessary-pass", 5, "Unnecessary pass statement"),
+        _message("useless-return", 4, "Useless return at end of function or method"),
+    ]
+    result = fix_source(source, messages)
+    compile(result.source, "<test>", "exec")
+    assert result.source == "\n\ndef g():\n    return None\n"
+    assert result.applied == {"unused-import": 1, "unnecessary-pass": 1}
+    assert [m["symbol"] for m in result.remaining] == ["useless-return"]
+
+
+def test_removed_imports_leave_a_pass_in_an_emptied_block():
+    source = "def f():\n    import os\n    import sys\n"
+    messages = [
+        _message("unused-import", 2, "Unused import os"),
+        _message("unused-import", 3, "Unused import sys"),
+    ]
+    result = fix_source(source, messages)
+    assert result.source == "def f():\n    pass\n"
+    assert result.remaining == []
@@ -0,0 +1,81 @@
+# tests/test_cache.py
+import os
+import time
+
+from src.utils import cache as cache_module
+from src.utils.cache import ResponseCache
+
+
+def _age(cache: ResponseCache, key: str, seconds: float) -> None:
+    """Recule la date de dernière utilisation d'une entrée."""
+    then = time.time() - seconds
+    os.utime(cache._path(key), (then, then))
+
+
+def _entries(cache: ResponseCache) -> int:
+    return sum(len(files) for _, _, files in os.walk(cache.directory))
+
+
+def test_keys_are_stable_and_length_prefixed():
+    key = ResponseCache.make_key("model", "prompt", "content")
+    assert key == ResponseCache.make_key("model", "prompt", "content")
+    assert key != ResponseCache.make_key("model", "prompt", "content", "{}")
+    assert ResponseCache.make_key("m", "ab", "c") != ResponseCache.make_key("m", "a", "bc")
+
+
+def test_put_get_and_stats(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, "answer", model="m")
+    assert cache.get("ab" * 32) == "answer"
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1}
+
+
+def test_disabled_and_refresh(tmp_path):
+    disabled = ResponseCache(directory=str(tmp_path), enabled=False)
+    disabled.put("ab" * 32, "answer")
+    assert _entries(disabled) == 0
+
+    cache = ResponseCache(directory=str(tmp_path))
+    cache.put("ab" * 32, "old")
+    refresh = ResponseCache(directory=str(tmp_path), refresh=True)
+    assert refresh.get("ab" * 32) is None
+    refresh.put("ab" * 32, "new")
+    assert cache.get("ab" * 32) == "new"
+
+
+def test_expired_entries_are_dropped_on_read(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_age=60)
+    cache.put("ab" * 32, "answer")
+    _age(cache, "ab" * 32, 120)
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(cache._path("ab" * 32))
+
+
+def test_evict_by_age_then_least_recently_used_beyond_max_bytes(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_age=3600)
+    keys = [f"{i:02d}" * 32 for i in range(4)]
+    for key in keys:
+        cache.put(key, "x" * 100)
+    # keys[0] expirée ; keys[1] la plus ancienne des autres, mais relue (utime) : keys[2] part d'abord
+    _age(cache, keys[0], 7200)
+    _age(cache, keys[1], 300)
+    _age(cache, keys[2], 200)
+    _age(cache, keys[3], 100)
+    assert cache.get(keys[1]) == "x" * 100
+
+    # Place pour deux entrées (leur taille varie d'un octet selon la date "created")
+    cache.max_bytes = sum(os.path.getsize(cache._path(key)) for key in (keys[1], keys[3]))
+    assert cache.evict() == 2
+    remaining = [key for key in keys if os.path.exists(cache._path(key))]
+    assert remaining == [keys[1], keys[3]]
+
+
+def test_put_evicts_every_n_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "EVICT_EVERY", 3)
+    cache = ResponseCache(directory=str(tmp_path), max_bytes=0)
+    cache.put("aa" * 32, "1")
+    cache.put("bb" * 32, "2")
+    assert _entries(cache) == 2
+    cache.put("cc" * 32, "3")
+    assert _entries(cache) == 0
@@ -0,0 +1,103 @@
+# tests/test_cluster.py
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.synth import generate_sandbox
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEASE = 2.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _call(url: str, payload: dict = None) -> dict:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _wait_for(url: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return _call(url)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def _cluster(command: list, cwd, env) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "cluster.py"), *command],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+
+
+def test_expired_lease_is_taken_over_and_logs_are_merged(stub, tmp_path):
+    # Tout (sandbox, journal, cache) dans tmp_path : les chemins du projet sont relatifs au dossier courant
+    files = generate_sandbox(str(tmp_path / "sandbox" / "proj"), 3, seed=1)
+    env = dict(os.environ, PYTHONPATH=ROOT, GEMINI_BASE_URL=stub.base_url, GOOGLE_API_KEY="test-key")
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    coordinator = _cluster(
+        ["coordinator", "--target_dir", "sandbox/proj", "--port", str(port), "--lease", str(LEASE)], tmp_path, env
+    )
+    worker = None
+    try:
+        run = _wait_for(f"{url}/run")
+
+        # Un worker "fantôme" prend un fichier puis ne donne plus signe de vie
+        (ghost_file, ghost_token), = _call(f"{url}/lease", {"worker": "ghost", "count": 1})["tasks"]
+        time.sleep(LEASE + 1.5)
+        status = _call(f"{url}/status")
+        assert status["requeued"] == 1
+        assert status["files"] == {"pending": 3, "leased": 0, "done": 0}
+        # Son résultat tardif est refusé : le fichier a été remis en attente
+        late = {"file": ghost_file, "status": "SUCCESS"}
+        assert _call(f"{url}/complete", {"worker": "ghost", "token": ghost_token, "result": late}) == {
+            "accepted": False
+        }
+
+        worker = _cluster(
+            ["worker", "--coordinator", url, "--workers", "2", "--name", "real", "--no-cache"], tmp_path, env
+        )
+        output, _ = coordinator.communicate(timeout=180)
+        assert coordinator.returncode == 0, output
+        worker_output, _ = worker.communicate(timeout=60)
+        assert worker.returncode == 0, worker_output
+    finally:
+        for process in (coordinator, worker):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.communicate()
+
+    assert "expired (worker ghost), queued again" in output
+    assert "3 files" in output and "1 lease(s) requeued" in output
+    for file_path in files:
+        relative = os.path.relpath(file_path, tmp_path)
+        assert f"{relative}  (real)" in output
+
+    # Journal fusionné côté coordinateur : une seule run, entrées du worker avec les chemins du coordinateur
+    with open(tmp_path / "logs" / "experiment_data.jsonl", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    assert {entry["run_id"] for entry in entries} == {run["run_id"]}
+    checked = {entry["details"]["file"] for entry in entries if entry["agent"] == "QualityChecker"}
+    logged = {entry["file"] for entry in entries if entry.get("file")}
+    expected = {os.path.relpath(file_path, tmp_path) for file_path in files}
+    assert logged == expected
+    assert checked <= expected
@@ -0,0 +1,144 @@
+# tests/test_code_units.py
+import pytest
+
+from src.utils.code_units import chunk_ranges, merge_returned_units, splice_units
+
+SOURCE = '''"""Module."""
+import functools
+from typing import Dict, List
+
+LIMIT = 3
+
+
+@functools.lru_cache()
+@staticmethod
+def cached(x):
+    return x
+
+
+def helper(values):
+    return sorted(values)
+
+
+class Outer:
+    """Classe avec une classe imbriquée."""
+
+    class Inner:
+        def helper(self):
+            return 1
+
+    def run(self):
+        return self.Inner().helper()
+'''
+
+
+def test_splice_replaces_decorators_with_the_unit():
+    merged = splice_units(SOURCE, {"cached": "@functools.cache\ndef cached(x):\n    return x * 2\n"})
+    assert "@functools.cache\ndef cached(x):\n    return x * 2\n" in merged
+    assert "lru_cache" not in merged and "@staticmethod" not in merged
+    # Le reste du module est intact
+    assert merged.replace("@functools.cache\ndef cached(x):\n    return x * 2", "") == SOURCE.replace(
+        "@functools.lru_cache()\n@staticmethod\ndef cached(x):\n    return x", ""
+    )
+
+
+def test_splice_inserts_new_imports_after_the_docstring_when_there_is_no_import():
+    merged = splice_units('"""Doc."""\n\n\ndef f():\n    return 1\n', {}, ["import os"])
+    assert merged.startswith('"""Doc."""\nimport os\n')
+
+
+def test_nested_class_is_replaced_as_part_of_its_top_level_class():
+    returned = (
+        "class Outer:\n"
+        "    class Inner:\n"
+        "        def helper(self):\n"
+        "            return 2\n\n"
+        "    def run(self):\n"
+        "        return self.Inner().helper()\n"
+    )
+    merged, replaced = merge_returned_units(SOURCE, returned, ["Outer", "helper"])
+    # La méthode Inner.helper ne remplace pas la fonction helper du module
+    assert replaced == ["Outer"]
+    assert "def helper(values):\n    return sorted(values)" in merged
+    assert "            return 2" in merged and "            return 1" not in merged
+    assert '"""Classe avec une classe imbriquée."""' not in merged
+
+
+def test_dropped_or_renamed_units_keep_the_original():
+    returned = "def helper(values):\n    return list(values)\n\n\ndef cached_v2(x):\n    return x\n"
+    merged, replaced = merge_returned_units(SOURCE, returned, ["helper", "cached"])
+    assert replaced == ["helper"]
+    assert "return list(values)" in merged
+    # cached n'a pas été renvoyé (renommé) : l'original reste, le nouveau nom n'est pas ajouté
+    assert "@functools.lru_cache()\n@staticmethod\ndef cached(x):" in merged
+    assert "cached_v2" not in merged
+
+    merged, replaced = merge_returned_units(SOURCE, "def cached_v2(x):\n    return x\n", ["cached"])
+    assert replaced == []
+    assert merged == SOURCE
+
+
+def test_reimported_modules_are_not_duplicated():
+    returned = (
+        "import  functools\n"
+        "from typing import (\n"
+        "    List,\n"
+        "    Dict,\n"
+        ")\n"
+        "import os.path\n\n\n"
+        "def helper(values):\n"
+        "    return sorted(values, key=os.path.basename)\n"
+    )
+    merged, replaced = merge_returned_units(SOURCE, returned, ["helper"])
+    assert replaced == ["helper"]
+    assert merged.count("functools\n") == 1
+    assert merged.count("from typing import") == 1
+    # Seul l'import inédit est ajouté, après le dernier import existant
+    assert "from typing import Dict, List\nimport os.path\n" in merged
+
+
+def test_invalid_returned_code_raises():
+    with pytest.raises(SyntaxError):
+        merge_returned_units(SOURCE, "def helper(:\n    pass\n", ["helper"])
+
+
+# =========================================================
+# chunk_ranges (1 token par ligne pour des bornes lisibles)
+# =========================================================
+
+
+def _one_token(text: str) -> int:
+    return 1
+
+
+def _chunks(source: str, budget: int) -> list:
+    chunks = chunk_ranges(source, budget, measure=_one_token)
+    # Sections contiguës, sans trou ni recouvrement, qui couvrent tout le module
+    lines = source.splitlines()
+    assert [start for start, _ in chunks] == [1] + [end + 1 for _, end in chunks[:-1]]
+    assert chunks[-1][1] == len(lines)
+    return chunks
+
+
+def test_small_module_is_one_chunk():
+    assert _chunks(SOURCE, 1000) == [(1, len(SOURCE.splitlines()))]
+    assert chunk_ranges("", 10) == []
+
+
+def test_cuts_between_top_level_statements_keep_decorators():
+    source = "import os\n\n\n@dec\ndef a():\n    return 1\n\n\ndef b():\n    return 2\n"
+    assert _chunks(source, 4) == [(1, 3), (4, 7), (8, 10)]
+    # Les sections voisines sont regroupées tant que le budget le permet
+    assert _chunks(source, 6) == [(1, 3), (4, 8), (9, 10)]
+
+
+def test_oversized_class_is_cut_between_members():
+    source = "class C:\n    x = 1\n\n    def f(self):\n        return 1\n\n    def g(self):\n        return 2\n"
+    assert _chunks(source, 4) == [(1, 3), (4, 6), (7, 8)]
+
+
+def test_oversized_function_falls_back_to_line_windows():
+    source = "def f():\n" + "".join(f"    x{i} = {i}\n" for i in range(9))
+    chunks = _chunks(source, 4)
+    assert chunks == [(1, 4), (5, 8), (9, 10)]
+    assert all(end - start + 1 <= 4 for start, end in chunks)
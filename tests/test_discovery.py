@@ -0,0 +1,93 @@
+# tests/test_discovery.py
+import os
+
+import pytest
+
+from src.utils import tool
+from src.utils.discovery import IgnoreRules, iter_python_files
+
+
+def _rules(*lines, base: str = "") -> IgnoreRules:
+    return IgnoreRules().extend(base, list(lines))
+
+
+def test_comments_blank_lines_and_escapes():
+    rules = _rules("# build.py", "", "\\#weird.py", "  ")
+    assert not rules.ignored("build.py", False)
+    assert rules.ignored("#weird.py", False)
+    assert len(rules.rules) == 1
+
+
+def test_unanchored_patterns_match_at_any_depth():
+    rules = _rules("*.gen.py", "secret?.py")
+    assert rules.ignored("a.gen.py", False)
+    assert rules.ignored("pkg/sub/a.gen.py", False)
+    assert rules.ignored("pkg/secret1.py", False)
+    assert not rules.ignored("pkg/secret10.py", False)
+    # * ne traverse pas les dossiers
+    assert not _rules("pkg*.py").ignored("pkg/x.py", False)
+
+
+def test_anchored_patterns_are_relative_to_the_rules_file():
+    rules = _rules("/setup.py", "src/*.py")
+    assert rules.ignored("setup.py", False)
+    assert not rules.ignored("pkg/setup.py", False)
+    assert rules.ignored("src/a.py", False)
+    assert not rules.ignored("src/sub/a.py", False)
+    assert not rules.ignored("lib/src/a.py", False)
+
+    # Règles d'un fichier situé dans lib/ : ancrées à lib/
+    nested = _rules("/gen.py", base="lib")
+    assert nested.ignored("lib/gen.py", False)
+    assert not nested.ignored("lib/sub/gen.py", False)
+    assert not nested.ignored("gen.py", False)
+
+
+def test_double_star():
+    rules = _rules("docs/**/conf.py", "**/migrations")
+    assert rules.ignored("docs/conf.py", False)
+    assert rules.ignored("docs/a/b/conf.py", False)
+    assert rules.ignored("migrations", True)
+    assert rules.ignored("app/db/migrations", True)
+
+
+def test_directory_only_patterns():
+    rules = _rules("build/")
+    assert rules.ignored("build", True)
+    assert rules.ignored("pkg/build", True)
+    assert not rules.ignored("build", False)
+
+
+def test_negation_last_matching_rule_wins():
+    rules = _rules("*.py", "!keep.py")
+    assert rules.ignored("a.py", False)
+    assert not rules.ignored("keep.py", False)
+    assert not rules.ignored("pkg/keep.py", False)
+    # Une règle plus loin peut ré-exclure
+    assert rules.extend("pkg", ["keep.py"]).ignored("pkg/keep.py", False)
+    # Un motif avec classe de caractères niée n'est pas une négation
+    assert _rules("test_[!a]*.py").ignored("test_b.py", False)
+    assert not _rules("test_[!a]*.py").ignored("test_a.py", False)
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_walk_applies_nested_rule_files(tmp_path, monkeypatch, threads):
+    monkeypatch.setattr(tool, "_sandbox_path", tmp_path.resolve())
+    files = {
+        ".gitignore": "build/\n*.gen.py\n",
+        "a.py": "",
+        "a.gen.py": "",
+        "build/b.py": "",
+        "lib/.refactorignore": "/local.py\n!keep.gen.py\n",
+        "lib/local.py": "",
+        "lib/keep.gen.py": "",
+        "lib/sub/local.py": "",
+        ".venv/site.py": "",
+    }
+    for name, text in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    found = sorted(os.path.relpath(p, tmp_path) for p in iter_python_files(str(tmp_path), threads=threads))
+    assert found == ["a.py", "lib/keep.gen.py", "lib/sub/local.py"]
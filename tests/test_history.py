@@ -0,0 +1,104 @@
+# tests/test_history.py
+import json
+
+import pytest
+
+from src.utils.history import HistoryStore
+
+
+def _entry(n: int, agent: str = "FixerAgent", status: str = "SUCCESS", **details) -> dict:
+    return {
+        "id": f"e{n}",
+        "run_id": "run1",
+        "timestamp": f"2026-01-01T00:00:{n:02d}",
+        "agent": agent,
+        "model": "m",
+        "action": "FIX",
+        "status": status,
+        "details": details,
+    }
+
+
+def _append(path, *entries, end: str = "\n") -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(entry) + "\n" for entry in entries[:-1]))
+        f.write(json.dumps(entries[-1]) + end)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_ingest_log_reads_only_new_complete_lines(store, tmp_path):
+    log = tmp_path / "log.jsonl"
+    _append(log, _entry(1), _entry(2))
+    assert store.ingest_log(str(log)) == 2
+    assert store.ingest_log(str(log)) == 0
+
+    # Ligne en cours d'écriture : reprise au prochain import
+    _append(log, _entry(3), end="")
+    assert store.ingest_log(str(log)) == 0
+    with open(log, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert store.ingest_log(str(log)) == 1
+
+    # Ligne tronquée (processus tué) : ignorée, la suite est lue
+    with open(log, "a", encoding="utf-8") as f:
+        f.write('{"id": "broken", "agent"\n')
+    _append(log, _entry(4))
+    assert store.ingest_log(str(log)) == 1
+    assert store.stats()["entries"] == 4
+
+
+def test_shorter_or_recreated_log_is_read_from_the_start(store, tmp_path):
+    log = tmp_path / "log.jsonl"
+    _append(log, _entry(1), _entry(2), _entry(3))
+    assert store.ingest_log(str(log)) == 3
+
+    log.unlink()
+    _append(log, _entry(3), _entry(5))
+    # Relu depuis le début : l'entrée déjà connue n'est pas dupliquée
+    assert store.ingest_log(str(log)) == 1
+    assert store.stats()["entries"] == 4
+
+
+def test_texts_are_stored_once_and_entries_rebuilt(store):
+    prompt = "You are a Python refactoring expert.\n" * 50
+    entries = [
+        _entry(n, input_prompt=prompt, output_response=f"answer {n}", score_before=5.0, score_after=7.5, file="a.py")
+        for n in range(3)
+    ]
+    assert store.ingest(entries) == 3
+
+    stats = store.stats()
+    assert stats["blobs"] == 4  # un prompt commun + trois réponses
+    assert stats["stored_bytes"] < stats["referenced_bytes"]
+    entry = store.entry("e1")
+    assert entry["file"] == "a.py"
+    assert entry["details"] == {
+        "input_prompt": prompt,
+        "output_response": "answer 1",
+        "score_before": 5.0,
+        "score_after": 7.5,
+    }
+    assert store.entry("missing") is None
+
+
+def test_summary_groups_and_filters(store):
+    store.ingest(
+        [
+            _entry(1, improvement=1.0),
+            _entry(2, status="FAILURE", improvement=0.0),
+            _entry(3, agent="AuditorAgent"),
+        ]
+    )
+    rows = {row["key"]: row for row in store.summary("agent")}
+    assert rows["FixerAgent"]["entries"] == 2
+    assert rows["FixerAgent"]["success_rate"] == 0.5
+    assert rows["FixerAgent"]["avg_improvement"] == 0.5
+    assert [row["key"] for row in store.summary("agent", status="FAILURE")] == ["FixerAgent"]
+    with pytest.raises(ValueError):
+        store.summary("prompt_hash")
@@ -0,0 +1,97 @@
+# tests/test_job_queue.py
+import threading
+
+from src.utils.job_queue import JobQueue
+
+
+def _queue(tmp_path) -> JobQueue:
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_claims_oldest_job_once(tmp_path):
+    queue = _queue(tmp_path)
+    first = queue.submit({"target": "a"})
+    second = queue.submit({"target": "b"})
+
+    assert queue.claim() == (first, {"target": "a"})
+    assert queue.claim() == (second, {"target": "b"})
+    assert queue.claim() is None
+    assert queue.counts() == {"running": 2}
+    queue.close()
+
+
+def test_recover_requeues_interrupted_jobs_after_restart(tmp_path):
+    queue = _queue(tmp_path)
+    job_id = queue.submit({"target": "a"})
+    queue.claim()
+    queue.set_total(job_id, 3)
+    queue.record(job_id, {"file": "a.py", "status": "SUCCESS"})
+    started = queue.get(job_id)["started"]
+    queue.close()
+
+    # Redémarrage du démon : nouvelle connexion sur la même base
+    queue = _queue(tmp_path)
+    assert queue.claim() is None
+    assert queue.recover() == 1
+    assert queue.claim() == (job_id, {"target": "a"})
+    job = queue.get(job_id)
+    # La reprise garde la date de début et saute les fichiers déjà faits
+    assert job["started"] == started
+    assert (job["total"], job["done"]) == (3, 1)
+    assert queue.done_files(job_id) == {"a.py"}
+    queue.close()
+
+
+def test_results_are_followed_by_sequence_number(tmp_path):
+    queue = _queue(tmp_path)
+    job_id = queue.submit({"target": "a"})
+    queue.claim()
+    for name in ("a.py", "b.py", "c.py"):
+        queue.record(job_id, {"file": name, "status": "SUCCESS"})
+
+    results = queue.get(job_id)["results"]
+    assert [r["file"] for r in results] == ["a.py", "b.py", "c.py"]
+    after = queue.get(job_id, after=results[0]["seq"])["results"]
+    assert [r["file"] for r in after] == ["b.py", "c.py"]
+    assert queue.get(job_id + 1) is None
+    queue.close()
+
+
+def test_finish_sets_final_status(tmp_path):
+    queue = _queue(tmp_path)
+    ok, failed = queue.submit({}), queue.submit({})
+    queue.claim()
+    queue.claim()
+    queue.finish(ok, summary={"SUCCESS": 2})
+    queue.finish(failed, error="boom")
+
+    assert queue.get(ok)["status"] == "done" and queue.get(ok)["summary"] == {"SUCCESS": 2}
+    assert queue.get(failed)["status"] == "failed" and queue.get(failed)["error"] == "boom"
+    assert [job["id"] for job in queue.list()] == [failed, ok]
+    queue.close()
+
+
+def test_concurrent_claims_from_two_connections_never_share_a_job(tmp_path):
+    submitter = _queue(tmp_path)
+    job_ids = {submitter.submit({"n": n}) for n in range(40)}
+    queues = [_queue(tmp_path), _queue(tmp_path)]
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(queue):
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job[0])
+
+    threads = [threading.Thread(target=worker, args=(queue,)) for queue in queues for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+    for queue in [submitter, *queues]:
+        queue.close()
@@ -0,0 +1,127 @@
+# tests/test_llm_client.py
+import asyncio
+import time
+
+import pytest
+
+from src.utils import llm_client
+from src.utils.llm_client import GeminiClient, LLMError, RateLimiter
+
+
+def _client(stub, **kwargs) -> GeminiClient:
+    kwargs.setdefault("backoff_base", 0.01)
+    return GeminiClient(base_url=stub.base_url, model="stub-model", **kwargs)
+
+
+def test_retries_429_and_5xx_until_success(stub):
+    stub.fail_next(429, retry_after="0")
+    stub.fail_next(503)
+    stub.fail_next(500)
+    response = _client(stub).generate("Say OK", "key")
+    assert response.text == "OK"
+    assert response.attempts == 4
+    assert stub.requests == 4
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.fail_next(503, times=10)
+    with pytest.raises(LLMError) as error:
+        _client(stub, max_retries=2).generate("Say OK", "key")
+    assert error.value.status_code == 503
+    assert stub.requests == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.fail_next(400)
+    with pytest.raises(LLMError) as error:
+        _client(stub).generate("Say OK", "key")
+    assert error.value.status_code == 400
+    assert stub.requests == 1
+
+
+def test_retry_after_header_sets_the_delay(stub):
+    stub.fail_next(429, retry_after="0.5")
+    start = time.monotonic()
+    response = _client(stub, backoff_base=10.0).generate("Say OK", "key")
+    elapsed = time.monotonic() - start
+    # Retry-After (0.5 s) remplace le backoff exponentiel (jusqu'à 10 s ici)
+    assert response.attempts == 2
+    assert 0.5 <= elapsed < 5.0
+
+
+def test_retry_after_is_capped_by_backoff_max(stub):
+    client = _client(stub, backoff_max=2.0)
+    assert client._backoff(0, "120") == 2.0
+    assert 0.0 <= client._backoff(3, "not a number") <= 2.0
+
+
+def test_truncated_body_is_retried_like_a_connection_error(stub):
+    stub.cut_next()
+    response = _client(stub).generate("Say OK", "key")
+    assert response.text == "OK"
+    assert response.attempts == 2
+
+
+def test_async_truncated_body_is_retried(stub):
+    from src.utils.async_llm import AsyncGeminiClient
+
+    async def generate():
+        client = AsyncGeminiClient(_client(stub))
+        try:
+            return await client.generate("Say OK", "key")
+        finally:
+            await client.close()
+
+    stub.cut_next()
+    response = asyncio.run(generate())
+    assert response.text == "OK"
+    assert response.attempts == 2
+
+
+def test_stream_retries_before_the_first_chunk(stub):
+    stub.fail_next(429, retry_after="0")
+    stream = _client(stub).stream_generate("Say OK", "key")
+    assert "".join(stream) == "OK"
+    assert stub.requests == 2
+
+
+def test_limiter_refills_over_time(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(llm_client.time, "monotonic", lambda: clock[0])
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600)
+
+    assert limiter.try_acquire(100) == 0.0
+    assert limiter.try_acquire(100) == 0.0
+    # Plus de requête disponible : une requête revient toutes les 30 s
+    assert limiter.try_acquire(100) == pytest.approx(30.0)
+    clock[0] += 30.0
+    assert limiter.try_acquire(100) == 0.0
+
+    # Quota de tokens : 600/min, soit 10 tokens par seconde
+    clock[0] += 60.0
+    assert limiter.try_acquire(550) == 0.0
+    assert limiter.try_acquire(100) == pytest.approx(5.0)
+    clock[0] += 5.0
+    assert limiter.try_acquire(100) == 0.0
+
+
+def test_limiter_paces_requests_against_the_stub(stub):
+    # 120 requêtes/min : seau de 120, vidé d'avance ; les suivantes attendent 0,5 s chacune
+    client = _client(stub, requests_per_minute=120)
+    client.limiter._requests = 0.0
+    start = time.monotonic()
+    for _ in range(2):
+        client.generate("Say OK", "key")
+    assert time.monotonic() - start >= 0.9
+    assert stub.requests == 2
+
+
+def test_rate_limits_come_from_the_environment_at_client_creation(monkeypatch):
+    # Posées après l'import, comme par load_dotenv() dans get_api_key()
+    monkeypatch.setenv("GEMINI_RPM", "7")
+    monkeypatch.setenv("GEMINI_TPM", "7000")
+    client = GeminiClient(base_url="http://127.0.0.1:1")
+    assert (client.limiter.rpm, client.limiter.tpm) == (7, 7000)
+    # La CLI reste prioritaire
+    client = GeminiClient(base_url="http://127.0.0.1:1", requests_per_minute=30)
+    assert (client.limiter.rpm, client.limiter.tpm) == (30, 7000)
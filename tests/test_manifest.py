@@ -0,0 +1,64 @@
+# tests/test_manifest.py
+from src.utils.manifest import RunManifest
+from src.utils.source_cache import get_sources
+
+
+def _result(status: str, test_success) -> dict:
+    return {"status": status, "score_after": 9.5, "test_success": test_success}
+
+
+def _write(path, text: str) -> None:
+    path.write_text(text)
+    get_sources().invalidate(str(path))
+
+
+def test_done_file_without_tests_is_unchanged(tmp_path):
+    code = tmp_path / "a.py"
+    _write(code, "x = 1\n")
+    manifest = RunManifest(str(tmp_path))
+    for status in ("SKIPPED", "AUTOFIXED"):
+        manifest.record(str(code), _result(status, None))
+        assert manifest.is_unchanged(str(code))
+
+    # Rechargé depuis le disque, le statut "traité" est conservé
+    manifest.save()
+    assert RunManifest(str(tmp_path)).is_unchanged(str(code))
+
+    _write(code, "x = 2\n")
+    assert not manifest.is_unchanged(str(code))
+
+
+def test_failed_or_postponed_files_are_reprocessed(tmp_path):
+    code = tmp_path / "a.py"
+    _write(code, "x = 1\n")
+    _write(tmp_path / "a_test.py", "def test_a():\n    assert True\n")
+    manifest = RunManifest(str(tmp_path))
+
+    manifest.record(str(code), _result("FAILURE", False))
+    assert not manifest.is_unchanged(str(code))
+    manifest.record(str(code), _result("BUDGET", True))
+    assert not manifest.is_unchanged(str(code))
+    manifest.record(str(code), _result("SUCCESS", True))
+    assert manifest.is_unchanged(str(code))
+
+
+def test_tests_added_after_the_run_invalidate_the_entry(tmp_path):
+    code = tmp_path / "a.py"
+    _write(code, "x = 1\n")
+    manifest = RunManifest(str(tmp_path))
+    manifest.record(str(code), _result("SKIPPED", None))
+
+    _write(tmp_path / "a_test.py", "def test_a():\n    assert False\n")
+    assert not manifest.is_unchanged(str(code))
+
+
+def test_entries_without_done_flag_keep_the_old_rule(tmp_path):
+    code = tmp_path / "a.py"
+    _write(code, "x = 1\n")
+    manifest = RunManifest(str(tmp_path))
+    manifest.record(str(code), _result("SUCCESS", True))
+    entry = manifest.files["a.py"]
+    del entry["done"]
+    assert manifest.is_unchanged(str(code))
+    entry["test_success"] = False
+    assert not manifest.is_unchanged(str(code))
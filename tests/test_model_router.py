@@ -0,0 +1,34 @@
+# tests/test_model_router.py
+import contextvars
+
+from src.utils import model_router
+from src.utils.model_router import current_model, escalate, model_of, start_file
+
+
+def test_models_are_read_from_the_environment_after_import(monkeypatch):
+    # Variables posées après l'import du module, comme le fait load_dotenv() dans get_api_key()
+    monkeypatch.setenv("GEMINI_MODEL_FAST", "my-fast")
+    monkeypatch.setenv("GEMINI_MODEL", "my-standard")
+    monkeypatch.setenv("GEMINI_MODEL_STRONG", "my-strong")
+    assert [model_of(tier) for tier in model_router.TIERS] == ["my-fast", "my-standard", "my-strong"]
+    assert current_model() == "my-standard"
+
+
+def test_defaults_without_environment(monkeypatch):
+    for variable, _ in model_router.MODEL_ENV.values():
+        monkeypatch.delenv(variable, raising=False)
+    assert model_of("standard") == "gemini-2.5-flash"
+
+
+def test_routing_and_escalation_use_the_environment(monkeypatch):
+    monkeypatch.setenv("GEMINI_MODEL_FAST", "env-fast")
+    monkeypatch.setenv("GEMINI_MODEL", "env-standard")
+
+    def route_file():
+        route = start_file("small.py", tokens=10, score=5.0)
+        assert route.model == "env-fast"
+        assert escalate("tests failed")
+        assert current_model() == "env-standard"
+
+    # Contexte à part : la route du fichier ne reste pas attachée aux tests suivants
+    contextvars.copy_context().run(route_file)